@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+可合并的流式聚合器
+逐条记录更新，不保留原始记录；并行区间、多个文件或多次增量运行的部分结果可以合并，
+合并后的结果与对全部记录一次性统计相同
+"""
+
+from collections import Counter
+
+def is_http_error(status):
+    """4xx/5xx 状态码"""
+    return str(status).startswith(('4', '5'))
+
+class ValueCounter:
+    """按字段值计数，相当于 value_counts()"""
+    
+    def __init__(self, field):
+        self.field = field
+        self.counts = Counter()
+    
+    def update(self, log):
+        value = log.get(self.field)
+        if value is not None:
+            self.counts[value] += 1
+    
+    def merge(self, other):
+        self.counts.update(other.counts)
+    
+    def most_common(self, n=None):
+        """按次数降序返回 {值: 次数}，n 为 None 时返回全部"""
+        return dict(self.counts.most_common(n))
+    
+    def distinct(self):
+        return len(self.counts)
+    
+    def count(self, value):
+        return self.counts[value]
+    
+    def to_dict(self):
+        return dict(self.counts)
+    
+    def load(self, data):
+        self.counts = Counter(data)
+        return self
+
+class ErrorRatio:
+    """按字段统计错误条数和错误率，is_error 判断字段值是否为错误"""
+    
+    def __init__(self, field, is_error=is_http_error):
+        self.field = field
+        self.is_error = is_error
+        self.total = 0
+        # 带有该字段的记录数，没有任何记录带该字段时不输出错误统计
+        self.observed = 0
+        self.errors = 0
+    
+    def update(self, log):
+        self.total += 1
+        value = log.get(self.field)
+        if value is not None:
+            self.observed += 1
+            if self.is_error(value):
+                self.errors += 1
+    
+    def merge(self, other):
+        self.total += other.total
+        self.observed += other.observed
+        self.errors += other.errors
+    
+    def rate(self):
+        """错误率（百分比，分母为全部记录数）"""
+        return self.errors / self.total * 100 if self.total else 0
+    
+    def to_dict(self):
+        return {'total': self.total, 'observed': self.observed, 'errors': self.errors}
+    
+    def load(self, data):
+        self.total = data['total']
+        self.observed = data['observed']
+        self.errors = data['errors']
+        return self
@@ -5,32 +5,503 @@
 """
 
 import os
-import re
+import sys
+import csv
+import mmap
 import json
+import pickle
+import shutil
+import time
 import logging
 import argparse
-import pandas as pd
 from datetime import datetime
 from pathlib import Path
 from collections import defaultdict, Counter
-import gzip
+from itertools import chain, islice, repeat
+from concurrent.futures import ProcessPoolExecutor
+
+from log_aggregators import ErrorRatio, ValueCounter
+from log_checkpoint import CheckpointStore
+from log_codecs import COMPRESSED_SUFFIXES, is_compressed, open_text
+from log_follower import FileTailer, RollingWindow
+from log_sketches import HyperLogLog, SpaceSaving
+from log_storage import (HANDOFF_FORMATS, HAS_PYARROW, PARSED_LOG_COLUMNS, HandoffWriter, handoff_path,
+                         partition_dir, remove_handoff, remove_partitions, update_partition_stats)
+from log_matcher import DEFAULT_LOG_PATTERNS, LogMatcher
+from log_records import RecordBatch
+from log_templates import TEMPLATE_FILE, TemplateMiner
+from security_scanner import EventReservoir, SecurityScanner
+from timestamp_parser import TIMESTAMP_FORMATS, TimestampParser, hour_and_day, standard_format
+
+# 输入目录中按扩展名识别的日志文件（文件名含 log 的文件也会读取）
+LOG_FILE_SUFFIXES = {'.log', '.jsonl', '.ndjson'} | COMPRESSED_SUFFIXES
+# 格式检测的采样行数
+FORMAT_SAMPLE_LINES = 10
+# 安全事件明细的抽样条数
+MAX_SECURITY_EVENTS = 100
+# 解析结果写入磁盘前缓冲的记录数
+SPOOL_BATCH_SIZE = 10000
+# 设置内存预算时，每隔多少条记录估计一次单条记录的内存占用
+SPOOL_SIZE_SAMPLE_INTERVAL = 64
+# 并行模式下单个未压缩文件按此大小拆分为多个字节区间
+DEFAULT_CHUNK_SIZE = 64 * 1024 * 1024
+# 统计换行数时每次读取的块大小
+COUNT_BLOCK_SIZE = 16 * 1024 * 1024
+# 近似模式的默认误差：去重计数相对标准误差、Top N 高估量占总数的比例
+DEFAULT_DISTINCT_ERROR = 0.01
+DEFAULT_TOP_ERROR = 0.001
+# 跟踪模式：轮询间隔（秒）、滑动窗口长度（秒）、滚动统计的输出间隔（秒）
+DEFAULT_POLL_INTERVAL = 0.25
+DEFAULT_FOLLOW_WINDOW = 60
+FOLLOW_EMIT_INTERVAL = 1.0
+# 跟踪模式下重新扫描输入目录、发现新文件的间隔（秒）；检测到轮转时立即扫描
+FOLLOW_RESCAN_INTERVAL = 2.0
+# 轮转后的旧文件持续多久没有新内容后停止跟踪（秒），应用可能在重新打开日志前继续写入旧文件
+ROTATED_IDLE_SECONDS = 5.0
+
+class FileStats:
+    """单个文件的流式统计：由若干可合并的聚合器组成，逐条更新，不保留原始记录"""
+    
+    kind = None
+    
+    def __init__(self, approximate=None):
+        # None 为精确统计；否则为近似统计的误差配置 {'distinct_error': ..., 'top_error': ...}
+        self.approximate = approximate
+        self.total = 0
+        self.aggregators = self.create_aggregators()
+    
+    def create_aggregators(self):
+        """返回 {名称: 聚合器}"""
+        return {}
+    
+    def update(self, log):
+        self.total += 1
+        for aggregator in self.aggregators.values():
+            aggregator.update(log)
+    
+    def merge(self, other):
+        """合并同一文件其他区间的统计"""
+        self.total += other.total
+        for name, aggregator in self.aggregators.items():
+            aggregator.merge(other.aggregators[name])
+    
+    def to_dict(self):
+        data = {'kind': self.kind, 'total': self.total, 'approximate': self.approximate}
+        for name, aggregator in self.aggregators.items():
+            data[name] = aggregator.to_dict()
+        return data
+    
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(data.get('approximate'))
+        stats.total = data['total']
+        for name, aggregator in stats.aggregators.items():
+            aggregator.load(data[name])
+        return stats
+
+class AccessLogStats(FileStats):
+    """访问日志流式统计"""
+    
+    kind = 'access'
+    
+    def create_aggregators(self):
+        aggregators = {
+            'ips': ValueCounter('ip'),
+            'status_codes': ValueCounter('status'),
+            'urls': ValueCounter('url'),
+            'methods': ValueCounter('method'),
+            'errors': ErrorRatio('status'),
+        }
+        
+        # 近似模式：IP 和 URL 可能有数百万个不同值，改用固定内存的草图
+        if self.approximate is not None:
+            aggregators['ips'] = SpaceSaving('ip', self.approximate['top_error'])
+            aggregators['unique_ips'] = HyperLogLog('ip', self.approximate['distinct_error'])
+            aggregators['urls'] = SpaceSaving('url', self.approximate['top_error'])
+        
+        return aggregators
+    
+    def result(self):
+        if not self.total:
+            return {}
+        
+        aggregators = self.aggregators
+        distinct_ips = aggregators['unique_ips'] if self.approximate is not None else aggregators['ips']
+        analysis = {
+            'total_requests': self.total,
+            'unique_ips': distinct_ips.distinct(),
+            'status_codes': aggregators['status_codes'].most_common(),
+            'top_ips': aggregators['ips'].most_common(10),
+            'top_urls': aggregators['urls'].most_common(10),
+            'methods': aggregators['methods'].most_common(),
+        }
+        
+        # 近似模式下给出每个估计值的误差
+        if self.approximate is not None:
+            analysis['estimated_error'] = {
+                'unique_ips_relative_error': distinct_ips.relative_error(),
+                'top_ips_max_overcount': {ip: aggregators['ips'].error(ip) for ip in analysis['top_ips']},
+                'top_urls_max_overcount': {url: aggregators['urls'].error(url) for url in analysis['top_urls']},
+            }
+        
+        # 错误分析
+        errors = aggregators['errors']
+        if errors.observed:
+            analysis['error_count'] = errors.errors
+            analysis['error_rate'] = errors.rate()
+        
+        return analysis
+
+class ApplicationLogStats(FileStats):
+    """应用日志流式统计"""
+    
+    kind = 'application'
+    
+    def create_aggregators(self):
+        return {'levels': ValueCounter('level')}
+    
+    def result(self):
+        if not self.total:
+            return {}
+        
+        levels = self.aggregators['levels']
+        analysis = {
+            'total_entries': self.total,
+            'log_levels': levels.most_common(),
+        }
+        
+        # 错误和警告统计
+        if levels.distinct():
+            analysis['error_count'] = levels.count('ERROR') + levels.count('FATAL')
+            analysis['warning_count'] = levels.count('WARNING')
+        
+        return analysis
+
+class StructuredLogStats(FileStats):
+    """结构化（JSON）日志流式统计：同时可能包含访问字段和级别字段，只输出出现过的部分"""
+    
+    kind = 'structured'
+    
+    def create_aggregators(self):
+        aggregators = {
+            'levels': ValueCounter('level'),
+            'status_codes': ValueCounter('status'),
+            'ips': ValueCounter('ip'),
+            'urls': ValueCounter('url'),
+            'methods': ValueCounter('method'),
+            'errors': ErrorRatio('status'),
+        }
+        
+        # 近似模式：与访问日志相同，IP 和 URL 改用固定内存的草图
+        if self.approximate is not None:
+            aggregators['ips'] = SpaceSaving('ip', self.approximate['top_error'])
+            aggregators['unique_ips'] = HyperLogLog('ip', self.approximate['distinct_error'])
+            aggregators['urls'] = SpaceSaving('url', self.approximate['top_error'])
+        
+        return aggregators
+    
+    def result(self):
+        if not self.total:
+            return {}
+        
+        aggregators = self.aggregators
+        analysis = {'total_entries': self.total}
+        
+        levels = aggregators['levels']
+        if levels.distinct():
+            analysis['log_levels'] = levels.most_common()
+            analysis['error_count'] = sum(levels.count(level) for level in ('ERROR', 'FATAL', 'error', 'fatal'))
+            analysis['warning_count'] = sum(levels.count(level) for level in ('WARNING', 'WARN', 'warning', 'warn'))
+        
+        if aggregators['status_codes'].distinct():
+            analysis['status_codes'] = aggregators['status_codes'].most_common()
+            analysis['methods'] = aggregators['methods'].most_common()
+            analysis['top_urls'] = aggregators['urls'].most_common(10)
+        
+        distinct_ips = aggregators['unique_ips'] if self.approximate is not None else aggregators['ips']
+        if distinct_ips.distinct():
+            analysis['unique_ips'] = distinct_ips.distinct()
+            analysis['top_ips'] = aggregators['ips'].most_common(10)
+        
+        # 只有部分记录带状态码，错误率的分母为带状态码的记录数
+        errors = aggregators['errors']
+        if errors.observed:
+            analysis['http_error_count'] = errors.errors
+            analysis['http_error_rate'] = errors.errors / errors.observed * 100
+        
+        return analysis
+
+class EntryCountStats(FileStats):
+    """其他格式只统计条目数"""
+    
+    kind = 'entries'
+    
+    def result(self):
+        return {'total_entries': self.total}
+
+# 按 kind 还原已保存的文件统计
+FILE_STATS_KINDS = {cls.kind: cls for cls in (AccessLogStats, ApplicationLogStats, StructuredLogStats,
+                                                EntryCountStats)}
+
+class SecurityEventStats:
+    """安全事件流式统计：按类型精确计数，明细用固定大小的蓄水池抽样"""
+    
+    def __init__(self, patterns, max_events=MAX_SECURITY_EVENTS):
+        self.patterns = patterns
+        self.max_events = max_events
+        self.scanner = SecurityScanner(patterns)
+        self.total = 0
+        self.events_by_type = Counter()
+        self.reservoir = EventReservoir(max_events)
+    
+    def update(self, log):
+        content = log.get('message', '') or log.get('raw_line', '') or ''
+        hits = self.scanner.scan(content)
+        if not hits:
+            return
+        
+        for pattern in hits:
+            self.total += 1
+            self.events_by_type[pattern] += 1
+            self.reservoir.add(log.get('file_name'), log.get('line_number'), pattern, content)
+    
+    def merge(self, other):
+        """合并另一个分片的统计结果（抽样结果与合并顺序无关，与串行结果一致）"""
+        self.total += other.total
+        self.events_by_type.update(other.events_by_type)
+        self.reservoir.merge(other.reservoir)
+    
+    def events(self):
+        return self.reservoir.events(self.patterns)
+    
+    def to_dict(self):
+        return {'total': self.total, 'events_by_type': self.events_by_type, 'events': self.events()}
+    
+    @classmethod
+    def from_dict(cls, data, patterns):
+        stats = cls(patterns)
+        stats.total = data['total']
+        stats.events_by_type = Counter(data['events_by_type'])
+        for event in data['events']:
+            stats.reservoir.add(event['file'], event['line'], event['type'], event['content'])
+        return stats
+    
+    def result(self):
+        return {
+            'total_security_events': self.total,
+            'events_by_type': self.events_by_type,
+            'events': self.events()
+        }
+
+class TimeDistribution:
+    """按小时和日期流式统计日志分布"""
+    
+    TIME_FORMATS = ['%d/%b/%Y:%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%b %d %H:%M:%S', '%Y-%m-%dT%H:%M:%S']
+    
+    def __init__(self):
+        self.hourly = defaultdict(int)
+        self.daily = defaultdict(int)
+        # 每个文件（分片）一个解析器，记住该文件的时间格式并缓存重复的时间戳
+        self.parser = TimestampParser(self.TIME_FORMATS, convert=hour_and_day)
+    
+    def update(self, log):
+        timestamp_str = log.get('timestamp')
+        if not timestamp_str:
+            return
+        
+        bucket = self.parser.parse(timestamp_str)
+        if bucket is not None:
+            hour, day = bucket
+            self.hourly[hour] += 1
+            self.daily[day] += 1
+    
+    def merge(self, other):
+        """合并另一个分片的时间分布"""
+        for hour, count in other.hourly.items():
+            self.hourly[hour] += count
+        for day, count in other.daily.items():
+            self.daily[day] += count
+    
+    def to_dict(self):
+        return {'hourly': self.hourly, 'daily': self.daily}
+    
+    @classmethod
+    def from_dict(cls, data):
+        distribution = cls()
+        for hour, count in data['hourly'].items():
+            distribution.hourly[int(hour)] = count
+        distribution.daily.update(data['daily'])
+        return distribution
+    
+    def result(self):
+        return {
+            'hourly_distribution': self.hourly,
+            'daily_distribution': self.daily
+        }
+
+def estimate_record_size(record):
+    """估计一条解析记录（字典）占用的内存字节数"""
+    return sys.getsizeof(record) + sum(map(sys.getsizeof, record.values()))
+
+class RecordSpool:
+    """将解析结果按列分批落盘（RecordBatch），最后合并为CSV或列式文件
+    
+    缓冲达到 batch_size 条，或设置了 max_bytes 且缓冲记录的估计内存超过 max_bytes 时写入一批；
+    批次大小不影响合并结果。
+    分区模式下按记录的标准化时间分别缓冲，每批只包含一个分区的记录，并记录各分区的批次位置和时间范围
+    """
+    
+    def __init__(self, path, batch_size=SPOOL_BATCH_SIZE, partitioned=False, max_bytes=None):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.partitioned = partitioned
+        self.max_bytes = max_bytes
+        # 当前每批的记录数上限：按抽样估计的单条记录大小由 max_bytes 换算，不超过 batch_size
+        self._limit = batch_size
+        self._record_size = None
+        self._next_sample = 0 if max_bytes is not None else None
+        self.fieldnames = {}  # 按首次出现顺序记录列名
+        self.count = 0
+        # {分区: {'offsets': 批次位置, 'rows': 行数, 'min_timestamp': 最早时间, 'max_timestamp': 最晚时间}}
+        self.partitions = {}
+        self._buffers = {}
+        self._buffered = 0
+        self._file = open(self.path, 'wb')
+    
+    def write(self, record, timestamp=None):
+        """写入一条记录，timestamp 为分区模式下记录的标准化时间"""
+        partition = None
+        if self.partitioned:
+            partition = partition_dir(timestamp)
+            info = self.partitions.get(partition)
+            if info is None:
+                info = self.partitions[partition] = {'offsets': [], 'rows': 0,
+                                                     'min_timestamp': timestamp, 'max_timestamp': timestamp}
+            info['rows'] += 1
+            if timestamp is not None:
+                if timestamp < info['min_timestamp']:
+                    info['min_timestamp'] = timestamp
+                elif timestamp > info['max_timestamp']:
+                    info['max_timestamp'] = timestamp
+        
+        buffer = self._buffers.get(partition)
+        if buffer is None:
+            buffer = self._buffers[partition] = []
+        buffer.append(record)
+        if self.count == self._next_sample:
+            self.sample(record)
+        self.count += 1
+        self._buffered += 1
+        if self._buffered >= self._limit:
+            self.flush()
+    
+    def sample(self, record):
+        """按抽样记录的大小（滑动平均）更新每批的记录数上限"""
+        size = estimate_record_size(record)
+        self._record_size = size if self._record_size is None else (self._record_size * 3 + size) / 4
+        self._limit = max(1, min(self.batch_size, int(self.max_bytes // self._record_size)))
+        self._next_sample = self.count + SPOOL_SIZE_SAMPLE_INTERVAL
+    
+    def flush(self):
+        for partition, records in self._buffers.items():
+            batch = RecordBatch(records)
+            for key in batch.columns:
+                self.fieldnames.setdefault(key, None)
+            if partition is not None:
+                self.partitions[partition]['offsets'].append(self._file.tell())
+            pickle.dump(batch, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._buffers = {}
+        self._buffered = 0
+    
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+    
+    def to_csv(self, csv_path, fieldnames):
+        """按给定列顺序将暂存记录转换为不含表头的CSV片段"""
+        with open(csv_path, 'w', encoding='utf-8', newline='') as f_out:
+            writer = csv.writer(f_out, lineterminator='\n')
+            for batch in self.iter_batches():
+                writer.writerows(batch.rows(fieldnames))
+        return csv_path
+    
+    def iter_batches(self, offsets=None):
+        """按批读取暂存记录，offsets 为只读取的批次位置（如某个分区的批次）"""
+        with open(self.path, 'rb') as f:
+            if offsets is not None:
+                for offset in offsets:
+                    f.seek(offset)
+                    yield pickle.load(f)
+                return
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+    
+    @staticmethod
+    def merge_fieldnames(spools):
+        """按首次出现顺序合并多个暂存文件的列名，与 pd.DataFrame(records) 一致"""
+        fieldnames = {}
+        for spool in spools:
+            for key in spool.fieldnames:
+                fieldnames.setdefault(key, None)
+        return list(fieldnames)
 
 class LogAnalyzer:
-    def __init__(self, input_dir, output_dir):
+    def __init__(self, input_dir, output_dir, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, checkpoint_file=None,
+                 fast_path=False, approximate=None, handoff_format='csv', partition=False, mine_templates=False,
+                 memory_budget=None):
         """初始化日志分析器"""
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.workers = max(1, int(workers))
+        self.chunk_size = max(1, int(chunk_size))
         self.setup_logging()
         
+        # 增量模式：记录每个文件的解析位置，只解析新增内容
+        self.checkpoints = CheckpointStore(checkpoint_file) if checkpoint_file else None
+        
+        # 解析结果的交接文件格式：csv / feather / parquet
+        if handoff_format != 'csv' and not HAS_PYARROW:
+            self.logger.warning(f"pyarrow未安装，无法保存为 {handoff_format}，改用 CSV")
+            handoff_format = 'csv'
+        self.handoff_format = handoff_format
+        # 解析结果按日期/小时分区保存（增量模式下追加到已有分区）
+        self.partition = partition
+        # 未知格式的行聚类为模板，解析结果只保存模板编号和参数
+        self.mine_templates = mine_templates
+        # 解析记录缓冲区的内存预算（字节，各进程平分），超出时提前写入暂存文件；None 为只按条数分批
+        self.memory_budget = memory_budget
+        
+        # 近似统计：None 为精确统计，否则为 {'distinct_error': 去重计数相对误差, 'top_error': Top N 高估比例}
+        self.approximate = approximate
+        
         # 常用日志格式正则表达式
-        self.log_patterns = {
-            'apache_access': r'(?P<ip>\S+) \S+ \S+ \[(?P<timestamp>[^\]]+)\] "(?P<method>\S+) (?P<url>\S+) (?P<protocol>\S+)" (?P<status>\d+) (?P<size>\S+)',
-            'nginx_access': r'(?P<ip>\S+) - \S+ \[(?P<timestamp>[^\]]+)\] "(?P<method>\S+) (?P<url>\S+) (?P<protocol>\S+)" (?P<status>\d+) (?P<size>\d+)',
-            'syslog': r'(?P<timestamp>\w+\s+\d+\s+\d+:\d+:\d+) (?P<hostname>\S+) (?P<process>\S+): (?P<message>.*)',
-            'application': r'(?P<timestamp>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) \[(?P<level>\w+)\] (?P<message>.*)'
-        }
+        self.log_patterns = dict(DEFAULT_LOG_PATTERNS)
+        # 预编译的多格式匹配器（修改 log_patterns 后需重新创建）
+        self.matcher = LogMatcher(self.log_patterns, fast_path=fast_path)
         
+        # 安全事件检测规则
+        self.security_patterns = [
+            r'failed login',
+            r'authentication failed',
+            r'invalid user',
+            r'brute force',
+            r'sql injection',
+            r'xss attack',
+            r'unauthorized access'
+        ]
+    
+    def __getstate__(self):
+        """传给工作进程时不携带检查点数据"""
+        state = self.__dict__.copy()
+        state['checkpoints'] = None
+        return state
+    
     def setup_logging(self):
         """设置日志记录"""
         logging.basicConfig(
@@ -45,231 +516,771 @@ class LogAnalyzer:
     
     def detect_log_format(self, sample_lines):
         """检测日志格式"""
-        for format_name, pattern in self.log_patterns.items():
-            matches = 0
-            for line in sample_lines[:10]:  # 检查前10行
-                if re.match(pattern, line):
-                    matches += 1
-            
-            if matches >= len(sample_lines) * 0.7:  # 70%匹配率
-                return format_name, pattern
+        # 每行只按特征分派匹配一次，70%匹配率
+        format_name = self.matcher.detect(sample_lines[:FORMAT_SAMPLE_LINES], threshold=0.7)
+        return format_name, self.log_patterns.get(format_name)
+    
+    def open_log_file(self, file_path):
+        """以文本方式打开日志文件（支持 gzip/bz2/xz/zstd 压缩，后台线程解压）"""
+        return open_text(file_path)
+    
+    def parse_lines(self, lines, format_name, file_name, start_line=1):
+        """逐行解析，优先按文件的主要格式匹配，混合格式的行按特征分派到其他格式"""
+        if format_name in self.matcher.formats:
+            parse_line = self.matcher.parse
+            for line_num, line in enumerate(lines, start_line):
+                line = line.strip()
+                if not line:
+                    continue
+                
+                line_format, log_entry = parse_line(line, format_name)
+                if log_entry is not None:
+                    log_entry['line_number'] = line_num
+                    log_entry['file_name'] = file_name
+                    log_entry['format'] = line_format
+                    yield log_entry
+        else:
+            # 未知格式，按行处理
+            for line_num, line in enumerate(lines, start_line):
+                line = line.strip()
+                if line:
+                    yield {
+                        'line_number': line_num,
+                        'file_name': file_name,
+                        'format': 'unknown',
+                        'raw_line': line
+                    }
+    
+    def detect_file_format(self, file_path):
+        """读取文件开头的采样行检测日志格式"""
+        with self.open_log_file(file_path) as f:
+            sample_lines = list(islice(f, FORMAT_SAMPLE_LINES))
+        format_name, _ = self.detect_log_format(sample_lines)
+        return format_name
+    
+    def split_log_file(self, file_path, start, end):
+        """将未压缩文件的 [start, end) 拆分为按换行对齐的字节区间"""
+        if self.workers == 1 or end - start <= self.chunk_size:
+            return [(start, end)]
         
-        return 'unknown', None
+        ranges = []
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            while start < end:
+                range_end = start + self.chunk_size
+                if range_end >= end:
+                    range_end = end
+                else:
+                    # 区间结束位置对齐到下一个换行符之后
+                    newline = mm.find(b'\n', range_end - 1, end)
+                    range_end = end if newline == -1 else newline + 1
+                ranges.append((start, range_end))
+                start = range_end
+        return ranges
     
-    def parse_log_file(self, file_path):
-        """解析单个日志文件"""
+    def complete_lines_end(self, file_path, start, size):
+        """返回 [start, size) 中最后一个完整行的结束位置，未写完的行留到下次解析"""
+        if size <= start:
+            return start
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            newline = mm.rfind(b'\n', start, size)
+        return start if newline == -1 else newline + 1
+    
+    def count_lines(self, file_path, start, end):
+        """统计字节区间内的换行数，用于计算各区间的起始行号"""
+        count = 0
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for block_start in range(start, end, COUNT_BLOCK_SIZE):
+                block_end = min(block_start + COUNT_BLOCK_SIZE, end)
+                count += mm[block_start:block_end].count(b'\n')
+        return count
+    
+    def iter_log_range(self, file_path, start, end, start_line, format_name):
+        """通过内存映射解析文件中的一个字节区间"""
+        try:
+            with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                mm.seek(start)
+                
+                def read_lines():
+                    while mm.tell() < end:
+                        yield mm.readline().decode('utf-8', errors='ignore')
+                
+                yield from self.parse_lines(read_lines(), format_name, file_path.name, start_line)
+        
+        except Exception as e:
+            self.logger.error(f"解析文件区间失败 {file_path} [{start}, {end}): {e}")
+    
+    def iter_log_file(self, file_path, on_format=None):
+        """流式解析单个日志文件，逐条生成记录，内存占用与文件大小无关；检测到格式后调用 on_format(格式名)"""
         self.logger.info(f"解析日志文件: {file_path}")
         
         try:
-            # 处理压缩文件
-            if file_path.suffix == '.gz':
-                with gzip.open(file_path, 'rt', encoding='utf-8', errors='ignore') as f:
-                    lines = f.readlines()
-            else:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    lines = f.readlines()
-            
-            if not lines:
-                return []
-            
-            # 检测日志格式
-            format_name, pattern = self.detect_log_format(lines)
-            self.logger.info(f"检测到日志格式: {format_name}")
-            
-            parsed_logs = []
-            
-            if pattern:
-                for line_num, line in enumerate(lines, 1):
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    match = re.match(pattern, line)
-                    if match:
-                        log_entry = match.groupdict()
-                        log_entry['line_number'] = line_num
-                        log_entry['file_name'] = file_path.name
-                        log_entry['format'] = format_name
-                        parsed_logs.append(log_entry)
-            else:
-                # 未知格式，按行处理
-                for line_num, line in enumerate(lines, 1):
-                    line = line.strip()
-                    if line:
-                        parsed_logs.append({
-                            'line_number': line_num,
-                            'file_name': file_path.name,
-                            'format': 'unknown',
-                            'raw_line': line
-                        })
-            
-            return parsed_logs
-            
+            with self.open_log_file(file_path) as f:
+                # 只读取开头若干行用于格式检测，其余行按需读取
+                sample_lines = list(islice(f, FORMAT_SAMPLE_LINES))
+                if not sample_lines:
+                    return
+                
+                format_name, _ = self.detect_log_format(sample_lines)
+                self.logger.info(f"检测到日志格式: {format_name}")
+                if on_format is not None:
+                    on_format(format_name)
+                
+                yield from self.parse_lines(chain(sample_lines, f), format_name, file_path.name)
+        
         except Exception as e:
             self.logger.error(f"解析文件失败 {file_path}: {e}")
-            return []
+    
+    def parse_log_file(self, file_path):
+        """解析单个日志文件"""
+        return list(self.iter_log_file(file_path))
+    
+    def create_file_stats(self, format_type):
+        """根据日志格式创建对应的流式统计器"""
+        if format_type in ['apache_access', 'nginx_access']:
+            return AccessLogStats(self.approximate)
+        elif format_type == 'application':
+            return ApplicationLogStats(self.approximate)
+        elif format_type == 'json':
+            return StructuredLogStats(self.approximate)
+        return EntryCountStats(self.approximate)
     
     def analyze_access_logs(self, logs):
         """分析访问日志"""
-        if not logs:
-            return {}
-        
-        df = pd.DataFrame(logs)
-        
-        analysis = {
-            'total_requests': len(df),
-            'unique_ips': df['ip'].nunique() if 'ip' in df.columns else 0,
-            'status_codes': df['status'].value_counts().to_dict() if 'status' in df.columns else {},
-            'top_ips': df['ip'].value_counts().head(10).to_dict() if 'ip' in df.columns else {},
-            'top_urls': df['url'].value_counts().head(10).to_dict() if 'url' in df.columns else {},
-            'methods': df['method'].value_counts().to_dict() if 'method' in df.columns else {},
-        }
-        
-        # 错误分析
-        if 'status' in df.columns:
-            error_logs = df[df['status'].astype(str).str.startswith(('4', '5'))]
-            analysis['error_count'] = len(error_logs)
-            analysis['error_rate'] = len(error_logs) / len(df) * 100
-        
-        return analysis
+        stats = AccessLogStats()
+        for log in logs:
+            stats.update(log)
+        return stats.result()
     
     def analyze_application_logs(self, logs):
         """分析应用日志"""
-        if not logs:
-            return {}
+        stats = ApplicationLogStats()
+        for log in logs:
+            stats.update(log)
+        return stats.result()
+    
+    def analyze_security_events(self, logs):
+        """分析安全事件"""
+        stats = SecurityEventStats(self.security_patterns)
+        for log in logs:
+            stats.update(log)
+        return stats.result()
+    
+    def generate_time_analysis(self, logs):
+        """生成时间分析"""
+        distribution = TimeDistribution()
+        for log in logs:
+            distribution.update(log)
+        return distribution.result()
+    
+    def iter_input_files(self):
+        """遍历输入目录中的日志文件"""
+        for log_file in self.input_dir.glob('**/*'):
+            if log_file.is_file() and (log_file.suffix in LOG_FILE_SUFFIXES or 'log' in log_file.name):
+                yield log_file
+    
+    def plan_range_tasks(self, executor, log_file, start, end, start_line, format_name):
+        """将文件的字节区间拆分为解析任务，返回任务列表和区间内的总行数"""
+        ranges = self.split_log_file(log_file, start, end)
+        if len(ranges) > 1:
+            self.logger.info(f"拆分大文件 {log_file}: {len(ranges)} 个区间, 格式: {format_name}")
         
-        df = pd.DataFrame(logs)
+        # 各区间的起始行号 = 起始行号 + 之前所有区间的换行数
+        line_counts = self.map_tasks(executor, self.count_lines, repeat(log_file),
+                                     [range_start for range_start, _ in ranges],
+                                     [range_end for _, range_end in ranges])
+        tasks = []
+        line_count = 0
+        for file_range, range_lines in zip(ranges, line_counts):
+            tasks.append((log_file, file_range + (start_line + line_count, format_name)))
+            line_count += range_lines
+        return tasks, line_count
+    
+    def plan_incremental(self, executor, log_file):
+        """增量模式：从检查点位置续读，文件轮转或截断时全量解析"""
+        entry = self.checkpoints.resume_entry(log_file)
+        stats = entry['state']['stats'] if entry else None
+        if stats is not None and stats.get('approximate') != self.approximate:
+            self.logger.info(f"统计模式或误差配置变化，全量解析: {log_file}")
+            entry = None
+        size = log_file.stat().st_size
+        plan = {'base': entry['state'] if entry else None, 'offset': size, 'line_count': 0, 'format': None}
         
-        analysis = {
-            'total_entries': len(df),
-            'log_levels': df['level'].value_counts().to_dict() if 'level' in df.columns else {},
-        }
+        # 压缩文件无法续读：未变化则直接复用统计，否则全量解析
+        if is_compressed(log_file):
+            if entry is not None and entry['offset'] == size:
+                self.logger.info(f"文件未变化，跳过: {log_file}")
+                return [], plan
+            plan['base'] = None
+            return [(log_file, None)], plan
         
-        # 错误和警告统计
-        if 'level' in df.columns:
-            error_logs = df[df['level'].isin(['ERROR', 'FATAL'])]
-            warning_logs = df[df['level'] == 'WARNING']
-            
-            analysis['error_count'] = len(error_logs)
-            analysis['warning_count'] = len(warning_logs)
+        start = entry['offset'] if entry else 0
+        line_count = entry['line_count'] if entry else 0
+        end = self.complete_lines_end(log_file, start, size)
+        plan['offset'] = end
+        plan['line_count'] = line_count
+        if end == start:
+            plan['format'] = entry['format'] if entry else None
+            return [], plan
         
-        return analysis
+        if entry is not None:
+            format_name = entry['format']
+            self.logger.info(f"增量解析 {log_file}: 从第 {line_count + 1} 行 ({start} 字节) 开始")
+        else:
+            format_name = self.detect_file_format(log_file)
+        
+        tasks, new_lines = self.plan_range_tasks(executor, log_file, start, end, line_count + 1, format_name)
+        plan['line_count'] = line_count + new_lines
+        plan['format'] = format_name
+        return tasks, plan
     
-    def analyze_security_events(self, logs):
-        """分析安全事件"""
-        security_patterns = [
-            r'failed login',
-            r'authentication failed',
-            r'invalid user',
-            r'brute force',
-            r'sql injection',
-            r'xss attack',
-            r'unauthorized access'
-        ]
+    def plan_tasks(self, executor, log_files):
+        """生成解析任务：并行模式下大文件拆分为多个区间，增量模式下只解析新增内容"""
+        tasks = []
+        plans = {}
+        for log_file in log_files:
+            if self.checkpoints is not None:
+                file_tasks, plans[str(log_file)] = self.plan_incremental(executor, log_file)
+                tasks.extend(file_tasks)
+                continue
+            
+            if self.workers == 1 or is_compressed(log_file):
+                tasks.append((log_file, None))
+                continue
+            
+            size = log_file.stat().st_size
+            if size <= self.chunk_size:
+                tasks.append((log_file, None))
+                continue
+            
+            format_name = self.detect_file_format(log_file)
+            file_tasks, _ = self.plan_range_tasks(executor, log_file, 0, size, 1, format_name)
+            tasks.extend(file_tasks)
+        return tasks, plans
+    
+    def new_file_state(self):
+        """单个文件的可合并统计状态"""
+        return {
+            'stats': None,
+            'security': SecurityEventStats(self.security_patterns),
+            'time': TimeDistribution()
+        }
+    
+    def merge_file_state(self, state, partial):
+        """将一个解析任务的部分结果合并到文件状态"""
+        if partial['stats'] is not None:
+            if state['stats'] is None:
+                state['stats'] = partial['stats']
+            else:
+                state['stats'].merge(partial['stats'])
+        state['security'].merge(partial['security'])
+        state['time'].merge(partial['time'])
+    
+    def finish_file_state(self, state):
+        """文件不再有部分结果时计算 (分析结果, 记录数)，并释放统计状态；没有记录时返回 None"""
+        stats, state['stats'] = state['stats'], None
+        return (stats.result(), stats.total) if stats is not None else None
+    
+    def dump_file_state(self, state):
+        """序列化文件状态，保存到检查点"""
+        return {
+            'stats': state['stats'].to_dict() if state['stats'] is not None else None,
+            'security': state['security'].to_dict(),
+            'time': state['time'].to_dict()
+        }
+    
+    def load_file_state(self, data):
+        """从检查点还原文件状态"""
+        stats = data['stats']
+        return {
+            'stats': FILE_STATS_KINDS[stats['kind']].from_dict(stats) if stats is not None else None,
+            'security': SecurityEventStats.from_dict(data['security'], self.security_patterns),
+            'time': TimeDistribution.from_dict(data['time'])
+        }
+    
+    def analyze_file(self, log_file, spool_path, file_range=None):
+        """流式解析并统计单个文件（或其中一个区间），返回可合并的部分结果"""
+        file_stats = None
+        security_stats = SecurityEventStats(self.security_patterns)
+        time_distribution = TimeDistribution()
+        max_bytes = self.memory_budget // self.workers if self.memory_budget is not None else None
+        spool = RecordSpool(spool_path, partitioned=self.partition, max_bytes=max_bytes)
+        # 分区模式下按标准化时间确定每条记录的分区
+        partition_parser = TimestampParser(TIMESTAMP_FORMATS, convert=standard_format) if self.partition else None
         
-        security_events = []
+        # 整个文件解析时使用解析前检测到的格式，不再为检测格式重新打开读取文件
+        formats = []
+        if file_range is None:
+            records = self.iter_log_file(log_file, on_format=formats.append)
+        else:
+            records = self.iter_log_range(log_file, *file_range)
         
-        for log in logs:
-            content = log.get('message', '') or log.get('raw_line', '')
-            for pattern in security_patterns:
-                if re.search(pattern, content, re.IGNORECASE):
-                    security_events.append({
-                        'type': pattern,
-                        'content': content,
-                        'file': log.get('file_name'),
-                        'line': log.get('line_number')
-                    })
+        try:
+            for log in records:
+                if file_stats is None:
+                    # 按文件的主要格式分析：混合格式文件中首行的格式不一定是主要格式，
+                    # 各区间的统计器类型必须一致才能合并
+                    format_name = file_range[3] if file_range is not None else formats[0]
+                    file_stats = self.create_file_stats(format_name)
+                file_stats.update(log)
+                security_stats.update(log)
+                time_distribution.update(log)
+                if partition_parser is not None:
+                    timestamp_str = log.get('timestamp')
+                    spool.write(log, partition_parser.parse(timestamp_str) if timestamp_str else None)
+                else:
+                    spool.write(log)
+        finally:
+            spool.close()
+            # 部分结果之后只用于合并，释放时间戳缓存，避免每个文件的统计状态各保留一份
+            time_distribution.parser.cache_clear()
+            if partition_parser is not None:
+                partition_parser.cache_clear()
         
         return {
-            'total_security_events': len(security_events),
-            'events_by_type': Counter([event['type'] for event in security_events]),
-            'events': security_events[:100]  # 限制返回数量
+            'file': str(log_file),
+            'stats': file_stats,
+            'security': security_stats,
+            'time': time_distribution,
+            'spool': spool
         }
     
-    def generate_time_analysis(self, logs):
-        """生成时间分析"""
-        time_analysis = {
-            'hourly_distribution': defaultdict(int),
-            'daily_distribution': defaultdict(int)
-        }
+    def write_parsed_logs(self, executor, spools, template_miner=None):
+        """按顺序合并各片段的暂存记录，保存为解析结果交接文件"""
+        fieldnames = RecordSpool.merge_fieldnames(spools)
+        if template_miner is not None:
+            # 第一遍按顺序聚类全部未知格式行，第二遍写入时按最终模板编码，结果与进程数无关
+            for spool in spools:
+                if 'raw_line' in spool.fieldnames:
+                    for batch in spool.iter_batches():
+                        template_miner.add_batch(batch)
+            template_miner.finalize()
+            fieldnames = template_miner.encoded_fieldnames(fieldnames)
         
-        for log in logs:
-            timestamp_str = log.get('timestamp')
-            if timestamp_str:
-                try:
-                    # 尝试解析不同的时间格式
-                    for fmt in ['%d/%b/%Y:%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%b %d %H:%M:%S']:
-                        try:
-                            dt = datetime.strptime(timestamp_str.split()[0], fmt)
-                            time_analysis['hourly_distribution'][dt.hour] += 1
-                            time_analysis['daily_distribution'][dt.strftime('%Y-%m-%d')] += 1
-                            break
-                        except ValueError:
-                            continue
-                except Exception:
-                    continue
+        if self.partition:
+            return self.write_parsed_partitions(spools, fieldnames, template_miner)
+        parsed_file = handoff_path(self.output_dir, 'parsed_logs', self.handoff_format)
+        
+        if self.handoff_format == 'csv' and template_miner is None:
+            # 各片段并行转换为CSV后按顺序拼接
+            csv_parts = [spool.path.with_suffix('.csv') for spool in spools]
+            with open(parsed_file, 'w', encoding='utf-8', newline='') as f_out:
+                csv.writer(f_out, lineterminator='\n').writerow(fieldnames)
+                for csv_part in self.map_tasks(executor, RecordSpool.to_csv,
+                                               spools, csv_parts, repeat(fieldnames)):
+                    with open(csv_part, 'r', encoding='utf-8', newline='') as f_in:
+                        shutil.copyfileobj(f_in, f_out)
+        else:
+            with HandoffWriter(parsed_file, fieldnames, PARSED_LOG_COLUMNS, self.handoff_format) as writer:
+                for spool in spools:
+                    for batch in spool.iter_batches():
+                        if template_miner is not None:
+                            batch = template_miner.encode_batch(batch)
+                        writer.write_batch(batch)
+        
+        remove_handoff(self.output_dir, 'parsed_logs', keep=self.handoff_format)
+        remove_partitions(self.output_dir, 'parsed_logs')
+        return parsed_file
+    
+    def write_parsed_partitions(self, spools, fieldnames, template_miner=None):
+        """按日期/小时分区保存解析结果，每个分区写入一个本次运行的文件
+        
+        全量分析时替换整个分区目录；增量分析时只追加新文件，保留历史分区
+        """
+        root = self.output_dir / 'parsed_logs'
+        if self.checkpoints is None:
+            remove_partitions(self.output_dir, 'parsed_logs')
+        remove_handoff(self.output_dir, 'parsed_logs')
         
-        return dict(time_analysis)
+        part_name = f"part-{datetime.now():%Y%m%d%H%M%S%f}{HANDOFF_FORMATS[self.handoff_format]}"
+        partitions = sorted({partition for spool in spools for partition in spool.partitions})
+        for partition in partitions:
+            partition_path = root / partition
+            partition_path.mkdir(parents=True, exist_ok=True)
+            infos = [(spool, spool.partitions[partition]) for spool in spools if partition in spool.partitions]
+            with HandoffWriter(partition_path / part_name, fieldnames, PARSED_LOG_COLUMNS, self.handoff_format) as writer:
+                for spool, info in infos:
+                    for batch in spool.iter_batches(info['offsets']):
+                        if template_miner is not None:
+                            batch = template_miner.encode_batch(batch)
+                        writer.write_batch(batch)
+            
+            timestamps = [info['min_timestamp'] for _, info in infos if info['min_timestamp']]
+            latest = [info['max_timestamp'] for _, info in infos if info['max_timestamp']]
+            update_partition_stats(partition_path, part_name, sum(info['rows'] for _, info in infos),
+                                   min(timestamps, default=None), max(latest, default=None))
+        return root
+    
+    def map_tasks(self, executor, func, *iterables):
+        """按输入顺序返回结果；有进程池时并行执行"""
+        if executor is None:
+            return map(func, *iterables)
+        return executor.map(func, *iterables)
     
     def run_analysis(self):
         """运行完整分析"""
-        self.logger.info("开始日志分析")
+        self.logger.info(f"开始日志分析 (进程数: {self.workers})")
         
-        all_logs = []
-        file_analyses = {}
+        security_stats = SecurityEventStats(self.security_patterns)
+        time_distribution = TimeDistribution()
+        spools = []
         
-        # 处理所有日志文件
-        for log_file in self.input_dir.glob('**/*'):
-            if log_file.is_file() and (log_file.suffix in ['.log', '.gz'] or 'log' in log_file.name):
-                logs = self.parse_log_file(log_file)
-                all_logs.extend(logs)
-                
-                if logs:
-                    # 按格式分析
-                    format_type = logs[0].get('format', 'unknown')
-                    
-                    if format_type in ['apache_access', 'nginx_access']:
-                        analysis = self.analyze_access_logs(logs)
-                    elif format_type == 'application':
-                        analysis = self.analyze_application_logs(logs)
-                    else:
-                        analysis = {'total_entries': len(logs)}
-                    
-                    file_analyses[str(log_file)] = analysis
-        
-        # 生成综合分析报告
-        comprehensive_analysis = {
-            'summary': {
-                'total_files': len(file_analyses),
-                'total_log_entries': len(all_logs),
-                'analysis_timestamp': datetime.now().isoformat()
-            },
-            'file_analyses': file_analyses,
-            'security_analysis': self.analyze_security_events(all_logs),
-            'time_analysis': self.generate_time_analysis(all_logs)
-        }
+        # 解析结果先分批写入临时文件，避免在内存中累积全部记录
+        spool_dir = self.output_dir / '.spool'
+        spool_dir.mkdir(exist_ok=True)
         
-        # 保存分析结果
-        output_file = self.output_dir / 'analysis_results.json'
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(comprehensive_analysis, f, indent=2, ensure_ascii=False)
+        # 模板挖掘：增量分析时在已有模板上继续聚类，已保存的模板编号保持不变
+        template_miner = None
+        template_file = self.output_dir / TEMPLATE_FILE
+        if self.mine_templates:
+            if self.checkpoints is not None and template_file.exists():
+                template_miner = TemplateMiner.load(template_file)
+            else:
+                template_miner = TemplateMiner()
+        elif self.checkpoints is None:
+            template_file.unlink(missing_ok=True)
         
-        # 保存解析后的日志数据
-        if all_logs:
-            df = pd.DataFrame(all_logs)
-            df.to_csv(self.output_dir / 'parsed_logs.csv', index=False)
+        executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        try:
+            input_files = list(self.iter_input_files())
+            tasks, plans = self.plan_tasks(executor, input_files)
+            log_files = [log_file for log_file, _ in tasks]
+            file_ranges = [file_range for _, file_range in tasks]
+            spool_paths = [spool_dir / f'{index:06d}.spool' for index in range(len(tasks))]
+            
+            # 每个文件的统计状态（增量模式下从检查点中的累计统计开始）
+            file_states = {}
+            for log_file in input_files:
+                plan = plans.get(str(log_file))
+                if plan is not None and plan['base'] is not None:
+                    file_states[str(log_file)] = self.load_file_state(plan['base'])
+                else:
+                    file_states[str(log_file)] = self.new_file_state()
+            
+            # 按任务顺序合并各部分结果（同一文件的区间相邻），保证与串行输出一致；
+            # 非增量分析时一个文件的区间全部合并后即计算其结果并释放统计状态（各IP、URL的精确计数），
+            # 峰值内存只包含一个文件的统计状态，而不是全部文件的
+            file_results = {}
+            current = None
+            for partial in self.map_tasks(executor, self.analyze_file, log_files, spool_paths, file_ranges):
+                if partial['spool'].count:
+                    spools.append(partial['spool'])
+                if self.checkpoints is None and current not in (None, partial['file']):
+                    file_results[current] = self.finish_file_state(file_states[current])
+                current = partial['file']
+                self.merge_file_state(file_states[partial['file']], partial)
+            
+            # 按文件顺序汇总
+            file_analyses = {}
+            total_entries = 0
+            for file_name, state in file_states.items():
+                security_stats.merge(state['security'])
+                time_distribution.merge(state['time'])
+                result = file_results.get(file_name)
+                if result is None and state['stats'] is not None:
+                    result = state['stats'].result(), state['stats'].total
+                if result is not None:
+                    file_analyses[file_name], total = result
+                    total_entries += total
+            new_entries = sum(spool.count for spool in spools)
+            
+            # 生成综合分析报告
+            comprehensive_analysis = {
+                'summary': {
+                    'total_files': len(file_analyses),
+                    'total_log_entries': total_entries,
+                    'analysis_timestamp': datetime.now().isoformat()
+                },
+                'file_analyses': file_analyses,
+                'security_analysis': security_stats.result(),
+                'time_analysis': time_distribution.result()
+            }
+            if self.checkpoints is not None:
+                comprehensive_analysis['summary']['new_log_entries'] = new_entries
+            
+            # 保存解析后的日志数据，增量模式下只包含本次新解析的记录
+            if not new_entries and self.checkpoints is not None:
+                remove_handoff(self.output_dir, 'parsed_logs')  # 避免下游重复处理上次的数据（分区目录为历史数据，保留）
+            if new_entries:
+                self.write_parsed_logs(executor, spools, template_miner)
+            if template_miner is not None:
+                template_miner.save(template_file)
+                comprehensive_analysis['template_analysis'] = template_miner.result()
+            
+            # 保存分析结果
+            output_file = self.output_dir / 'analysis_results.json'
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(comprehensive_analysis, f, indent=2, ensure_ascii=False)
+            
+            # 输出写完后再更新检查点
+            if self.checkpoints is not None:
+                for file_name, plan in plans.items():
+                    self.checkpoints.update(Path(file_name), plan['offset'], plan['line_count'],
+                                            plan['format'], self.dump_file_state(file_states[file_name]))
+                self.checkpoints.save()
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            shutil.rmtree(spool_dir, ignore_errors=True)
         
         self.logger.info(f"分析完成，结果保存到: {output_file}")
         return comprehensive_analysis
+    
+    def start_tailer(self, log_file, from_end):
+        """打开文件开始跟踪；from_end 时跳过已有的完整行，并按已有内容检测格式"""
+        tailer = FileTailer(log_file)
+        if from_end and tailer.size:
+            try:
+                offset = self.complete_lines_end(log_file, 0, tailer.size)
+                tailer.seek(offset, self.count_lines(log_file, 0, offset))
+                tailer.format_name = self.detect_file_format(log_file)
+            except Exception:
+                tailer.close()
+                raise
+        return tailer
+    
+    def follow(self, poll_interval=DEFAULT_POLL_INTERVAL, window=DEFAULT_FOLLOW_WINDOW, duration=None,
+               stop_event=None, on_event=None, timeseries_state=None):
+        """跟踪模式：持续解析输入目录中未压缩日志文件的新增行，实时输出安全事件和滑动窗口统计
+        
+        启动时已存在的文件从末尾开始读取，之后出现的文件（包括轮转后新建的文件）从头读取；
+        安全事件立即写入 security_events.jsonl，滚动统计每秒写入 follow_stats.json。
+        指定 timeseries_state 时按到达时间统计每分钟的记录数、错误率和各IP请求数，每分钟结束时与 EWMA 基线比较，
+        异常写入 timeseries_anomalies.jsonl，基线保存在状态文件中，下次跟踪或日志处理继续更新。
+        没有新内容时按 poll_interval 休眠；duration 秒后或 stop_event 被设置时停止。
+        """
+        self.logger.info(f"开始跟踪日志目录: {self.input_dir} (轮询间隔 {poll_interval}s, 窗口 {window}s)")
+        
+        scanner = SecurityScanner(self.security_patterns)
+        rolling = RollingWindow(window)
+        # (设备号, inode) -> FileTailer；finished 为已停止跟踪的轮转文件，避免被当作新文件重新读取
+        tailers = {}
+        finished = set()
+        stats_file = self.output_dir / 'follow_stats.json'
+        events_file = open(self.output_dir / 'security_events.jsonl', 'a', encoding='utf-8')
+        
+        detector = None
+        if timeseries_state is not None:
+            from log_timeseries import TimeSeriesDetector, minute_of  # 只有时间序列检测需要 numpy
+            
+            detector = TimeSeriesDetector(timeseries_state)
+            self.logger.info(f"时间序列基线 {timeseries_state}: {len(detector.ips)} 个IP")
+        
+        def detect_timeseries(anomalies):
+            for anomaly in anomalies:
+                self.logger.warning(f"时间序列异常 [{anomaly['type']}] {anomaly['description']}")
+                if on_event is not None:
+                    on_event(anomaly)
+            if anomalies:
+                with open(self.output_dir / 'timeseries_anomalies.jsonl', 'a', encoding='utf-8') as f:
+                    f.writelines(json.dumps(anomaly, ensure_ascii=False) + '\n' for anomaly in anomalies)
+        
+        def scan_files(from_end):
+            seen = set()
+            for log_file in self.iter_input_files():
+                # 压缩文件是轮转后的旧文件，内容已在压缩前读取
+                if is_compressed(log_file):
+                    continue
+                try:
+                    stat = log_file.stat()
+                    key = (stat.st_dev, stat.st_ino)
+                    seen.add(key)
+                    if key in tailers or key in finished:
+                        continue
+                    tailer = self.start_tailer(log_file, from_end)
+                except OSError as e:
+                    self.logger.warning(f"无法跟踪文件 {log_file}: {e}")
+                    continue
+                if tailer.key in tailers:
+                    tailer.close()
+                    continue
+                tailers[tailer.key] = tailer
+                self.logger.info(f"开始跟踪: {log_file}")
+            finished.intersection_update(seen)
+        
+        def process_lines(tailer, start_line, lines):
+            if tailer.format_name is None:
+                tailer.format_name, _ = self.detect_log_format([line for line in lines if line.strip()])
+                self.logger.info(f"检测到日志格式: {tailer.path} {tailer.format_name}")
+            
+            now = time.time()
+            found = False
+            records = observed = errors = 0
+            ip_counts = Counter()
+            for log in self.parse_lines(lines, tailer.format_name, tailer.name, start_line):
+                rolling.update(log, now)
+                if detector is not None:
+                    records += 1
+                    status = log.get('status')
+                    if status not in (None, ''):
+                        observed += 1
+                        errors += str(status).startswith(('4', '5'))
+                    if log.get('ip'):
+                        ip_counts[log['ip']] += 1
+                content = log.get('message', '') or log.get('raw_line', '') or ''
+                for event_type in scanner.scan(content):
+                    event = {'type': event_type, 'content': content, 'file': tailer.name,
+                             'line': log['line_number'], 'detected_at': datetime.now().isoformat()}
+                    rolling.add_security_event(event_type, now)
+                    events_file.write(json.dumps(event, ensure_ascii=False) + '\n')
+                    self.logger.warning(f"安全事件 [{event_type}] {tailer.name}:{log['line_number']} {content}")
+                    if on_event is not None:
+                        on_event(event)
+                    found = True
+            if found:
+                events_file.flush()
+            if records:
+                detect_timeseries(detector.add(minute_of(datetime.fromtimestamp(now)), records, observed, errors,
+                                               ip_counts))
+        
+        def emit_stats(last_total):
+            if detector is not None:
+                # 没有新记录时也按时间结束上一分钟，基线变化后保存
+                last_minute = detector.last_minute
+                detect_timeseries(detector.advance(minute_of(datetime.now())))
+                if detector.last_minute != last_minute:
+                    detector.save()
+            result = rolling.result()
+            result['updated_at'] = datetime.now().isoformat()
+            result['files'] = sorted(str(tailer.path) for tailer in tailers.values())
+            # 先写临时文件再替换，读取方不会看到写了一半的文件
+            temp_file = stats_file.with_name(stats_file.name + '.tmp')
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(result, f, indent=2, ensure_ascii=False)
+            os.replace(temp_file, stats_file)
+            if result['total_entries'] != last_total:
+                self.logger.info(f"最近 {rolling.window} 秒: {result['entries']} 条, "
+                                 f"错误率 {result.get('error_rate', 0):.2f}%, "
+                                 f"安全事件 {sum(result['security_events_by_type'].values())} 个")
+            return result
+        
+        start = time.monotonic()
+        next_rescan = start + FOLLOW_RESCAN_INTERVAL
+        next_emit = start
+        last_total = 0
+        result = None
+        try:
+            scan_files(from_end=True)
+            while stop_event is None or not stop_event.is_set():
+                now = time.monotonic()
+                if duration is not None and now - start >= duration:
+                    break
+                
+                busy = False
+                rotated = False
+                for key, tailer in list(tailers.items()):
+                    # 路径已不存在或指向另一个文件：文件被轮转改名或删除，继续读完原句柄中的内容
+                    if not tailer.rotated:
+                        try:
+                            stat = tailer.path.stat()
+                            tailer.rotated = (stat.st_dev, stat.st_ino) != key
+                        except OSError:
+                            tailer.rotated = True
+                        if tailer.rotated:
+                            self.logger.info(f"检测到文件轮转: {tailer.path}")
+                            tailer.idle_since = now
+                            rotated = True
+                    
+                    start_line, lines = tailer.read_lines()
+                    if lines:
+                        busy = True
+                        process_lines(tailer, start_line, lines)
+                        tailer.idle_since = now
+                    elif tailer.rotated and now - tailer.idle_since >= ROTATED_IDLE_SECONDS:
+                        start_line, lines = tailer.drain_pending()
+                        if lines:
+                            process_lines(tailer, start_line, lines)
+                        tailer.close()
+                        del tailers[key]
+                        finished.add(key)
+                        self.logger.info(f"停止跟踪轮转后的文件: {tailer.name}")
+                
+                if rotated or now >= next_rescan:
+                    scan_files(from_end=False)
+                    next_rescan = now + FOLLOW_RESCAN_INTERVAL
+                
+                if now >= next_emit:
+                    result = emit_stats(last_total)
+                    last_total = result['total_entries']
+                    next_emit = now + FOLLOW_EMIT_INTERVAL
+                
+                # 还有未读完的数据时立即继续，否则休眠到下一次轮询
+                if not busy:
+                    if stop_event is not None:
+                        stop_event.wait(poll_interval)
+                    else:
+                        time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            result = emit_stats(last_total)
+            for tailer in tailers.values():
+                tailer.close()
+            events_file.close()
+            if detector is not None:
+                detector.save()  # 保留未结束的一分钟，下次继续计入
+        
+        self.logger.info(f"停止跟踪，共解析 {result['total_entries']} 条记录，"
+                         f"安全事件 {result['total_security_events']} 个")
+        return result
 
 def main():
     parser = argparse.ArgumentParser(description='日志分析工具')
     parser.add_argument('--input', required=True, help='输入日志目录')
     parser.add_argument('--output', required=True, help='输出分析结果目录')
+    parser.add_argument('--workers', type=int, default=1, help='并行解析文件的进程数（默认1，串行）')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE // (1024 * 1024),
+                        help='并行模式下大文件的拆分区间大小（MB）')
+    parser.add_argument('--incremental', action='store_true', help='增量分析：只解析上次运行后新增的内容')
+    parser.add_argument('--checkpoint', help='检查点文件路径（默认: 输出目录/checkpoints.json）')
+    parser.add_argument('--fast-path', action='store_true', help='访问日志使用分词快速路径（无法切分时回退正则）')
+    parser.add_argument('--handoff-format', choices=['csv', 'feather', 'parquet'], default='csv',
+                        help='解析结果 parsed_logs 的保存格式（feather/parquet 需要 pyarrow）')
+    parser.add_argument('--partition', action='store_true',
+                        help='解析结果按日期/小时分区保存到 parsed_logs/ 目录（增量模式下追加新分区文件）')
+    parser.add_argument('--mine-templates', action='store_true',
+                        help='未知格式的行聚类为模板，解析结果只保存模板编号和参数（模板保存在 log_templates.json）')
+    parser.add_argument('--memory-budget', type=float,
+                        help='解析记录缓冲区的内存预算（MB，各进程平分），超出时写入暂存文件；默认每 10000 条写入一次')
+    parser.add_argument('--approximate', action='store_true',
+                        help='近似统计：去重IP数用HyperLogLog，Top IP/URL用Space-Saving，内存固定')
+    parser.add_argument('--distinct-error', type=float, default=DEFAULT_DISTINCT_ERROR,
+                        help='近似模式下去重计数的目标相对误差（默认0.01）')
+    parser.add_argument('--top-error', type=float, default=DEFAULT_TOP_ERROR,
+                        help='近似模式下Top N计数最大高估量占总数的比例（默认0.001）')
+    parser.add_argument('--follow', action='store_true',
+                        help='跟踪模式：持续解析新增日志行，实时输出安全事件和滑动窗口统计（Ctrl+C 停止）')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help='跟踪模式下没有新内容时的轮询间隔（秒，默认0.25）')
+    parser.add_argument('--window', type=int, default=DEFAULT_FOLLOW_WINDOW,
+                        help='跟踪模式下滚动统计的窗口长度（秒，默认60）')
+    parser.add_argument('--follow-seconds', type=float, help='跟踪指定秒数后退出（默认一直运行）')
+    parser.add_argument('--windowed-detection', action='store_true',
+                        help='跟踪模式按分钟的时间序列异常检测：每分钟记录数、错误率和各IP请求数与 EWMA 基线比较')
+    parser.add_argument('--timeseries-state', help='时间序列基线状态文件路径（默认: 输出目录/timeseries_state.json）')
     args = parser.parse_args()
     
-    analyzer = LogAnalyzer(args.input, args.output)
-    analyzer.run_analysis()
+    checkpoint_file = None
+    if args.incremental:
+        checkpoint_file = args.checkpoint or Path(args.output) / 'checkpoints.json'
+    
+    approximate = None
+    if args.approximate:
+        approximate = {'distinct_error': args.distinct_error, 'top_error': args.top_error}
+    
+    analyzer = LogAnalyzer(args.input, args.output, workers=args.workers,
+                           chunk_size=args.chunk_size * 1024 * 1024, checkpoint_file=checkpoint_file,
+                           fast_path=args.fast_path, approximate=approximate,
+                           handoff_format=args.handoff_format, partition=args.partition,
+                           mine_templates=args.mine_templates,
+                           memory_budget=int(args.memory_budget * 1024 * 1024) if args.memory_budget else None)
+    if args.follow:
+        timeseries_state = None
+        if args.windowed_detection:
+            timeseries_state = args.timeseries_state or Path(args.output) / 'timeseries_state.json'
+        analyzer.follow(poll_interval=args.poll_interval, window=args.window, duration=args.follow_seconds,
+                        timeseries_state=timeseries_state)
+    else:
+        analyzer.run_analysis()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
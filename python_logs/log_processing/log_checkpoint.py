@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+增量分析检查点
+记录每个日志文件已解析到的位置、文件头指纹和累计统计，供下次运行只解析新增内容
+"""
+
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+from pathlib import Path
+
+# 文件头指纹使用的最大字节数
+FINGERPRINT_BYTES = 4096
+
+class CheckpointStore:
+    def __init__(self, path):
+        """初始化检查点存储"""
+        self.path = Path(path)
+        self.logger = logging.getLogger(__name__)
+        self.entries = self.load()
+        self.seen_keys = set()
+    
+    def load(self):
+        """加载检查点文件"""
+        if not self.path.exists():
+            return {}
+        
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.error(f"加载检查点失败 {self.path}: {e}，将全量解析")
+            return {}
+    
+    def save(self):
+        """保存检查点（先写临时文件再替换，避免中断时损坏），并清理本次未出现的文件"""
+        entries = {key: entry for key, entry in self.entries.items() if key in self.seen_keys}
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.entries = entries
+    
+    @staticmethod
+    def file_key(file_path):
+        """检查点键：(设备号, inode, 路径)"""
+        stat = file_path.stat()
+        return f"{stat.st_dev}:{stat.st_ino}:{file_path.resolve()}"
+    
+    @staticmethod
+    def fingerprint(file_path, length):
+        """计算文件开头 length 字节的指纹"""
+        with open(file_path, 'rb') as f:
+            head = f.read(length)
+        return hashlib.blake2b(head, digest_size=16).hexdigest()
+    
+    def resume_entry(self, file_path):
+        """返回可以续读的检查点；文件轮转、截断或被改写时返回 None"""
+        key = self.file_key(file_path)
+        self.seen_keys.add(key)
+        entry = self.entries.get(key)
+        
+        if entry is None:
+            path = str(file_path.resolve())
+            if any(old['path'] == path for old in self.entries.values()):
+                self.logger.info(f"检测到文件轮转，全量解析: {file_path}")
+            return None
+        
+        size = file_path.stat().st_size
+        if size < entry['offset']:
+            self.logger.info(f"检测到文件截断，全量解析: {file_path}")
+            return None
+        
+        if self.fingerprint(file_path, entry['fingerprint_size']) != entry['fingerprint']:
+            self.logger.info(f"文件头指纹变化，全量解析: {file_path}")
+            return None
+        
+        return entry
+    
+    def update(self, file_path, offset, line_count, format_name, state):
+        """记录文件新的解析位置和累计统计"""
+        fingerprint_size = min(FINGERPRINT_BYTES, offset)
+        key = self.file_key(file_path)
+        self.seen_keys.add(key)
+        self.entries[key] = {
+            'path': str(file_path.resolve()),
+            'offset': offset,
+            'line_count': line_count,
+            'format': format_name,
+            'fingerprint': self.fingerprint(file_path, fingerprint_size),
+            'fingerprint_size': fingerprint_size,
+            'state': state,
+            'updated_at': datetime.now().isoformat()
+        }
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+压缩日志编解码
+按扩展名选择编解码器（gzip、bz2、xz，安装 zstandard 时支持 zstd），收集阶段压缩、分析阶段读取共用。
+读取时由后台线程以大块读取压缩数据、直接交给解压对象，解压后的数据块经有界队列交给解析线程：
+zlib/bz2/lzma/zstd 解压时释放 GIL，每次解压大块数据时解压与解析可以并行，解析线程不必等待解压
+"""
+
+import io
+import bz2
+import zlib
+import gzip
+import lzma
+import queue
+import shutil
+import threading
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+# 后台线程每次读取的压缩数据字节数
+COMPRESSED_READ_SIZE = 256 * 1024
+# 读取方的缓冲区大小（解压后的字节数）
+READ_BUFFER_SIZE = 1024 * 1024
+# 后台线程预先解压的块数（内存占用约为 COMPRESSED_READ_SIZE * 压缩比 * PREFETCH_BLOCKS）
+PREFETCH_BLOCKS = 8
+# 写入压缩文件时每次复制的字节数
+COPY_BUFFER_SIZE = 1024 * 1024
+
+def _open_zstd(path, mode):
+    return zstandard.open(path, mode)
+
+def _gzip_decompressor():
+    # wbits = 16 + MAX_WBITS：带 gzip 头和校验
+    return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+def _zstd_decompressor():
+    return zstandard.ZstdDecompressor().decompressobj()
+
+class Codec:
+    """一种压缩格式：名称、扩展名、以二进制方式打开的函数和创建解压对象的函数
+    
+    解压对象提供 decompress()、eof 和 unused_data（zlib/bz2/lzma 的解压对象均如此），
+    一个文件可以由多段压缩流拼接而成，每段结束后用新的解压对象继续
+    """
+    
+    def __init__(self, name, suffix, opener, decompressor):
+        self.name = name
+        self.suffix = suffix
+        self.opener = opener
+        self.decompressor = decompressor
+    
+    def open(self, path, mode='rb'):
+        return self.opener(path, mode)
+    
+    def iter_blocks(self, file, read_size=COMPRESSED_READ_SIZE):
+        """按块读取压缩数据并解压，逐块返回解压后的数据
+        
+        文件在一段压缩流结束前中断（如复制不完整）时抛出 EOFError，与 gzip.open 等一致
+        """
+        decompressor = self.decompressor()
+        started = False
+        while True:
+            data = file.read(read_size)
+            if not data:
+                break
+            while data:
+                started = True
+                block = decompressor.decompress(data)
+                if block:
+                    yield block
+                if not decompressor.eof:
+                    break
+                # 一段压缩流结束，剩余数据属于下一段（文件末尾的零填充忽略）
+                data = decompressor.unused_data
+                if not data.strip(b'\0'):
+                    data = b''
+                decompressor = self.decompressor()
+                started = False
+        if started:
+            raise EOFError(f"{self.name} 压缩数据在流结束前中断")
+
+# 按名称登记的编解码器，未安装可选依赖的格式不登记
+CODECS = {
+    'gzip': Codec('gzip', '.gz', gzip.open, _gzip_decompressor),
+    'bz2': Codec('bz2', '.bz2', bz2.open, bz2.BZ2Decompressor),
+    'xz': Codec('xz', '.xz', lzma.open, lzma.LZMADecompressor),
+}
+if HAS_ZSTD:
+    CODECS['zstd'] = Codec('zstd', '.zst', _open_zstd, _zstd_decompressor)
+
+# 扩展名 -> 编解码器
+SUFFIX_CODECS = {codec.suffix: codec for codec in CODECS.values()}
+# 所有已知的压缩扩展名（包括未安装依赖的格式，这类文件不会被当作文本读取）
+COMPRESSED_SUFFIXES = {'.gz', '.bz2', '.xz', '.zst'}
+
+def codec_for(path):
+    """返回文件对应的编解码器，未压缩或不支持的格式返回 None"""
+    return SUFFIX_CODECS.get(path.suffix)
+
+def is_compressed(path):
+    """是否为压缩文件（不能按字节区间拆分或续读）"""
+    return path.suffix in COMPRESSED_SUFFIXES
+
+class PrefetchReader(io.RawIOBase):
+    """在后台线程中读取并解压压缩文件，读取方从队列中取出解压后的数据块"""
+    
+    def __init__(self, source, codec, prefetch=PREFETCH_BLOCKS):
+        super().__init__()
+        self.source = source
+        self.codec = codec
+        self.blocks = queue.Queue(maxsize=prefetch)
+        self.stopped = threading.Event()
+        self.current = memoryview(b'')
+        self.finished = False
+        self.thread = threading.Thread(target=self.fill, daemon=True)
+        self.thread.start()
+    
+    def fill(self):
+        """后台线程：读取数据块放入队列，结束时放入 None，出错时放入异常"""
+        try:
+            for block in self.codec.iter_blocks(self.source):
+                if self.stopped.is_set():
+                    return
+                self.put(block)
+        except Exception as e:
+            self.put(e)
+            return
+        self.put(None)
+    
+    def put(self, item):
+        """放入队列；读取方已关闭时放弃"""
+        while not self.stopped.is_set():
+            try:
+                self.blocks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        while not self.current and not self.finished:
+            block = self.blocks.get()
+            if block is None:
+                self.finished = True
+            elif isinstance(block, Exception):
+                self.finished = True
+                raise block
+            else:
+                self.current = memoryview(block)
+        
+        size = min(len(buffer), len(self.current))
+        buffer[:size] = self.current[:size]
+        self.current = self.current[size:]
+        return size
+    
+    def close(self):
+        if not self.closed:
+            self.stopped.set()
+            self.thread.join()
+            self.source.close()
+        super().close()
+
+def open_binary(path, prefetch=True):
+    """以二进制方式打开日志文件，压缩文件透明解压；prefetch 为 True 时在后台线程中解压"""
+    codec = codec_for(path)
+    if codec is None:
+        if is_compressed(path):
+            raise ValueError(f"不支持的压缩格式（缺少依赖）: {path}")
+        return open(path, 'rb', buffering=READ_BUFFER_SIZE)
+    
+    if not prefetch:
+        return io.BufferedReader(codec.open(path, 'rb'), buffer_size=READ_BUFFER_SIZE)
+    return io.BufferedReader(PrefetchReader(open(path, 'rb'), codec), buffer_size=READ_BUFFER_SIZE)
+
+def open_text(path, prefetch=True):
+    """以文本方式打开日志文件（UTF-8，忽略无法解码的字节），压缩文件透明解压"""
+    if codec_for(path) is None and not is_compressed(path):
+        return open(path, 'r', encoding='utf-8', errors='ignore')
+    return io.TextIOWrapper(open_binary(path, prefetch), encoding='utf-8', errors='ignore')
+
+def compress_file(source_path, codec_name='gzip'):
+    """按指定格式压缩文件，返回压缩后的路径（源文件保留，由调用方删除）"""
+    codec = CODECS.get(codec_name)
+    if codec is None:
+        raise ValueError(f"不支持的压缩格式: {codec_name}（可用: {', '.join(CODECS)}）")
+    
+    target_path = source_path.with_name(source_path.name + codec.suffix)
+    with open(source_path, 'rb') as f_in, codec.open(target_path, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out, COPY_BUFFER_SIZE)
+    return target_path
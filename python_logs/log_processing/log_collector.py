@@ -14,8 +14,8 @@ import requests
 from datetime import datetime, timedelta
 from pathlib import Path
 import ftplib
-import gzip
-import shutil
+
+from log_codecs import CODECS, compress_file
 
 class LogCollector:
     def __init__(self, config_file):
@@ -146,15 +146,16 @@ class LogCollector:
         except Exception as e:
             self.logger.error(f"FTP 连接失败: {e}")
     
-    def compress_logs(self, directory):
-        """压缩日志文件"""
+    def compress_logs(self, directory, codec_name='gzip'):
+        """压缩日志文件（gzip / bz2 / xz / zstd）"""
+        if codec_name not in CODECS:
+            self.logger.warning(f"不支持的压缩格式 {codec_name}（可用: {', '.join(CODECS)}），改用 gzip")
+            codec_name = 'gzip'
+        
         log_dir = Path(directory)
         for log_file in log_dir.glob('*.log'):
             try:
-                compressed_file = log_file.with_suffix('.log.gz')
-                with open(log_file, 'rb') as f_in:
-                    with gzip.open(compressed_file, 'wb') as f_out:
-                        shutil.copyfileobj(f_in, f_out)
+                compressed_file = compress_file(log_file, codec_name)
                 
                 log_file.unlink()  # 删除原文件
                 self.logger.info(f"压缩完成: {compressed_file}")
@@ -180,8 +181,9 @@ class LogCollector:
         
         # 压缩日志文件
         if self.config.get('compress_logs', False):
+            codec_name = self.config.get('compression', 'gzip')
             for server in self.config.get('servers', []):
-                self.compress_logs(server['local_path'])
+                self.compress_logs(server['local_path'], codec_name)
         
         self.logger.info("日志收集任务完成")
 
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+日志记录去重
+按列计算每条记录的 64 位内容哈希（有原文时按原文，否则按除行号、文件名等来源字段外的全部字段）；
+同一批次内按哈希去重，但没有原文的结构化记录字段相同时可能是不同的请求（如同一秒内同一 IP 的重复访问），
+批次内同时按来源字段区分，只丢弃同一行被重复读取的记录。
+跨运行去重索引保存已处理过的内容哈希，重叠收集的日志再次处理时直接丢弃：
+  - exact：排序的 uint64 数组（每条 8 字节，内存映射读取），没有误判
+  - bloom：固定大小的布隆过滤器，内存由容量和误判率决定，误判时新记录会被当作重复丢弃
+"""
+
+import os
+import math
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 来源字段：同一行日志被重复收集时这些字段会不同，不参与内容哈希
+PROVENANCE_COLUMNS = {'line_number', 'file_name'}
+# 固定的哈希密钥，保证不同运行、不同进程计算出的哈希相同
+HASH_KEY = 'log_dedup_index0'
+MIX_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+DEDUP_MODES = ['exact', 'bloom']
+# 各模式默认的索引文件名
+DEDUP_INDEX_FILES = {'exact': 'dedup_index.npy', 'bloom': 'dedup_bloom.npz'}
+DEFAULT_BLOOM_CAPACITY = 10_000_000
+DEFAULT_BLOOM_ERROR_RATE = 0.001
+# 布隆过滤器每次计算位置的哈希数（临时数组约为 此值 * 哈希位置数 * 8 字节）
+BLOOM_BATCH_SIZE = 1 << 18
+
+def name_hash(name):
+    return pd.util.hash_array(np.array([name], dtype=object), hash_key=HASH_KEY, categorize=False)[0]
+
+def column_hashes(name, values):
+    """按不同的值计算哈希并与列名混合，空值为 0"""
+    if values.dtype.kind == 'f' and (values.dropna() % 1 == 0).all():
+        # CSV 中有空值的整数列会读为浮点数，按整数计算，与没有空值时相同
+        values = values.astype('Int64')
+    codes, uniques = pd.factorize(values)
+    hashes = pd.util.hash_array(uniques.astype(str).to_numpy(dtype=object), hash_key=HASH_KEY, categorize=False)
+    hashes = (hashes ^ name_hash(name)) * MIX_MULTIPLIER
+    hashes ^= hashes >> np.uint64(29)
+    # 空值的编号 -1 对应末尾追加的 0
+    return np.append(hashes, np.uint64(0))[codes]
+
+def record_hashes(df):
+    """每条记录的 64 位内容哈希
+    
+    有原文（raw_line）的记录只按原文计算；其余记录为各非空字段哈希之和，与列的顺序、是否有全空的列无关
+    """
+    if 'raw_line' in df.columns:
+        hashes = column_hashes('raw_line', df['raw_line'])
+        missing = df['raw_line'].isna().to_numpy()
+        if not missing.any():
+            return hashes
+        rest = df[missing]
+    else:
+        hashes = np.zeros(len(df), dtype=np.uint64)
+        missing = slice(None)
+        rest = df
+    
+    record = np.zeros(len(rest), dtype=np.uint64)
+    for name in rest.columns:
+        if name not in PROVENANCE_COLUMNS and name != 'raw_line':
+            record += column_hashes(name, rest[name])
+    hashes[missing] = record
+    return hashes
+
+def batch_keys(df, hashes):
+    """批次内去重的键：有原文或模板编号的记录为内容哈希，其余记录再加上来源字段的哈希"""
+    content_columns = [col for col in ('raw_line', 'template_id') if col in df.columns]
+    structured = df[content_columns].isna().all(axis=1).to_numpy() if content_columns else np.ones(len(df), dtype=bool)
+    source_columns = [col for col in sorted(PROVENANCE_COLUMNS) if col in df.columns]
+    if not structured.any() or not source_columns:
+        return hashes
+    keys = hashes.copy()
+    rest = df[structured]
+    for name in source_columns:
+        keys[structured] += column_hashes(name, rest[name])
+    return keys
+
+def merge_sorted(existing, new):
+    """归并两个排序且互不相同的 uint64 数组（整数的稳定排序为基数排序，比按位置插入快）"""
+    return np.sort(np.concatenate([existing, new]), kind='stable')
+
+def sorted_contains(hashes, ordered):
+    """排序数组 hashes 中是否包含排序后的 ordered 中的每个哈希"""
+    if not len(hashes):
+        return np.zeros(len(ordered), dtype=bool)
+    positions = np.searchsorted(hashes, ordered).clip(max=len(hashes) - 1)
+    return hashes[positions] == ordered
+
+class SortedHashIndex:
+    """精确索引：排序去重的 uint64 数组，查找用二分，保存为 .npy 并以内存映射方式读取（path 为空时只在内存中使用）
+    
+    本次运行加入的哈希先保存为若干个排序数组（后一个不超过前一个的一半，超过时合并，数组个数为对数级），
+    保存时才与已保存的索引归并一次；分块处理每块加入一次，总开销不随块数平方增长
+    """
+    
+    kind = 'exact'
+    
+    def __init__(self, path=None):
+        self.path = Path(path) if path is not None else None
+        self.logger = logging.getLogger(__name__)
+        self.hashes = self.load()
+        self.runs = []
+    
+    def load(self):
+        if self.path is None or not self.path.exists():
+            return np.empty(0, dtype=np.uint64)
+        try:
+            hashes = np.load(self.path, mmap_mode='r')
+            if hashes.dtype != np.uint64 or hashes.ndim != 1:
+                raise ValueError(f"不是 uint64 数组: {hashes.dtype}")
+            return hashes
+        except Exception as e:
+            self.logger.error(f"加载去重索引失败 {self.path}: {e}，将重新建立")
+            return np.empty(0, dtype=np.uint64)
+    
+    def __len__(self):
+        return len(self.hashes) + sum(len(run) for run in self.runs)
+    
+    def memory_bytes(self):
+        return self.hashes.nbytes + sum(run.nbytes for run in self.runs)
+    
+    def contains(self, hashes):
+        """返回每个哈希是否已在索引中（先排序再二分，顺序访问索引）"""
+        order = np.argsort(hashes)
+        ordered = hashes[order]
+        found_ordered = sorted_contains(self.hashes, ordered)
+        for run in self.runs:
+            found_ordered |= sorted_contains(run, ordered)
+        found = np.empty(len(hashes), dtype=bool)
+        found[order] = found_ordered
+        return found
+    
+    def add(self, hashes):
+        """加入不在索引中的哈希"""
+        new = np.sort(hashes)
+        new = new[np.append(True, new[1:] != new[:-1])] if len(new) else new
+        new = new[~self.contains(new)]
+        if not len(new):
+            return
+        self.runs.append(new)
+        while len(self.runs) > 1 and len(self.runs[-2]) <= 2 * len(self.runs[-1]):
+            last = self.runs.pop()
+            self.runs[-1] = merge_sorted(self.runs[-1], last)
+    
+    def save(self):
+        """本次加入的哈希归并进已保存的索引，先写临时文件再替换，避免中断时损坏"""
+        if self.runs:
+            new = np.empty(0, dtype=np.uint64)
+            for run in reversed(self.runs):
+                new = merge_sorted(run, new)
+            self.hashes = merge_sorted(self.hashes, new)
+            self.runs = []
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.hashes))
+        os.replace(tmp_path, self.path)
+
+class BloomHashIndex:
+    """近似索引：布隆过滤器，位数组大小由容量和误判率决定，保存为 .npz"""
+    
+    kind = 'bloom'
+    
+    def __init__(self, path, capacity=DEFAULT_BLOOM_CAPACITY, error_rate=DEFAULT_BLOOM_ERROR_RATE):
+        self.path = Path(path)
+        self.logger = logging.getLogger(__name__)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # m = -n ln p / (ln 2)^2 位，k = m / n ln 2 个哈希位置
+        bits = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.size = bits + (-bits) % 64
+        self.probes = max(1, round(self.size / capacity * math.log(2)))
+        self.words = np.zeros(self.size // 64, dtype=np.uint64)
+        self.count = 0
+        self.load()
+    
+    def load(self):
+        if not self.path.exists():
+            return
+        try:
+            with np.load(self.path) as data:
+                size, probes, count = (int(value) for value in data['params'])
+                words = data['words']
+        except Exception as e:
+            self.logger.error(f"加载去重索引失败 {self.path}: {e}，将重新建立")
+            return
+        if size != self.size or probes != self.probes:
+            # 位数组大小由保存时的参数决定，沿用已有的过滤器
+            self.logger.warning(f"去重索引 {self.path} 按其他容量/误判率建立（{size} 位, {probes} 个哈希位置），沿用原参数")
+            self.size, self.probes = size, probes
+        self.words = words
+        self.count = count
+    
+    def __len__(self):
+        return self.count
+    
+    def memory_bytes(self):
+        return self.words.nbytes
+    
+    def positions(self, hashes):
+        """双重哈希：第 i 个位置为 (h1 + i * h2) mod m，返回 (哈希数, 位置数) 的位下标"""
+        low = hashes & np.uint64(0xFFFFFFFF)
+        high = (hashes >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.probes, dtype=np.uint64)
+        return (low[:, None] + steps[None, :] * high[:, None]) % np.uint64(self.size)
+    
+    def contains(self, hashes):
+        """返回每个哈希是否可能已在索引中（已加入的一定返回 True，未加入的按误判率返回 True）"""
+        found = np.empty(len(hashes), dtype=bool)
+        for start in range(0, len(hashes), BLOOM_BATCH_SIZE):
+            bits = self.positions(np.asarray(hashes[start:start + BLOOM_BATCH_SIZE], dtype=np.uint64))
+            words = self.words[bits >> np.uint64(6)]
+            found[start:start + len(bits)] = ((words >> (bits & np.uint64(63))) & np.uint64(1)).astype(bool).all(axis=1)
+        return found
+    
+    def add(self, hashes):
+        for start in range(0, len(hashes), BLOOM_BATCH_SIZE):
+            bits = self.positions(np.asarray(hashes[start:start + BLOOM_BATCH_SIZE], dtype=np.uint64)).ravel()
+            np.bitwise_or.at(self.words, bits >> np.uint64(6), np.uint64(1) << (bits & np.uint64(63)))
+        self.count += len(hashes)
+        if self.count > self.capacity:
+            self.logger.warning(f"去重索引已记录 {self.count} 条，超过容量 {self.capacity}，误判率将高于 {self.error_rate}")
+    
+    def save(self):
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, words=self.words, params=np.array([self.size, self.probes, self.count], dtype=np.int64))
+        os.replace(tmp_path, self.path)
+
+def open_dedup_index(path, mode='exact', capacity=DEFAULT_BLOOM_CAPACITY, error_rate=DEFAULT_BLOOM_ERROR_RATE):
+    """按模式打开跨运行去重索引"""
+    if mode == 'exact':
+        return SortedHashIndex(path)
+    if mode == 'bloom':
+        return BloomHashIndex(path, capacity, error_rate)
+    raise ValueError(f"不支持的去重索引模式: {mode}（可用: {', '.join(DEDUP_MODES)}）")
+
+def drop_duplicates(df, index=None, seen=None):
+    """批次内按去重键去重（保留第一条），seen 非空时同时丢弃本次运行前面批次中的记录（按去重键），
+    index 非空时同时丢弃以前运行中出现过的记录（按内容哈希）
+    
+    返回 (去重后的 DataFrame, 保留记录的内容哈希, 保留记录的去重键)，内容哈希在处理结果保存后再加入索引
+    """
+    hashes = record_hashes(df)
+    keys = batch_keys(df, hashes)
+    keep = ~pd.Series(keys).duplicated().to_numpy()
+    if seen is not None and len(seen):
+        keep &= ~seen.contains(keys)
+    if index is not None and len(index):
+        keep &= ~index.contains(hashes)
+    return df[keep], hashes[keep], keys[keep]
@@ -17,6 +17,8 @@ from email.mime.multipart import MimeMultipart
 from email.mime.base import MimeBase
 from email import encoders
 
+from log_storage import parse_time_bound, read_handoff
+
 # 可选依赖导入
 try:
     from sqlalchemy import create_engine, text
@@ -70,13 +72,14 @@ class LogExporter:
         )
         self.logger = logging.getLogger(__name__)
     
-    def load_processed_data(self, data_dir):
-        """加载处理后的数据"""
+    def load_processed_data(self, data_dir, since=None, until=None):
+        """加载处理后的数据，since/until 为导出的时间范围（标准化时间字符串）"""
         data_path = Path(data_dir)
         
-        # 加载处理后的日志
-        logs_file = data_path / 'processed_logs.csv'
-        logs_df = pd.read_csv(logs_file) if logs_file.exists() else pd.DataFrame()
+        # 加载处理后的日志，分区目录只读取时间范围内的分区
+        logs_df = read_handoff(data_path, 'processed_logs', since=since, until=until)
+        if logs_df is None:
+            logs_df = pd.DataFrame()
         
         # 加载异常数据
         anomalies_file = data_path / 'anomalies.json'
@@ -376,12 +379,12 @@ class LogExporter:
             self.logger.error(f"文件导出失败: {e}")
             return False
     
-    def run_export(self, data_dir):
+    def run_export(self, data_dir, since=None, until=None):
         """运行导出任务"""
         self.logger.info("开始日志导出任务")
         
         # 加载数据
-        data = self.load_processed_data(data_dir)
+        data = self.load_processed_data(data_dir, since, until)
         
         if data['logs'].empty and not data['anomalies']:
             self.logger.warning("没有可导出的数据")
@@ -420,10 +423,13 @@ def main():
     parser = argparse.ArgumentParser(description='日志导出工具')
     parser.add_argument('--config', required=True, help='配置文件路径')
     parser.add_argument('--data', required=True, help='处理后的数据目录')
+    parser.add_argument('--since', type=parse_time_bound,
+                        help='只导出此时间之后的日志（如 24h、7d、2024-10-10、2024-10-10T13:00）')
+    parser.add_argument('--until', type=parse_time_bound, help='只导出此时间之前的日志（格式同 --since）')
     args = parser.parse_args()
     
     exporter = LogExporter(args.config)
-    exporter.run_export(args.data)
+    exporter.run_export(args.data, since=args.since, until=args.until)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
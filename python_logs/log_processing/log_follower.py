@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+日志跟踪（tail）
+持续读取未压缩日志文件的新增行：按 (设备号, inode) 识别文件，轮转时（app.log → app.log.1）继续读完
+原文件句柄中剩余的内容，再从头读取新建的 app.log；文件被截断（copytruncate）时从头读取。
+滑动窗口统计按秒分桶，每个桶由可合并的流式聚合器组成，过期的桶直接丢弃
+"""
+
+import os
+import time
+from collections import Counter, deque
+
+from log_aggregators import ErrorRatio, ValueCounter
+
+# 每次从单个文件读取的最大字节数，避免一个文件突发写入时长时间阻塞其他文件
+MAX_READ_BYTES = 4 * 1024 * 1024
+
+class FileTailer:
+    """跟踪单个未压缩日志文件，只返回以换行结尾的完整行，未写完的行留到下次读取"""
+    
+    def __init__(self, path):
+        self.path = path
+        # 记录中的文件名使用打开时的名称，轮转改名后保持不变
+        self.name = path.name
+        self.file = open(path, 'rb')
+        stat = os.fstat(self.file.fileno())
+        self.key = (stat.st_dev, stat.st_ino)
+        self.size = stat.st_size
+        self.offset = 0
+        # 已读取的完整行数，用于计算新增行的行号
+        self.line_count = 0
+        self.pending = b''
+        self.format_name = None
+        # 文件已被改名或删除，读完剩余内容后关闭
+        self.rotated = False
+        self.idle_since = time.monotonic()
+    
+    def seek(self, offset, line_count):
+        """从 offset（行首）继续读取，line_count 为之前的行数"""
+        self.file.seek(offset)
+        self.offset = offset
+        self.line_count = line_count
+    
+    def read_lines(self, max_bytes=MAX_READ_BYTES):
+        """读取新增的完整行，返回 (起始行号, 行列表)"""
+        stat = os.fstat(self.file.fileno())
+        if stat.st_size < self.offset:
+            # 原地截断：从头读取
+            self.file.seek(0)
+            self.offset = 0
+            self.line_count = 0
+            self.pending = b''
+        
+        data = self.file.read(max_bytes)
+        if not data:
+            return self.line_count + 1, []
+        self.offset += len(data)
+        
+        data = self.pending + data
+        end = data.rfind(b'\n')
+        if end == -1:
+            self.pending = data
+            return self.line_count + 1, []
+        self.pending = data[end + 1:]
+        
+        lines = data[:end].decode('utf-8', errors='ignore').split('\n')
+        start_line = self.line_count + 1
+        self.line_count += len(lines)
+        return start_line, lines
+    
+    def drain_pending(self):
+        """返回最后一行没有换行结尾的内容（文件已轮转、不会再写入时调用）"""
+        if not self.pending:
+            return self.line_count + 1, []
+        line = self.pending.decode('utf-8', errors='ignore')
+        self.pending = b''
+        self.line_count += 1
+        return self.line_count, [line]
+    
+    def close(self):
+        self.file.close()
+
+class WindowBucket:
+    """一秒内到达的记录的统计"""
+    
+    def __init__(self):
+        self.entries = 0
+        self.errors = ErrorRatio('status')
+        self.ips = ValueCounter('ip')
+        self.formats = ValueCounter('format')
+        self.security = Counter()
+    
+    def update(self, log):
+        self.entries += 1
+        self.errors.update(log)
+        self.ips.update(log)
+        self.formats.update(log)
+    
+    def merge(self, other):
+        self.entries += other.entries
+        self.errors.merge(other.errors)
+        self.ips.merge(other.ips)
+        self.formats.merge(other.formats)
+        self.security.update(other.security)
+
+class RollingWindow:
+    """最近 window 秒的滑动窗口统计，按到达时间每秒一个桶"""
+    
+    def __init__(self, window=60):
+        self.window = max(1, int(window))
+        self.buckets = deque()
+        self.total_entries = 0
+        self.total_security_events = 0
+    
+    def bucket(self, now=None):
+        """返回当前秒的桶，同时丢弃过期的桶"""
+        second = int(time.time() if now is None else now)
+        while self.buckets and self.buckets[0][0] <= second - self.window:
+            self.buckets.popleft()
+        if not self.buckets or self.buckets[-1][0] != second:
+            self.buckets.append((second, WindowBucket()))
+        return self.buckets[-1][1]
+    
+    def update(self, log, now=None):
+        self.bucket(now).update(log)
+        self.total_entries += 1
+    
+    def add_security_event(self, event_type, now=None):
+        self.bucket(now).security[event_type] += 1
+        self.total_security_events += 1
+    
+    def result(self, now=None):
+        """合并窗口内的桶，返回滚动统计"""
+        self.bucket(now)
+        merged = WindowBucket()
+        for _, bucket in self.buckets:
+            merged.merge(bucket)
+        
+        result = {
+            'window_seconds': self.window,
+            'entries': merged.entries,
+            'entries_per_second': merged.entries / self.window,
+            'formats': merged.formats.most_common(),
+            'top_ips': merged.ips.most_common(10),
+            'security_events_by_type': dict(merged.security),
+            'total_entries': self.total_entries,
+            'total_security_events': self.total_security_events,
+        }
+        if merged.errors.observed:
+            result['error_count'] = merged.errors.errors
+            result['error_rate'] = merged.errors.rate()
+        return result
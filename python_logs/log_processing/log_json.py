@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+JSON Lines 日志解析
+每行一个 JSON 对象，常用字段（时间、级别、状态码、IP、URL 等）按别名映射到与正则格式相同的列名；
+同一服务输出的各行通常键相同且顺序一致，按键序列缓存映射方案，每种键序列只分析一次。
+安装 orjson 时使用 orjson 解码，否则使用标准库 json
+"""
+
+import json
+from datetime import datetime, timezone
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# 列名 -> 常见的字段名（不区分大小写，嵌套字段以 . 连接），同一列有多个字段时取靠前的
+FIELD_ALIASES = {
+    'timestamp': ['timestamp', '@timestamp', 'time', 'ts', 'datetime', 'date', 'asctime', 'eventtime'],
+    'level': ['level', 'severity', 'levelname', 'loglevel', 'log_level', 'lvl', 'log.level'],
+    'status': ['status', 'status_code', 'statuscode', 'http_status', 'response_code',
+               'http.response.status_code', 'response.status'],
+    'ip': ['ip', 'client_ip', 'clientip', 'remote_addr', 'remote_ip', 'src_ip',
+           'client.ip', 'source.ip', 'client.address'],
+    'method': ['method', 'http_method', 'request_method', 'verb', 'http.request.method', 'request.method'],
+    'url': ['url', 'uri', 'path', 'request_uri', 'request_path', 'url.path', 'url.original', 'request.url'],
+    'protocol': ['protocol', 'http_version', 'server_protocol', 'http.version'],
+    'size': ['size', 'bytes', 'bytes_sent', 'body_bytes_sent', 'response_size', 'http.response.body.bytes'],
+    'hostname': ['hostname', 'host', 'host.name'],
+    'process': ['process', 'logger', 'logger_name', 'name', 'service', 'app', 'service.name', 'log.logger'],
+    'message': ['message', 'msg', 'log', 'text', 'event'],
+}
+ALIAS_COLUMNS = {alias: (column, priority)
+                 for column, aliases in FIELD_ALIASES.items()
+                 for priority, alias in enumerate(aliases)}
+# 未映射的字段以紧凑 JSON 保存在此列
+EXTRA_COLUMN = 'extra'
+# 嵌套对象展开的最大层数
+MAX_NESTING = 3
+# 缓存的键序列数量上限（键不固定的日志每行可能都不同）
+SCHEMA_CACHE_SIZE = 1024
+# 数值时间戳大于此值时按毫秒解释
+EPOCH_MILLIS_THRESHOLD = 1e11
+
+def loads(line):
+    return orjson.loads(line) if HAS_ORJSON else json.loads(line)
+
+def dumps(value):
+    if HAS_ORJSON:
+        return orjson.dumps(value).decode('utf-8')
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+def normalize_timestamp(value):
+    """时间统一为 ISO 8601 写法（YYYY-MM-DDTHH:MM:SS...），数值按 UTC 的 Unix 时间解释"""
+    if isinstance(value, str):
+        # 'YYYY-MM-DD HH:MM:SS' 中的空格会被时间戳解析器当作分隔符，换成 T
+        if len(value) >= 19 and value[10] == ' ' and value[4] == '-' and value[13] == ':':
+            return value[:10] + 'T' + value[11:]
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        seconds = value / 1000 if value > EPOCH_MILLIS_THRESHOLD else value
+        try:
+            return datetime.fromtimestamp(seconds, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+        except (OverflowError, OSError, ValueError):
+            return str(value)
+    return str(value)
+
+def to_text(value):
+    """映射到列的取值与正则格式一样保存为字符串"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return dumps(value)
+    return str(value)
+
+class JsonLineParser:
+    """解析 JSON Lines，按键序列缓存字段映射方案"""
+    
+    def __init__(self):
+        # {键序列: ([(列名, 顶层键, 其余路径)], 未映射的顶层键)}
+        self.schemas = {}
+    
+    def plan(self, record):
+        """分析一条记录的字段，返回映射方案"""
+        candidates = {}
+        consumed = set()
+        
+        def visit(value, path):
+            # 对象继续展开（如 {"log": {"level": ...}}），只有非对象的取值映射到列
+            if isinstance(value, dict):
+                if len(path) < MAX_NESTING:
+                    for key, child in value.items():
+                        visit(child, path + (key,))
+                return
+            alias = '.'.join(path).lower()
+            if alias in ALIAS_COLUMNS:
+                column, priority = ALIAS_COLUMNS[alias]
+                if column not in candidates or priority < candidates[column][0]:
+                    candidates[column] = (priority, path)
+        
+        for key, value in record.items():
+            visit(value, (key,))
+        
+        columns = []
+        for column in FIELD_ALIASES:
+            if column in candidates:
+                path = candidates[column][1]
+                columns.append((column, path[0], path[1:]))
+                if len(path) == 1:
+                    consumed.add(path[0])
+        extra = [key for key in record if key not in consumed]
+        return columns, extra
+    
+    def parse(self, line):
+        """解析一行，返回字段字典；不是 JSON 对象时返回 None"""
+        try:
+            record = loads(line)
+        except ValueError:
+            return None
+        if not isinstance(record, dict):
+            return None
+        
+        schema_key = tuple(record)
+        schema = self.schemas.get(schema_key)
+        if schema is None:
+            if len(self.schemas) >= SCHEMA_CACHE_SIZE:
+                self.schemas.clear()
+            schema = self.schemas[schema_key] = self.plan(record)
+        columns, extra = schema
+        
+        fields = {}
+        for column, key, rest in columns:
+            value = record.get(key)
+            for key in rest:
+                value = value.get(key) if isinstance(value, dict) else None
+            if value is None:
+                continue
+            if column == 'timestamp':
+                value = normalize_timestamp(value)
+            elif value.__class__ is not str:
+                value = to_text(value)
+            fields[column] = value
+        if extra:
+            fields[EXTRA_COLUMN] = dumps({key: record[key] for key in extra})
+        return fields
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+多格式日志匹配器
+预编译日志格式正则，先用行首等廉价特征筛选候选格式，每行通常只需匹配一到两次；
+apache/nginx 访问日志可选使用不依赖正则的分词快速路径（fast_path=True）；
+JSON Lines 等结构化格式不使用正则，由对应的解析器解码。
+CPython 上 re 模块由 C 实现，实测分词路径并不比预编译正则快，因此默认关闭，
+主要用于 PyPy 等解释器或后续优化的对照
+"""
+
+import re
+from collections import Counter
+
+from log_json import JsonLineParser
+
+# 常用日志格式正则表达式（字典顺序即格式优先级）
+DEFAULT_LOG_PATTERNS = {
+    'apache_access': r'(?P<ip>\S+) \S+ \S+ \[(?P<timestamp>[^\]]+)\] "(?P<method>\S+) (?P<url>\S+) (?P<protocol>\S+)" (?P<status>\d+) (?P<size>\S+)',
+    'nginx_access': r'(?P<ip>\S+) - \S+ \[(?P<timestamp>[^\]]+)\] "(?P<method>\S+) (?P<url>\S+) (?P<protocol>\S+)" (?P<status>\d+) (?P<size>\d+)',
+    'syslog': r'(?P<timestamp>\w+\s+\d+\s+\d+:\d+:\d+) (?P<hostname>\S+) (?P<process>\S+): (?P<message>.*)',
+    'application': r'(?P<timestamp>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) \[(?P<level>\w+)\] (?P<message>.*)'
+}
+
+# 各格式的必要特征：正则能匹配的行一定满足对应条件，不满足时直接跳过该格式
+def _looks_like_access(line):
+    return '] "' in line
+
+def _looks_like_nginx_access(line):
+    return ' - ' in line and '] "' in line
+
+def _looks_like_syslog(line):
+    first = line[0]
+    return (first.isalnum() or first == '_') and ': ' in line
+
+def _looks_like_application(line):
+    return line[4:5] == '-' and line[:4].isdigit() and ' [' in line
+
+def _looks_like_json(line):
+    return line[:1] == '{'
+
+def _always(line):
+    return True
+
+FORMAT_FEATURES = {
+    'apache_access': _looks_like_access,
+    'nginx_access': _looks_like_nginx_access,
+    'syslog': _looks_like_syslog,
+    'application': _looks_like_application,
+    'json': _looks_like_json,
+}
+
+def split_access_line(line):
+    """按空格切分访问日志，返回 (ip, ident, user, timestamp, method, url, protocol, status, rest)
+    
+    只处理可打印ASCII行（此时唯一的空白字符是空格，切分结果与正则的 \\S+ 一致），
+    其余情况或结构不完整时返回 None，由调用方回退到正则。
+    """
+    if not (line.isascii() and line.isprintable()):
+        return None
+    
+    ip, _, rest = line.partition(' ')
+    ident, _, rest = rest.partition(' ')
+    user, _, rest = rest.partition(' ')
+    if not (ip and ident and user) or rest[:1] != '[':
+        return None
+    
+    # 时间戳取到第一个 ']' 为止，后面必须紧跟 ' "'
+    close = rest.find(']')
+    if close < 2 or rest[close:close + 3] != '] "':
+        return None
+    timestamp = rest[1:close]
+    
+    method, _, rest = rest[close + 3:].partition(' ')
+    url, _, rest = rest.partition(' ')
+    protocol, sep, rest = rest.partition(' ')
+    if not (method and url and sep) or len(protocol) < 2 or protocol[-1] != '"':
+        return None
+    
+    status, sep, rest = rest.partition(' ')
+    if not (sep and status.isdecimal()):
+        return None
+    
+    return ip, ident, user, timestamp, method, url, protocol[:-1], status, rest
+
+def parse_apache_access(line):
+    """apache_access 快速路径，结果与正则 groupdict() 相同"""
+    parts = split_access_line(line)
+    if parts is None:
+        return None
+    
+    ip, _, _, timestamp, method, url, protocol, status, rest = parts
+    size = rest.partition(' ')[0]
+    if not size:
+        return None
+    return {'ip': ip, 'timestamp': timestamp, 'method': method, 'url': url,
+            'protocol': protocol, 'status': status, 'size': size}
+
+def parse_nginx_access(line):
+    """nginx_access 快速路径，结果与正则 groupdict() 相同"""
+    parts = split_access_line(line)
+    if parts is None or parts[1] != '-':
+        return None
+    
+    ip, _, _, timestamp, method, url, protocol, status, rest = parts
+    # (?P<size>\d+) 后面不要求分隔符，取开头的连续数字
+    size = rest[:len(rest) - len(rest.lstrip('0123456789'))]
+    if not size:
+        return None
+    return {'ip': ip, 'timestamp': timestamp, 'method': method, 'url': url,
+            'protocol': protocol, 'status': status, 'size': size}
+
+FAST_PARSERS = {
+    'apache_access': parse_apache_access,
+    'nginx_access': parse_nginx_access,
+}
+
+# 结构化格式：格式名 -> 解析器类（parse(line) 返回字段字典或 None），优先级排在正则格式之后
+STRUCTURED_PARSERS = {
+    'json': JsonLineParser,
+}
+
+class LogMatcher:
+    def __init__(self, log_patterns, fast_path=False):
+        """预编译日志格式，log_patterns 的顺序即格式优先级"""
+        self.log_patterns = dict(log_patterns)
+        self.compiled = {name: re.compile(pattern) for name, pattern in self.log_patterns.items()}
+        
+        # 只有正则与默认格式一致时才启用快速路径，自定义格式始终走正则
+        self.fast_parsers = {}
+        if fast_path:
+            self.fast_parsers = {name: parser for name, parser in FAST_PARSERS.items()
+                                 if self.log_patterns.get(name) == DEFAULT_LOG_PATTERNS[name]}
+        
+        # 未登记特征的自定义格式视为总是候选
+        self.entries = [(name, self.compiled[name].match, self.fast_parsers.get(name),
+                         FORMAT_FEATURES.get(name, _always))
+                        for name in self.log_patterns]
+        # 结构化格式没有正则，解析器放在快速路径的位置；自定义正则使用相同名称时以正则为准
+        self.structured = {name: parser_class() for name, parser_class in STRUCTURED_PARSERS.items()
+                           if name not in self.log_patterns}
+        self.entries += [(name, None, parser.parse, FORMAT_FEATURES.get(name, _always))
+                         for name, parser in self.structured.items()]
+        # 支持的全部格式名（按优先级）
+        self.formats = [name for name, _, _, _ in self.entries]
+        self._parsers = {name: (matcher, fast_parser) for name, matcher, fast_parser, _ in self.entries}
+    
+    def parse(self, line, hint=None):
+        """解析单行日志，优先尝试 hint 格式；返回 (格式名, 字段字典)，未匹配返回 (None, None)"""
+        if not line:
+            return None, None
+        
+        if hint is not None:
+            matcher, fast_parser = self._parsers[hint]
+            if fast_parser is not None:
+                fields = fast_parser(line)
+                if fields is not None:
+                    return hint, fields
+            if matcher is not None:
+                match = matcher(line)
+                if match:
+                    return hint, match.groupdict()
+        
+        for name, matcher, fast_parser, feature in self.entries:
+            if name != hint and feature(line):
+                if fast_parser is not None:
+                    fields = fast_parser(line)
+                    if fields is not None:
+                        return name, fields
+                if matcher is not None:
+                    match = matcher(line)
+                    if match:
+                        return name, match.groupdict()
+        
+        return None, None
+    
+    def detect(self, sample_lines, threshold=0.7):
+        """检测样本的主要格式：按优先级返回第一个匹配率达到阈值的格式"""
+        if not sample_lines:
+            return 'unknown'
+        
+        counts = Counter(self.parse(line.strip())[0] for line in sample_lines)
+        for name in self.formats:
+            if counts[name] >= len(sample_lines) * threshold:
+                return name
+        
+        return 'unknown'
@@ -9,10 +9,101 @@ import re
 import json
 import logging
 import argparse
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from pathlib import Path
-import hashlib
+
+from log_dedup import (DEDUP_INDEX_FILES, DEDUP_MODES, DEFAULT_BLOOM_CAPACITY, DEFAULT_BLOOM_ERROR_RATE,
+                       SortedHashIndex, drop_duplicates, open_dedup_index)
+from log_storage import (HAS_PYARROW, PART_COLUMN, PROCESSED_LOG_COLUMNS, TIME_COLUMN, FrameHandoffWriter,
+                         filter_time_range, iter_handoff, parse_time_bound, read_handoff, remove_partitions,
+                         write_handoff, write_partitions)
+from log_templates import TEMPLATE_FILE, TemplateMiner
+from log_timeseries import (DEFAULT_ALPHA, DEFAULT_IP_MIN_REQUESTS, DEFAULT_WARMUP_MINUTES, DEFAULT_Z_THRESHOLD,
+                            TIMESERIES_STATE_FILE, MinuteCounts, TimeSeriesDetector)
+from security_scanner import ColumnScanner
+from timestamp_parser import (ACCESS_TIME_FORMAT, ISO_TIME_FORMAT, MONTH_NUMBERS, STANDARD_TIME_FORMAT, TIMESTAMP_FORMATS,
+                              TimestampParser)
+
+# 判断主要时间格式时抽样的时间戳数量
+TIMESTAMP_SAMPLE_SIZE = 1000
+# 标准写法的访问日志时间（10/Oct/2024:13:55:36），其后为空白或结尾
+ACCESS_TIME_PATTERN = r'\d\d/[A-Z][a-z]{2}/\d{4}:\d\d:\d\d:\d\d(?:\s|$)'
+# ISO 8601 时间的前 19 个字符之后为小数秒、时区、空白或结尾
+ISO_TIME_PATTERN = r'.{19}(?:[.,Z+-]|\s|$)'
+# pandas 把 60、61 秒进位到下一分钟，strptime 和手写解析都视为无效
+LEAP_SECOND_PATTERN = r':6[01](?!\d)'
+MONTH_TEXT = {name: f'{number:02d}' for name, number in MONTH_NUMBERS.items()}
+
+# 噪音数据：message 命中任一规则的行（爬虫和机器人请求）被过滤
+NOISE_PATTERNS = [
+    r'bot',
+    r'crawler',
+    r'spider',
+    r'scraper'
+]
+# 可疑模式：在 message、url、raw_line 中分别统计命中次数
+SUSPICIOUS_PATTERNS = [
+    r'\.\./',  # 路径遍历
+    r'<script',  # XSS攻击
+    r'union.*select',  # SQL注入
+    r'eval\(',  # 代码注入
+]
+
+# 状态码按百位分类，其他值为 unknown
+STATUS_CATEGORIES = ['success', 'redirect', 'client_error', 'server_error', 'unknown']
+# 文件大小分类的上界（字节，不含），无法解析的为 unknown
+SIZE_BOUNDS = [1024, 1024 * 1024, 10 * 1024 * 1024]
+SIZE_CATEGORIES = ['small', 'medium', 'large', 'very_large', 'unknown']
+
+def distinct_numbers(values):
+    """按不同的值转换为数字：返回 (每行的编号, 各值的数字)，空值的编号 -1 对应末尾追加的 NaN"""
+    codes, uniques = pd.factorize(values)
+    numbers = pd.to_numeric(pd.Series(uniques, dtype=object), errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    return codes, np.append(numbers, np.nan)
+
+def categorize_status(status):
+    """状态码分类：2xx/3xx/4xx/5xx 按百位分箱，非整数和其他范围为 unknown"""
+    codes, numbers = distinct_numbers(status)
+    classes = numbers // 100
+    valid = (numbers % 1 == 0) & (classes >= 2) & (classes <= 5)
+    return pd.Categorical.from_codes(np.where(valid, classes - 2, 4).astype('int8')[codes], STATUS_CATEGORIES)
+
+def categorize_size(size):
+    """文件大小分类：按 SIZE_BOUNDS 分箱，无法解析的为 unknown"""
+    codes, numbers = distinct_numbers(size)
+    bins = np.where(np.isnan(numbers), 4, np.searchsorted(SIZE_BOUNDS, numbers, side='right'))
+    return pd.Categorical.from_codes(bins.astype('int8')[codes], SIZE_CATEGORIES)
+
+def merge_counts(total, part):
+    """合并两块数据的计数（就地修改 total）：数字相加，字典按键合并并保留先出现的键的顺序，None 表示没有该项"""
+    if total is None:
+        return part
+    if isinstance(part, dict):
+        for key, value in part.items():
+            total[key] = merge_counts(total.get(key), value)
+        return total
+    return total + part
+
+def parse_timestamp_format(values, fmt):
+    """按单个格式整列解析时间戳字符串，不匹配的为 NaT
+    
+    与 TimestampParser 一样，格式不含空白时只解析第一个空白之前的部分。pandas 只对数字格式有快速路径，
+    访问日志时间与 parse_access_time 一样只处理标准写法，改写为数字格式后解析
+    """
+    if fmt == ACCESS_TIME_FORMAT:
+        standard = values.str.match(ACCESS_TIME_PATTERN, na=False)
+        values = (values.str.slice(7, 11) + '-' + values.str.slice(3, 6).map(MONTH_TEXT) + '-'
+                  + values.str.slice(0, 2) + ' ' + values.str.slice(12, 20)).where(standard)
+        fmt = STANDARD_TIME_FORMAT
+    elif fmt == ISO_TIME_FORMAT:
+        # 忽略小数秒和时区，与 parse_iso_time 一致
+        values = values.str.slice(0, 19).where(values.str.match(ISO_TIME_PATTERN, na=False))
+    elif not any(char.isspace() for char in fmt):
+        values = values.str.replace(r'\s.*', '', regex=True)
+    values = values.mask(values.str.contains(LEAP_SECOND_PATTERN, na=False))
+    return pd.to_datetime(values, format=fmt, errors='coerce')
 
 class LogProcessor:
     def __init__(self, input_dir, output_dir, config=None):
@@ -31,18 +122,58 @@ class LogProcessor:
             'filter_noise': True,
             'anonymize_ips': self.config.get('anonymize_ips', False)
         }
+        self.noise_patterns = self.config.get('noise_patterns', NOISE_PATTERNS)
         
         # 异常检测规则
         self.anomaly_rules = {
             'high_error_rate': 10,  # 错误率超过10%
             'unusual_traffic': 1000,  # 单IP请求超过1000次
-            'suspicious_patterns': [
-                r'\.\./',  # 路径遍历
-                r'<script',  # XSS攻击
-                r'union.*select',  # SQL注入
-                r'eval\(',  # 代码注入
-            ]
+            'suspicious_patterns': self.config.get('suspicious_patterns', SUSPICIOUS_PATTERNS)
         }
+        
+        # 按规则列表缓存的整列扫描器
+        self.scanners = {}
+        
+        # 处理结果的交接文件格式：csv / feather / parquet
+        self.handoff_format = self.config.get('handoff_format', 'csv')
+        if self.handoff_format != 'csv' and not HAS_PYARROW:
+            self.logger.warning(f"pyarrow未安装，无法保存为 {self.handoff_format}，改用 CSV")
+            self.handoff_format = 'csv'
+        
+        # 时间范围（标准化时间字符串）：分区输入只读取重叠的分区，异常检测和统计只包含范围内的记录
+        self.since = parse_time_bound(self.config.get('since'))
+        self.until = parse_time_bound(self.config.get('until'))
+        
+        # 日志分析生成的模板（未知格式的行只保存模板编号和参数时），加载数据后读取
+        self.templates = None
+        
+        # 跨运行去重索引：记录已处理过的内容哈希，重叠收集的日志再次处理时丢弃
+        self.dedup_index = None
+        self.new_hashes = None
+        # 分块处理时本次运行前面各块保留记录的去重键（只在内存中），后续块中相同的记录视为重复
+        self.seen_keys = None
+        self.new_keys = None
+        if self.config.get('dedup_index'):
+            self.dedup_index = open_dedup_index(self.config['dedup_index'], self.config.get('dedup_mode', 'exact'),
+                                                self.config.get('dedup_capacity', DEFAULT_BLOOM_CAPACITY),
+                                                self.config.get('dedup_error_rate', DEFAULT_BLOOM_ERROR_RATE))
+            self.logger.info(f"去重索引 {self.config['dedup_index']}: 已记录 {len(self.dedup_index)} 条, "
+                             f"{self.dedup_index.memory_bytes() / 1024 / 1024:.1f} MB")
+        
+        # 按分钟的时间序列异常检测：EWMA 基线保存在状态文件中，每次运行在其上继续更新
+        self.timeseries = None
+        if self.config.get('timeseries_state'):
+            self.timeseries = TimeSeriesDetector(self.config['timeseries_state'],
+                                                 self.config.get('ewma_alpha', DEFAULT_ALPHA),
+                                                 self.config.get('zscore_threshold', DEFAULT_Z_THRESHOLD),
+                                                 self.config.get('warmup_minutes', DEFAULT_WARMUP_MINUTES),
+                                                 self.config.get('ip_min_requests', DEFAULT_IP_MIN_REQUESTS))
+        
+        # 分块处理：每次读取的行数，未设置时整体加载
+        self.chunk_rows = self.config.get('chunk_rows')
+        
+        # 时间戳解析器：整列解析后剩余的少量时间戳逐个交给它，记住上次成功的格式并缓存重复的时间戳
+        self.timestamp_parser = TimestampParser(TIMESTAMP_FORMATS)
     
     def setup_logging(self):
         """设置日志记录"""
@@ -58,11 +189,12 @@ class LogProcessor:
     
     def load_parsed_logs(self):
         """加载已解析的日志数据"""
-        csv_file = self.input_dir / 'parsed_logs.csv'
-        if csv_file.exists():
-            return pd.read_csv(csv_file)
+        # parsed_logs.csv / .feather / .parquet，或按日期/小时分区的 parsed_logs/ 目录
+        df = read_handoff(self.input_dir, 'parsed_logs', since=self.since, until=self.until, part_column=PART_COLUMN)
+        if df is not None:
+            return df
         
-        # 如果没有CSV文件，尝试加载JSON
+        # 如果没有解析结果文件，尝试加载JSON
         json_file = self.input_dir / 'analysis_results.json'
         if json_file.exists():
             with open(json_file, 'r', encoding='utf-8') as f:
@@ -80,19 +212,17 @@ class LogProcessor:
         
         # 移除空行
         if self.cleaning_rules['remove_empty_lines']:
-            df = df.dropna(subset=['raw_line'] if 'raw_line' in df.columns else df.columns[:1])
+            # 未知格式的行以模板编号保存时按模板编号判断
+            content_columns = [col for col in ('raw_line', 'template_id') if col in df.columns]
+            df = df.dropna(subset=content_columns or df.columns[:1], how='all')
         
-        # 移除重复行
+        # 移除重复行：按内容哈希（没有原文的记录同时按行号、文件名），启用跨运行去重时同时丢弃以前运行处理过的记录
         if self.cleaning_rules['remove_duplicates']:
-            # 基于内容生成哈希值来检测重复
-            if 'raw_line' in df.columns:
-                df['content_hash'] = df['raw_line'].apply(lambda x: hashlib.md5(str(x).encode()).hexdigest())
-                df = df.drop_duplicates(subset=['content_hash'])
-                df = df.drop('content_hash', axis=1)
+            df, self.new_hashes, self.new_keys = drop_duplicates(df, self.dedup_index, self.seen_keys)
         
         # 标准化时间戳
         if self.cleaning_rules['normalize_timestamps'] and 'timestamp' in df.columns:
-            df['normalized_timestamp'] = df['timestamp'].apply(self.normalize_timestamp)
+            df['normalized_timestamp'] = self.normalize_timestamps(df['timestamp'])
         
         # IP地址匿名化
         if self.cleaning_rules['anonymize_ips'] and 'ip' in df.columns:
@@ -107,28 +237,38 @@ class LogProcessor:
         
         return df
     
-    def normalize_timestamp(self, timestamp_str):
-        """标准化时间戳格式"""
-        if pd.isna(timestamp_str):
-            return None
-        
-        # 常见时间格式
-        formats = [
-            '%d/%b/%Y:%H:%M:%S',
-            '%Y-%m-%d %H:%M:%S',
-            '%b %d %H:%M:%S',
-            '%Y-%m-%dT%H:%M:%S',
-            '%Y-%m-%d %H:%M:%S.%f'
-        ]
-        
-        for fmt in formats:
-            try:
-                dt = datetime.strptime(str(timestamp_str).split()[0], fmt)
-                return dt.strftime('%Y-%m-%d %H:%M:%S')
-            except ValueError:
-                continue
-        
-        return timestamp_str
+    def normalize_timestamps(self, timestamps):
+        """标准化时间戳列，返回 datetime64 列（无法解析的为 NaT）
+        
+        相同的时间戳只解析一次；按样本中命中最多的格式整列解析，其余格式只解析剩下的时间戳，
+        最后仍未解析的（如单数字日期、完整月份名）逐个交给时间戳解析器
+        """
+        codes, uniques = pd.factorize(timestamps.astype('string'))
+        values = pd.Series(uniques, dtype='string').str.strip()
+        parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+        pending = values != ''
+        
+        for fmt in self.rank_timestamp_formats(values[pending]):
+            if not pending.any():
+                break
+            matched = parse_timestamp_format(values[pending], fmt).dropna()
+            parsed[matched.index] = matched
+            pending[matched.index] = False
+        
+        for index in pending[pending].index:
+            dt = self.timestamp_parser.parse(values[index])
+            if dt is not None:
+                parsed[index] = dt
+        
+        # 空值的编号为 -1，对应末尾追加的 NaT
+        result = pd.concat([parsed, pd.Series([pd.NaT], dtype=parsed.dtype)], ignore_index=True)
+        return pd.Series(result.to_numpy()[codes], index=timestamps.index)
+    
+    def rank_timestamp_formats(self, values):
+        """按样本中解析成功的数量对候选格式排序"""
+        sample = values.sample(min(len(values), TIMESTAMP_SAMPLE_SIZE), random_state=0)
+        hits = {fmt: parse_timestamp_format(sample, fmt).notna().sum() for fmt in self.timestamp_parser.formats}
+        return sorted(hits, key=hits.get, reverse=True)
     
     def anonymize_ip(self, ip):
         """IP地址匿名化"""
@@ -145,32 +285,60 @@ class LogProcessor:
         
         return ip
     
+    def pattern_scanner(self, patterns):
+        """返回规则列表对应的整列扫描器（规则可通过配置或 anomaly_rules 修改）"""
+        key = tuple(patterns)
+        if key not in self.scanners:
+            self.scanners[key] = ColumnScanner(key)
+        return self.scanners[key]
+    
     def filter_noise(self, df):
         """过滤噪音数据"""
-        # 过滤明显的爬虫和机器人请求
-        bot_patterns = [
-            r'bot',
-            r'crawler',
-            r'spider',
-            r'scraper'
-        ]
-        
-        if 'message' in df.columns:
-            for pattern in bot_patterns:
-                df = df[~df['message'].str.contains(pattern, case=False, na=False)]
+        # 过滤明显的爬虫和机器人请求：全部规则一次扫描，只复制一次数据
+        if 'message' in df.columns and self.noise_patterns:
+            df = df[~self.pattern_scanner(self.noise_patterns).match_any(df['message'])]
         
         return df
     
     def detect_anomalies(self, df):
         """异常检测"""
         self.logger.info("开始异常检测")
+        anomalies = self.build_anomalies(self.count_anomalies(df))
+        self.logger.info(f"异常检测完成，发现 {len(anomalies)} 个异常")
+        return anomalies
+    
+    def count_anomalies(self, df):
+        """异常检测需要的计数：记录数、错误数、各IP请求数、各列各可疑模式的命中数（分块时按块计算后合并）"""
+        counts = {'total': len(df), 'errors': None, 'ip_counts': None, 'pattern_counts': {}}
+        
+        if 'status' in df.columns:
+            counts['errors'] = int(df['status'].astype(str).str.startswith(('4', '5')).sum())
+        
+        if 'ip' in df.columns:
+            counts['ip_counts'] = {ip: int(count) for ip, count in df['ip'].value_counts(sort=False).items()}
+        
+        content = {col: df[col] for col in ['message', 'url', 'raw_line'] if col in df.columns}
+        if 'template_id' in df.columns and self.templates is not None:
+            # 模板编码的行按模板还原原文后检测
+            raw_lines = self.templates.decode_series(df['template_id'], df['params'])
+            if 'raw_line' in content:
+                raw_lines = raw_lines.fillna(content['raw_line'])
+            content['raw_line'] = raw_lines
+        scanner = self.pattern_scanner(self.anomaly_rules['suspicious_patterns'])
+        for col, values in content.items():
+            for pattern, count in scanner.count(values).items():
+                counts['pattern_counts'][(col, pattern)] = count
+        
+        return counts
+    
+    def build_anomalies(self, counts):
+        """按计数生成异常列表"""
         anomalies = []
         
         # 检测高错误率
-        if 'status' in df.columns:
-            error_count = len(df[df['status'].astype(str).str.startswith(('4', '5'))])
-            total_count = len(df)
-            error_rate = (error_count / total_count) * 100 if total_count > 0 else 0
+        if counts['errors'] is not None:
+            total_count = counts['total']
+            error_rate = (counts['errors'] / total_count) * 100 if total_count > 0 else 0
             
             if error_rate > self.anomaly_rules['high_error_rate']:
                 anomalies.append({
@@ -180,10 +348,9 @@ class LogProcessor:
                     'description': f'错误率过高: {error_rate:.2f}%'
                 })
         
-        # 检测异常流量
-        if 'ip' in df.columns:
-            ip_counts = df['ip'].value_counts()
-            for ip, count in ip_counts.items():
+        # 检测异常流量（按请求次数降序，次数相同时按首次出现的顺序）
+        if counts['ip_counts'] is not None:
+            for ip, count in sorted(counts['ip_counts'].items(), key=lambda item: item[1], reverse=True):
                 if count > self.anomaly_rules['unusual_traffic']:
                     anomalies.append({
                         'type': 'unusual_traffic',
@@ -194,87 +361,84 @@ class LogProcessor:
                     })
         
         # 检测可疑模式
-        content_columns = ['message', 'url', 'raw_line']
-        for col in content_columns:
-            if col in df.columns:
-                for pattern in self.anomaly_rules['suspicious_patterns']:
-                    matches = df[df[col].str.contains(pattern, case=False, na=False, regex=True)]
-                    if not matches.empty:
-                        anomalies.append({
-                            'type': 'suspicious_pattern',
-                            'pattern': pattern,
-                            'count': len(matches),
-                            'description': f'检测到可疑模式 "{pattern}": {len(matches)} 次'
-                        })
+        for (col, pattern), count in counts['pattern_counts'].items():
+            if count:
+                anomalies.append({
+                    'type': 'suspicious_pattern',
+                    'pattern': pattern,
+                    'count': count,
+                    'description': f'检测到可疑模式 "{pattern}": {count} 次'
+                })
         
-        self.logger.info(f"异常检测完成，发现 {len(anomalies)} 个异常")
+        return anomalies
+    
+    def detect_timeseries_anomalies(self, counts):
+        """按分钟的计数计入时间序列基线，返回每分钟记录数、错误率和各IP请求数的突增"""
+        anomalies = self.timeseries.update(counts)
+        if anomalies:
+            self.logger.warning(f"时间序列检测发现 {len(anomalies)} 个异常")
         return anomalies
     
     def transform_data(self, df):
-        """数据转换"""
+        """数据转换：派生字段全部按列计算，分类字段为 category 类型"""
         self.logger.info("开始数据转换")
         
         # 添加派生字段
         if 'normalized_timestamp' in df.columns:
-            df['hour'] = pd.to_datetime(df['normalized_timestamp']).dt.hour
-            df['day_of_week'] = pd.to_datetime(df['normalized_timestamp']).dt.dayofweek
-            df['date'] = pd.to_datetime(df['normalized_timestamp']).dt.date
+            times = pd.to_datetime(df['normalized_timestamp'], errors='coerce')
+            df['hour'] = times.dt.hour
+            df['day_of_week'] = times.dt.dayofweek
+            # 日期数量很少，按天编号后只为每个日期创建一个 date 对象
+            codes, days = pd.factorize(times.dt.normalize())
+            df['date'] = pd.Categorical.from_codes(codes, days.date)
         
         # 状态码分类
         if 'status' in df.columns:
-            df['status_category'] = df['status'].astype(str).apply(self.categorize_status)
+            df['status_category'] = categorize_status(df['status'])
         
-        # URL路径提取
+        # URL路径提取（按不同的 URL 计算）
         if 'url' in df.columns:
-            df['url_path'] = df['url'].apply(lambda x: str(x).split('?')[0] if pd.notna(x) else x)
-            df['has_query'] = df['url'].apply(lambda x: '?' in str(x) if pd.notna(x) else False)
+            codes, urls = pd.factorize(df['url'].astype('string'))
+            urls = pd.Series(urls, dtype='string')
+            path_codes, paths = pd.factorize(urls.str.replace(r'\?.*', '', regex=True))
+            # 空值的编号为 -1，对应末尾追加的值
+            df['url_path'] = pd.Categorical.from_codes(np.append(path_codes, -1)[codes], paths)
+            df['has_query'] = np.append(urls.str.contains('?', regex=False).to_numpy(dtype=bool), False)[codes]
         
         # 文件大小分类
         if 'size' in df.columns:
-            df['size_category'] = pd.to_numeric(df['size'], errors='coerce').apply(self.categorize_size)
+            df['size_category'] = categorize_size(df['size'])
         
         return df
     
-    def categorize_status(self, status):
-        """状态码分类"""
-        try:
-            code = int(status)
-            if 200 <= code < 300:
-                return 'success'
-            elif 300 <= code < 400:
-                return 'redirect'
-            elif 400 <= code < 500:
-                return 'client_error'
-            elif 500 <= code < 600:
-                return 'server_error'
-            else:
-                return 'unknown'
-        except:
-            return 'unknown'
+    def generate_summary_stats(self, df, anomalies):
+        """生成汇总统计"""
+        return self.build_summary_stats(self.count_summary(df), anomalies)
     
-    def categorize_size(self, size):
-        """文件大小分类"""
-        if pd.isna(size):
-            return 'unknown'
+    def count_summary(self, df):
+        """汇总统计需要的计数：记录数、各列空值数、状态码分类和小时分布（分块时按块计算后合并）"""
+        counts = {
+            'total': len(df),
+            'null_counts': {col: int(count) for col, count in df.isnull().sum().items()},
+            'status_counts': None,
+            'hour_counts': None
+        }
         
-        try:
-            size_bytes = float(size)
-            if size_bytes < 1024:
-                return 'small'
-            elif size_bytes < 1024 * 1024:
-                return 'medium'
-            elif size_bytes < 10 * 1024 * 1024:
-                return 'large'
-            else:
-                return 'very_large'
-        except:
-            return 'unknown'
+        if 'status_category' in df.columns:
+            # 分类列的 value_counts 包含没有出现的类别
+            counts['status_counts'] = {category: int(count) for category, count in df['status_category'].value_counts().items()}
+        
+        if 'hour' in df.columns:
+            counts['hour_counts'] = {int(hour): int(count) for hour, count in df['hour'].value_counts().items()}
+        
+        return counts
     
-    def generate_summary_stats(self, df, anomalies):
-        """生成汇总统计"""
+    def build_summary_stats(self, counts, anomalies):
+        """按计数生成汇总统计"""
+        total = counts['total']
         stats = {
             'processing_timestamp': datetime.now().isoformat(),
-            'total_records': len(df),
+            'total_records': total,
             'anomalies_count': len(anomalies),
             'data_quality': {
                 'completeness': {},
@@ -283,24 +447,30 @@ class LogProcessor:
         }
         
         # 数据完整性检查
-        for col in df.columns:
-            null_count = df[col].isnull().sum()
+        for col, null_count in counts['null_counts'].items():
             stats['data_quality']['completeness'][col] = {
-                'null_count': int(null_count),
-                'null_percentage': float(null_count / len(df) * 100)
+                'null_count': null_count,
+                'null_percentage': null_count / total * 100 if total else float('nan')
             }
         
         # 按类别统计
-        if 'status_category' in df.columns:
-            stats['status_distribution'] = df['status_category'].value_counts().to_dict()
+        if counts['status_counts'] is not None:
+            ordered = sorted(counts['status_counts'].items(), key=lambda item: item[1], reverse=True)
+            stats['status_distribution'] = {category: count for category, count in ordered if count > 0}
         
-        if 'hour' in df.columns:
-            stats['hourly_distribution'] = df['hour'].value_counts().sort_index().to_dict()
+        if counts['hour_counts'] is not None:
+            # 有无法解析的时间时小时列为浮点数，与整体统计时的键一致
+            has_nulls = counts['null_counts'].get('hour', 0) > 0
+            stats['hourly_distribution'] = {float(hour) if has_nulls else hour: count
+                                            for hour, count in sorted(counts['hour_counts'].items())}
         
         return stats
     
     def run_processing(self):
         """运行完整处理流程"""
+        if self.chunk_rows:
+            return self.run_chunked_processing()
+        
         self.logger.info("开始日志处理")
         
         # 加载数据
@@ -309,21 +479,47 @@ class LogProcessor:
             self.logger.error("没有可处理的数据")
             return
         
+        # 分区输入：记录每行来自哪个分区文件，处理结果写回对应的分区
+        parts = df.pop(PART_COLUMN) if PART_COLUMN in df.columns else None
+        if parts is not None and self.dedup_index is not None:
+            # 分区文件整体重写，丢弃以前处理过的记录会使重新处理的分区丢失数据；分区输入由增量分析避免重复
+            self.logger.warning("分区输入不使用跨运行去重索引")
+            self.dedup_index = None
+        
+        # 未知格式的行以模板编号和参数保存时，读取模板用于还原原文
+        template_file = self.input_dir / TEMPLATE_FILE
+        if 'template_id' in df.columns and template_file.exists():
+            self.templates = TemplateMiner.load(template_file)
+        
         # 数据清洗
         df_cleaned = self.clean_data(df)
         
         # 数据转换
         df_transformed = self.transform_data(df_cleaned)
         
+        # 时间范围只影响异常检测和统计，读取的分区文件整体保存，避免边界分区只保存一部分
+        df_window = df_transformed
+        if (self.since is not None or self.until is not None) and TIME_COLUMN in df_transformed.columns:
+            df_window = filter_time_range(df_transformed, self.since, self.until)
+            self.logger.info(f"时间范围内的记录: {len(df_window)} 条")
+        
         # 异常检测
-        anomalies = self.detect_anomalies(df_transformed)
+        anomalies = self.detect_anomalies(df_window)
+        if self.timeseries is not None:
+            anomalies += self.detect_timeseries_anomalies(MinuteCounts.from_frame(df_window))
         
         # 生成统计信息
-        stats = self.generate_summary_stats(df_transformed, anomalies)
+        stats = self.generate_summary_stats(df_window, anomalies)
         
         # 保存处理结果
         # 保存清洗后的数据
-        df_transformed.to_csv(self.output_dir / 'processed_logs.csv', index=False)
+        if parts is not None:
+            if self.since is None and self.until is None:
+                remove_partitions(self.output_dir, 'processed_logs')  # 全部重新处理，清除已不存在的分区
+            write_partitions(df_transformed.assign(**{PART_COLUMN: parts.loc[df_transformed.index]}),
+                             self.output_dir, 'processed_logs', self.handoff_format, PROCESSED_LOG_COLUMNS, PART_COLUMN)
+        else:
+            write_handoff(df_transformed, self.output_dir, 'processed_logs', self.handoff_format, PROCESSED_LOG_COLUMNS)
         
         # 保存异常报告
         with open(self.output_dir / 'anomalies.json', 'w', encoding='utf-8') as f:
@@ -333,6 +529,14 @@ class LogProcessor:
         with open(self.output_dir / 'processing_stats.json', 'w', encoding='utf-8') as f:
             json.dump(stats, f, indent=2, ensure_ascii=False, default=str)
         
+        # 处理结果保存后再记录本次的内容哈希，中途失败时下次运行仍会处理这些记录
+        if self.dedup_index is not None and self.new_hashes is not None:
+            self.dedup_index.add(self.new_hashes)
+            self.dedup_index.save()
+            self.logger.info(f"去重索引已更新: {len(self.dedup_index)} 条")
+        if self.timeseries is not None:
+            self.timeseries.save()
+        
         self.logger.info("日志处理完成")
         
         return {
@@ -340,18 +544,142 @@ class LogProcessor:
             'anomalies': anomalies,
             'stats': stats
         }
+    
+    def run_chunked_processing(self):
+        """分块处理：每次读取 chunk_rows 行，依次清洗、转换、检测并追加写入处理结果，峰值内存与输入大小无关
+        
+        异常检测和汇总统计按块计数后合并，结果与整体处理相同。块间去重使用只在本次运行中存在的精确索引
+        （每条记录 8 字节，启用跨运行去重时另外保留内容哈希），各IP请求数与不同IP的数量成正比
+        """
+        self.logger.info(f"开始日志处理（分块模式，每块 {self.chunk_rows} 行）")
+        
+        partitioned = (self.input_dir / 'parsed_logs').is_dir()
+        save_index = self.dedup_index is not None
+        if partitioned and save_index:
+            # 与整体处理相同，分区输入由增量分析避免重复
+            self.logger.warning("分区输入不使用跨运行去重索引")
+            save_index = False
+        if not save_index:
+            self.dedup_index = None
+        self.seen_keys = SortedHashIndex()
+        kept_hashes = []
+        
+        template_file = self.input_dir / TEMPLATE_FILE
+        anomaly_counts = summary_counts = None
+        minute_counts = MinuteCounts()
+        chunks = 0
+        with FrameHandoffWriter(self.output_dir, 'processed_logs', self.handoff_format, PROCESSED_LOG_COLUMNS) as writer:
+            for part, df in iter_handoff(self.input_dir, 'parsed_logs', self.chunk_rows, self.since, self.until):
+                if chunks == 0:
+                    if partitioned and self.since is None and self.until is None:
+                        remove_partitions(self.output_dir, 'processed_logs')  # 全部重新处理，清除已不存在的分区
+                    if 'template_id' in df.columns and template_file.exists():
+                        self.templates = TemplateMiner.load(template_file)
+                chunks += 1
+                self.logger.info(f"处理第 {chunks} 块: {len(df)} 条记录")
+                
+                df = self.clean_data(df)
+                # 本块保留记录的去重键加入本次运行的索引，后续块中相同的记录视为重复；
+                # 跨运行索引在全部结果保存后才加入本次的内容哈希并写入
+                if self.new_keys is not None:
+                    self.seen_keys.add(self.new_keys)
+                    if save_index:
+                        kept_hashes.append(self.new_hashes)
+                df = self.transform_data(df)
+                
+                df_window = df
+                if (self.since is not None or self.until is not None) and TIME_COLUMN in df.columns:
+                    df_window = filter_time_range(df, self.since, self.until)
+                anomaly_counts = merge_counts(anomaly_counts, self.count_anomalies(df_window))
+                summary_counts = merge_counts(summary_counts, self.count_summary(df_window))
+                if self.timeseries is not None:
+                    minute_counts.merge(MinuteCounts.from_frame(df_window))
+                
+                writer.write(df, part)
+        
+        if not chunks:
+            self.logger.error("没有可处理的数据")
+            return
+        
+        anomalies = self.build_anomalies(anomaly_counts)
+        if self.timeseries is not None:
+            # 各块的分钟可能交错（如多个文件覆盖同一时段），合并后再按时间顺序计入基线
+            anomalies += self.detect_timeseries_anomalies(minute_counts)
+        stats = self.build_summary_stats(summary_counts, anomalies)
+        self.logger.info(f"分块处理完成: {chunks} 块, 保存 {writer.rows} 条记录, 发现 {len(anomalies)} 个异常")
+        
+        with open(self.output_dir / 'anomalies.json', 'w', encoding='utf-8') as f:
+            json.dump(anomalies, f, indent=2, ensure_ascii=False)
+        
+        with open(self.output_dir / 'processing_stats.json', 'w', encoding='utf-8') as f:
+            json.dump(stats, f, indent=2, ensure_ascii=False, default=str)
+        
+        if save_index:
+            if kept_hashes:
+                self.dedup_index.add(np.concatenate(kept_hashes))
+            self.dedup_index.save()
+            self.logger.info(f"去重索引已更新: {len(self.dedup_index)} 条")
+        if self.timeseries is not None:
+            self.timeseries.save()
+        
+        self.logger.info("日志处理完成")
+        
+        # 分块模式不保留处理结果，只返回记录数
+        return {
+            'processed_rows': writer.rows,
+            'anomalies': anomalies,
+            'stats': stats
+        }
 
 def main():
     parser = argparse.ArgumentParser(description='日志处理工具')
     parser.add_argument('--input', required=True, help='输入目录（包含解析后的日志）')
     parser.add_argument('--output', required=True, help='输出目录')
     parser.add_argument('--config', help='配置文件路径')
+    parser.add_argument('--handoff-format', choices=['csv', 'feather', 'parquet'],
+                        help='处理结果 processed_logs 的保存格式（默认csv，feather/parquet 需要 pyarrow）')
+    parser.add_argument('--since', type=parse_time_bound,
+                        help='只处理此时间之后的记录（如 24h、7d、2024-10-10、2024-10-10T13:00）')
+    parser.add_argument('--until', type=parse_time_bound, help='只处理此时间之前的记录（格式同 --since）')
+    parser.add_argument('--chunk-rows', type=int,
+                        help='分块处理：每次读取、处理并写入的行数，峰值内存与输入大小无关（默认整体加载处理）')
+    parser.add_argument('--cross-run-dedup', action='store_true',
+                        help='跨运行去重：丢弃以前运行处理过的相同记录（重叠收集的日志），已处理的内容哈希保存在去重索引中')
+    parser.add_argument('--dedup-index', help='去重索引文件路径（默认: 输出目录/dedup_index.npy，bloom 模式为 dedup_bloom.npz）')
+    parser.add_argument('--dedup-mode', choices=DEDUP_MODES, default='exact',
+                        help='去重索引模式：exact 为排序哈希数组（每条 8 字节，无误判），bloom 为固定内存的布隆过滤器')
+    parser.add_argument('--dedup-capacity', type=int, default=DEFAULT_BLOOM_CAPACITY,
+                        help='bloom 模式的预计记录数（与误判率共同决定内存）')
+    parser.add_argument('--dedup-error-rate', type=float, default=DEFAULT_BLOOM_ERROR_RATE,
+                        help='bloom 模式的误判率（新记录被当作重复丢弃的概率，默认0.001）')
+    parser.add_argument('--windowed-detection', action='store_true',
+                        help='按分钟的时间序列异常检测：每分钟记录数、错误率和各IP请求数与 EWMA 基线比较，基线保存在状态文件中跨运行更新')
+    parser.add_argument('--timeseries-state', help='时间序列基线状态文件路径（默认: 输出目录/timeseries_state.json）')
+    parser.add_argument('--ewma-alpha', type=float, default=DEFAULT_ALPHA,
+                        help='EWMA 平滑系数，基线约等于最近 1/alpha 分钟的加权平均（默认0.05）')
+    parser.add_argument('--zscore-threshold', type=float, default=DEFAULT_Z_THRESHOLD,
+                        help='z-score 超过此值时报告异常（默认4）')
     args = parser.parse_args()
     
     config = {}
     if args.config:
         with open(args.config, 'r', encoding='utf-8') as f:
             config = json.load(f)
+    if args.handoff_format:
+        config['handoff_format'] = args.handoff_format
+    if args.since:
+        config['since'] = args.since
+    if args.until:
+        config['until'] = args.until
+    if args.chunk_rows:
+        config['chunk_rows'] = args.chunk_rows
+    if args.cross_run_dedup:
+        config['dedup_index'] = args.dedup_index or str(Path(args.output) / DEDUP_INDEX_FILES[args.dedup_mode])
+        config.update(dedup_mode=args.dedup_mode, dedup_capacity=args.dedup_capacity,
+                      dedup_error_rate=args.dedup_error_rate)
+    if args.windowed_detection:
+        config['timeseries_state'] = args.timeseries_state or str(Path(args.output) / TIMESERIES_STATE_FILE)
+        config.update(ewma_alpha=args.ewma_alpha, zscore_threshold=args.zscore_threshold)
     
     processor = LogProcessor(args.input, args.output, config)
     processor.run_processing()
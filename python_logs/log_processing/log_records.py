@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+紧凑的解析记录批次
+解析结果按列保存，不再为每行保留一个字典：取值重复较多的列（方法、协议、状态码、文件名等）
+使用字典编码，每个不同取值只保存一份，各行只保存 4 字节编号；其余字符串列拼接为一个字符串，
+整数列保存为数组，避免每个取值一个 Python 对象
+"""
+
+from array import array
+from itertools import chain, repeat
+
+# 使用字典编码的列
+DICTIONARY_FIELDS = frozenset({
+    'method', 'protocol', 'status', 'level', 'hostname', 'process', 'file_name', 'format'
+})
+
+class DictionaryColumn:
+    """字典编码的列：values 为不同取值，codes 为每行取值在 values 中的编号"""
+    
+    __slots__ = ('values', 'codes')
+    
+    def __init__(self, values):
+        index = {}
+        self.codes = array('i', [index.setdefault(value, len(index)) for value in values])
+        self.values = list(index)
+    
+    def __len__(self):
+        return len(self.codes)
+    
+    def __iter__(self):
+        return map(self.values.__getitem__, self.codes)
+
+class StringColumn:
+    """字符串列：各行取值以换行符拼接保存（解析结果按行切分，取值中没有换行符），空值单独记录行号"""
+    
+    __slots__ = ('data', 'nulls')
+    
+    def __init__(self, data, nulls):
+        self.data = data
+        self.nulls = nulls
+    
+    def __len__(self):
+        return self.data.count('\n') + 1
+    
+    def __iter__(self):
+        values = self.data.split('\n')
+        for index in self.nulls:
+            values[index] = None
+        return iter(values)
+
+def compact_column(name, values):
+    """按取值选择列的保存方式，无法压缩时保留为列表"""
+    if name in DICTIONARY_FIELDS:
+        return DictionaryColumn(values)
+    
+    nulls = array('i', [index for index, value in enumerate(values) if value is None])
+    try:
+        data = '\n'.join(['' if value is None else value for value in values] if nulls else values)
+    except TypeError:
+        # 非字符串列（如行号）
+        try:
+            return array('q', values)
+        except (TypeError, OverflowError):
+            return values
+    if data.count('\n') != len(values) - 1:
+        return values
+    return StringColumn(data, nulls)
+
+class RecordBatch:
+    """按列保存的一批解析记录，列按首次出现的顺序排列，记录中没有的列为 None"""
+    
+    __slots__ = ('columns', 'count')
+    
+    def __init__(self, records=()):
+        records = list(records)
+        self.count = len(records)
+        self.columns = {}
+        for name in dict.fromkeys(chain.from_iterable(records)):
+            values = [record.get(name) for record in records]
+            self.columns[name] = compact_column(name, values)
+    
+    def rows(self, fieldnames):
+        """按给定列顺序逐行返回取值元组"""
+        return zip(*(self.columns.get(name, repeat(None, self.count)) for name in fieldnames))
+    
+    def __len__(self):
+        return self.count
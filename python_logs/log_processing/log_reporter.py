@@ -8,7 +8,6 @@ import os
 import json
 import logging
 import argparse
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
@@ -17,15 +16,22 @@ from jinja2 import Template
 import base64
 from io import BytesIO
 
+from log_storage import parse_time_bound, read_handoff
+
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans']
 plt.rcParams['axes.unicode_minus'] = False
 
+# 报告用到的处理结果列，列式文件只加载这些列
+REPORT_COLUMNS = ['status_category', 'hour', 'ip', 'date', 'size_category']
+
 class LogReporter:
-    def __init__(self, analysis_dir, output_dir):
-        """初始化日志报告生成器"""
+    def __init__(self, analysis_dir, output_dir, since=None, until=None):
+        """初始化日志报告生成器，since/until 为报告的时间范围（标准化时间字符串）"""
         self.analysis_dir = Path(analysis_dir)
         self.output_dir = Path(output_dir)
+        self.since = since
+        self.until = until
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.setup_logging()
         
@@ -49,10 +55,11 @@ class LogReporter:
         """加载分析数据"""
         data = {}
         
-        # 加载处理后的日志数据
-        processed_file = self.analysis_dir / 'processed_logs.csv'
-        if processed_file.exists():
-            data['logs'] = pd.read_csv(processed_file)
+        # 加载处理后的日志数据（processed_logs.csv / .feather / .parquet 或分区目录），只读取时间范围内的分区
+        logs = read_handoff(self.analysis_dir, 'processed_logs', columns=REPORT_COLUMNS,
+                            since=self.since, until=self.until)
+        if logs is not None:
+            data['logs'] = logs
         
         # 加载异常数据
         anomalies_file = self.analysis_dir / 'anomalies.json'
@@ -487,9 +494,12 @@ def main():
     parser = argparse.ArgumentParser(description='日志报告生成工具')
     parser.add_argument('--analysis', required=True, help='分析结果目录')
     parser.add_argument('--report', required=True, help='报告输出目录')
+    parser.add_argument('--since', type=parse_time_bound,
+                        help='只统计此时间之后的日志（如 24h、7d、2024-10-10、2024-10-10T13:00）')
+    parser.add_argument('--until', type=parse_time_bound, help='只统计此时间之前的日志（格式同 --since）')
     args = parser.parse_args()
     
-    reporter = LogReporter(args.analysis, args.report)
+    reporter = LogReporter(args.analysis, args.report, since=args.since, until=args.until)
     reporter.run_reporting()
 
 if __name__ == '__main__':
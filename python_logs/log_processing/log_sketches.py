@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+近似统计草图
+内存固定、与数据量无关，可在区间、文件和多次运行之间合并：
+HyperLogLog 估计去重计数，Space-Saving 找出高频值（Top N）并给出每个值的最大高估量
+"""
+
+import math
+import base64
+import hashlib
+import heapq
+
+# HyperLogLog 精度（寄存器数 = 2 ** precision）的取值范围
+MIN_PRECISION = 4
+MAX_PRECISION = 18
+
+def hash64(value):
+    """与进程无关的 64 位哈希，保证不同运行之间的草图可以合并"""
+    return int.from_bytes(hashlib.blake2b(str(value).encode('utf-8', 'replace'), digest_size=8).digest(), 'big')
+
+class HyperLogLog:
+    """按字段估计去重计数，error 为目标相对标准误差"""
+    
+    def __init__(self, field, error=0.01):
+        self.field = field
+        # 相对标准误差约为 1.04 / sqrt(寄存器数)
+        precision = math.ceil(math.log2((1.04 / error) ** 2))
+        self.precision = min(MAX_PRECISION, max(MIN_PRECISION, precision))
+        self.registers = bytearray(1 << self.precision)
+    
+    def update(self, log):
+        value = log.get(self.field)
+        if value is None:
+            return
+        
+        hashed = hash64(value)
+        width = 64 - self.precision
+        # 高 precision 位选择寄存器，剩余位中第一个 1 的位置作为秩
+        index = hashed >> width
+        rank = width - (hashed & ((1 << width) - 1)).bit_length() + 1
+        registers = self.registers
+        if rank > registers[index]:
+            registers[index] = rank
+    
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError(f"HyperLogLog 精度不同，无法合并: {self.precision} != {other.precision}")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+    
+    def distinct(self):
+        """估计的去重计数"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        
+        # 小基数时使用线性计数修正
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+    
+    def relative_error(self):
+        """相对标准误差"""
+        return 1.04 / math.sqrt(len(self.registers))
+    
+    def to_dict(self):
+        return {'precision': self.precision, 'registers': base64.b64encode(bytes(self.registers)).decode('ascii')}
+    
+    def load(self, data):
+        self.precision = data['precision']
+        self.registers = bytearray(base64.b64decode(data['registers']))
+        return self
+
+class SpaceSaving:
+    """按字段找出高频值，error 为高估量占总数的比例上限
+    
+    最多跟踪 ceil(1 / error) 个值，每个值的计数只会高估，且高估量不超过 总数 * error；
+    不同值的个数不超过容量时结果是精确的。
+    """
+    
+    def __init__(self, field, error=0.001, min_capacity=10):
+        self.field = field
+        self.capacity = max(min_capacity, math.ceil(1 / error))
+        self.total = 0
+        self.counts = {}
+        # 每个值计数中可能的高估量
+        self.errors = {}
+        # (计数, 值) 小顶堆，每个值一项；计数可能落后于 counts，取最小值时再校正
+        self.heap = []
+    
+    def update(self, log):
+        value = log.get(self.field)
+        if value is None:
+            return
+        
+        self.total += 1
+        counts = self.counts
+        if value in counts:
+            counts[value] += 1
+        elif len(counts) < self.capacity:
+            counts[value] = 1
+            self.errors[value] = 0
+            heapq.heappush(self.heap, (1, value))
+        else:
+            # 替换当前计数最小的值，新值继承其计数作为高估量
+            heap = self.heap
+            while heap[0][0] != counts[heap[0][1]]:
+                heapq.heapreplace(heap, (counts[heap[0][1]], heap[0][1]))
+            minimum, evicted = heap[0]
+            del counts[evicted]
+            del self.errors[evicted]
+            counts[value] = minimum + 1
+            self.errors[value] = minimum
+            heapq.heapreplace(heap, (minimum + 1, value))
+    
+    def minimum(self):
+        """未被跟踪的值可能的最大计数"""
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+    
+    def merge(self, other):
+        """合并两个摘要：一方未跟踪的值按该方的最小计数估计，结果仍只高估"""
+        own_minimum = self.minimum()
+        other_minimum = other.minimum()
+        counts = {}
+        errors = {}
+        for value in self.counts.keys() | other.counts.keys():
+            counts[value] = self.counts.get(value, own_minimum) + other.counts.get(value, other_minimum)
+            errors[value] = self.errors.get(value, own_minimum) + other.errors.get(value, other_minimum)
+        
+        kept = sorted(counts, key=lambda value: (-counts[value], str(value)))[:self.capacity]
+        self.total += other.total
+        self.counts = {value: counts[value] for value in kept}
+        self.errors = {value: errors[value] for value in kept}
+        self.heap = [(count, value) for value, count in self.counts.items()]
+        heapq.heapify(self.heap)
+    
+    def most_common(self, n=None):
+        """按估计次数降序返回 {值: 次数}"""
+        ranked = sorted(self.counts.items(), key=lambda item: (-item[1], str(item[0])))
+        return dict(ranked[:n] if n is not None else ranked)
+    
+    def error(self, value):
+        """value 的估计次数最多高估多少"""
+        return self.errors.get(value, self.minimum())
+    
+    def to_dict(self):
+        return {'capacity': self.capacity, 'total': self.total,
+                'items': [[value, count, self.errors[value]] for value, count in self.counts.items()]}
+    
+    def load(self, data):
+        self.capacity = data['capacity']
+        self.total = data['total']
+        self.counts = {value: count for value, count, _ in data['items']}
+        self.errors = {value: error for value, _, error in data['items']}
+        self.heap = [(count, value) for value, count in self.counts.items()]
+        heapq.heapify(self.heap)
+        return self
@@ -0,0 +1,650 @@
+#!/usr/bin/env python3
+"""
+阶段间交接文件
+parsed_logs / processed_logs 可以保存为 CSV（默认）或列式格式（Arrow IPC/Feather、Parquet）。
+列式文件使用显式的列类型，读取时只加载需要的列，并通过内存映射加载，避免每个阶段重新推断类型。
+也可以按日期/小时分区保存（<name>/date=YYYY-MM-DD/hour=HH/），每个分区记录各文件的时间范围，
+按时间范围读取时只打开重叠的分区文件
+"""
+
+import csv
+import json
+import shutil
+import importlib.util
+from datetime import datetime, timedelta
+
+from log_records import DictionaryColumn
+from timestamp_parser import STANDARD_TIME_FORMAT, standard_format
+
+# 可选依赖：pyarrow 在首次读写列式文件时才导入（导入后常驻内存约 45 MB，日志分析保存为 CSV 时不需要）
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+pa = feather = pq = None
+
+def import_pyarrow():
+    global pa, feather, pq
+    if pa is None:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+        pa, feather, pq = pyarrow, pyarrow.feather, pyarrow.parquet
+
+# 交接文件格式及扩展名（同名文件同时存在时按此顺序优先）
+HANDOFF_FORMATS = {
+    'feather': '.feather',
+    'parquet': '.parquet',
+    'csv': '.csv',
+}
+
+# 分区目录：<name>/date=YYYY-MM-DD/hour=HH/part-*.<扩展名>，时间无法解析的记录放在未知分区
+UNKNOWN_PARTITION = 'date=unknown'
+# 每个分区目录下的统计文件：各分区文件的行数和最早/最晚时间
+PARTITION_STATS_FILE = '_partition.json'
+# 按时间范围过滤时使用的列（标准化时间）
+TIME_COLUMN = 'normalized_timestamp'
+# 读取分区目录时记录每行所属分区文件的列
+PART_COLUMN = '_part'
+
+# CSV 中不能按取值推断类型的列：模板参数可能全是数字，推断为数值会丢失原文（如前导零）
+CSV_TEXT_COLUMNS = {'params': object}
+
+# 解析结果的列类型，未列出的列按字符串保存
+PARSED_LOG_COLUMNS = {
+    'ip': 'string',
+    'timestamp': 'string',
+    'method': 'string',
+    'url': 'string',
+    'protocol': 'string',
+    'status': 'int32',
+    'size': 'string',  # apache 日志中可能为 '-'
+    'hostname': 'string',
+    'process': 'string',
+    'level': 'string',
+    'message': 'string',
+    'raw_line': 'string',
+    'template_id': 'int64',
+    'params': 'string',
+    'extra': 'string',  # JSON 日志中未映射的字段（紧凑 JSON）
+    'line_number': 'int64',
+    'file_name': 'string',
+    'format': 'string',
+}
+
+# 处理结果的列类型：在解析结果基础上增加派生列，取值很少的分类列使用字典编码
+PROCESSED_LOG_COLUMNS = dict(
+    PARSED_LOG_COLUMNS,
+    normalized_timestamp='timestamp[us]',
+    hour='int8',
+    day_of_week='int8',
+    date='date32',
+    status_category='category',
+    url_path='category',
+    has_query='bool',
+    size_category='category',
+)
+
+def arrow_type(type_name):
+    """将列类型名转换为 Arrow 类型"""
+    if type_name == 'category':
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.type_for_alias(type_name)
+
+def handoff_path(directory, name, file_format):
+    return directory / f"{name}{HANDOFF_FORMATS[file_format]}"
+
+def find_handoff(directory, name):
+    """返回已存在的交接文件 (路径, 格式)，不存在时返回 None"""
+    for file_format in HANDOFF_FORMATS:
+        path = handoff_path(directory, name, file_format)
+        if path.exists():
+            return path, file_format
+    return None
+
+def remove_handoff(directory, name, keep=None):
+    """删除 name 的各格式交接文件（keep 格式除外），避免下游读到旧数据"""
+    for file_format in HANDOFF_FORMATS:
+        path = handoff_path(directory, name, file_format)
+        if file_format != keep and path.exists():
+            path.unlink()
+
+def to_arrow_value(value, type_name):
+    """将单个记录值转换为列类型对应的 Python 值，无法转换时为空值"""
+    if value is None:
+        return None
+    if type_name.startswith('int'):
+        if isinstance(value, int):
+            return value
+        text = str(value)
+        return int(text) if text.isascii() and text.isdigit() else None
+    return str(value)
+
+def column_to_arrow(column, count, arrow_field_type, type_name):
+    """将 RecordBatch 的一列转换为 Arrow 数组，字典编码列只转换不同取值"""
+    if column is None:
+        return pa.nulls(count, arrow_field_type)
+    
+    if isinstance(column, DictionaryColumn):
+        dictionary = pa.array([to_arrow_value(value, type_name) for value in column.values], type=arrow_field_type)
+        codes = pa.Array.from_buffers(pa.int32(), len(column.codes), [None, pa.py_buffer(column.codes)])
+        return dictionary.take(codes)
+    
+    if not isinstance(column, list):
+        column = list(column)
+    try:
+        # 解析结果通常已是目标类型，直接转换
+        return pa.array(column, type=arrow_field_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([to_arrow_value(value, type_name) for value in column], type=arrow_field_type)
+
+class HandoffWriter:
+    """按批写入交接文件，内存占用与总记录数无关"""
+    
+    def __init__(self, path, fieldnames, column_types, file_format):
+        self.path = path
+        self.file_format = file_format
+        self.fieldnames = list(fieldnames)
+        if file_format == 'csv':
+            self._sink = open(path, 'w', encoding='utf-8', newline='')
+            self._writer = csv.writer(self._sink, lineterminator='\n')
+            self._writer.writerow(self.fieldnames)
+            return
+        
+        import_pyarrow()
+        self.column_types = [column_types.get(name, 'string') for name in fieldnames]
+        # 分批写入时各批的字典不同，字典编码列按普通字符串保存（Parquet 会自动做字典编码）
+        self.schema = pa.schema([
+            pa.field(name, pa.string() if type_name == 'category' else arrow_type(type_name))
+            for name, type_name in zip(fieldnames, self.column_types)
+        ])
+        if file_format == 'feather':
+            # 不压缩，读取时可以直接内存映射
+            self._sink = pa.OSFile(str(path), 'wb')
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+        else:
+            self._sink = None
+            self._writer = pq.ParquetWriter(str(path), self.schema)
+    
+    def write_batch(self, batch):
+        """写入一个 RecordBatch"""
+        if not batch.count:
+            return
+        if self.file_format == 'csv':
+            self._writer.writerows(batch.rows(self.fieldnames))
+            return
+        arrays = [column_to_arrow(batch.columns.get(field.name), batch.count, field.type, type_name)
+                  for field, type_name in zip(self.schema, self.column_types)]
+        self._writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+    
+    def close(self):
+        if self.file_format != 'csv':
+            self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+def dataframe_to_table(df, column_types):
+    """按列类型将 DataFrame 转换为 Arrow 表，无法转换的列保留推断出的类型"""
+    import pandas as pd  # 只有读写 DataFrame 时才需要，日志分析写入交接文件时不加载 pandas
+    import_pyarrow()
+    
+    arrays = []
+    for name in df.columns:
+        column = df[name]
+        try:
+            array = pa.array(column, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # 混合类型的对象列按字符串保存
+            array = pa.array([None if pd.isna(value) else str(value) for value in column], type=pa.string())
+        
+        type_name = column_types.get(name)
+        if type_name is not None and array.type != arrow_type(type_name):
+            try:
+                array = array.cast(arrow_type(type_name))
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+                pass
+        arrays.append(array)
+    return pa.Table.from_arrays(arrays, names=[str(name) for name in df.columns])
+
+def write_frame(df, path, file_format, column_types):
+    """按格式保存 DataFrame 到单个文件"""
+    if file_format == 'csv':
+        # 与 FrameWriter 相同：时间全为零点时 pandas 默认只写日期，读取后按时间范围过滤会丢失这些行
+        df.to_csv(path, index=False, date_format=STANDARD_TIME_FORMAT)
+        return
+    
+    import_pyarrow()
+    if file_format == 'feather':
+        feather.write_feather(dataframe_to_table(df, column_types), path, compression='uncompressed')
+    else:
+        pq.write_table(dataframe_to_table(df, column_types), path)
+
+def write_handoff(df, directory, name, file_format, column_types):
+    """保存 DataFrame 为交接文件，并删除其他格式的同名旧文件"""
+    path = handoff_path(directory, name, file_format)
+    write_frame(df, path, file_format, column_types)
+    remove_handoff(directory, name, keep=file_format)
+    remove_partitions(directory, name)
+    return path
+
+def read_file(path, file_format, columns=None):
+    """读取单个交接文件，columns 为需要的列（不存在的列忽略）"""
+    if file_format == 'csv':
+        import pandas as pd
+        if columns is None:
+            return pd.read_csv(path, dtype=CSV_TEXT_COLUMNS)
+        return pd.read_csv(path, usecols=lambda column: column in columns, dtype=CSV_TEXT_COLUMNS)
+    
+    if not HAS_PYARROW:
+        raise ImportError(f"读取 {path.name} 需要安装 pyarrow")
+    import_pyarrow()
+    
+    if file_format == 'feather':
+        with pa.memory_map(str(path)) as source:
+            names = pa.ipc.open_file(source).schema.names
+    else:
+        names = pq.read_schema(path).names
+    
+    selected = None
+    if columns is not None:
+        # 至少保留一列，保证行数正确
+        selected = [column for column in names if column in columns] or names[:1]
+    
+    if file_format == 'feather':
+        table = feather.read_table(path, columns=selected, memory_map=True)
+    else:
+        table = pq.read_table(path, columns=selected, memory_map=True)
+    return table_to_frame(table)
+
+def table_to_frame(table):
+    """Arrow 表转换为 DataFrame，字典编码列还原为普通字符串，与读取 CSV 的结果一致"""
+    for index, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(index, field.name, table.column(index).cast(field.type.value_type))
+    return table.to_pandas()
+
+def rechunk(batches, chunk_rows):
+    """将 RecordBatch 重新切分为每块 chunk_rows 行的 Arrow 表（最后一块可能更少），切片不复制数据"""
+    pending, rows = [], 0
+    for batch in batches:
+        while batch.num_rows:
+            take = min(chunk_rows - rows, batch.num_rows)
+            pending.append(batch.slice(0, take))
+            rows += take
+            batch = batch.slice(take)
+            if rows == chunk_rows:
+                yield pa.Table.from_batches(pending)
+                pending, rows = [], 0
+    if rows:
+        yield pa.Table.from_batches(pending)
+
+def iter_file(path, file_format, chunk_rows):
+    """按块读取单个交接文件，每块最多 chunk_rows 行"""
+    if file_format == 'csv':
+        import pandas as pd
+        with pd.read_csv(path, dtype=CSV_TEXT_COLUMNS, chunksize=chunk_rows) as reader:
+            for df in reader:
+                # 各块分别推断类型：有空值的整数列读为浮点数，按可空整数返回，使各块的类型和保存结果一致
+                df = restore_empty_columns(df)
+                for column in df.columns:
+                    if df[column].dtype == float and (df[column].dropna() % 1 == 0).all():
+                        df[column] = df[column].astype('Int64')
+                yield df
+        return
+    
+    if not HAS_PYARROW:
+        raise ImportError(f"读取 {path.name} 需要安装 pyarrow")
+    import_pyarrow()
+    
+    if file_format == 'feather':
+        with pa.memory_map(str(path)) as source:
+            reader = pa.ipc.open_file(source)
+            batches = (reader.get_batch(index) for index in range(reader.num_record_batches))
+            for table in rechunk(batches, chunk_rows):
+                yield table_to_frame(table)
+    else:
+        for batch in pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=chunk_rows):
+            yield table_to_frame(pa.Table.from_batches([batch]))
+
+def restore_empty_columns(df):
+    """CSV 中整列为空时推断为浮点列，与列式文件一致按对象列返回，以便使用 .str 方法"""
+    for column in df.columns[df.isna().all()]:
+        if df[column].dtype == float:
+            df[column] = df[column].astype(object)
+    return df
+
+def read_handoff(directory, name, columns=None, since=None, until=None, part_column=None):
+    """读取交接文件或分区目录，文件不存在时返回 None
+    
+    since/until 为标准化时间字符串：分区目录只打开时间范围重叠的分区文件，
+    数据带有 normalized_timestamp 列时再按行过滤；part_column 非空时增加一列记录每行来自哪个分区文件
+    """
+    import pandas as pd
+    
+    filtering = since is not None or until is not None
+    if columns is not None and filtering:
+        columns = list(columns) + [TIME_COLUMN]
+    
+    root = directory / name
+    if root.is_dir():
+        frames = []
+        for path in list_partition_files(root, since, until):
+            frame = read_file(path, file_format_of(path), columns)
+            if part_column is not None:
+                frame[part_column] = path.relative_to(root).with_suffix('').as_posix()
+            frames.append(frame)
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+    else:
+        found = find_handoff(directory, name)
+        if found is None:
+            return None
+        df = read_file(*found, columns)
+    
+    df = restore_empty_columns(df)
+    
+    if filtering and TIME_COLUMN in df.columns:
+        df = filter_time_range(df, since, until)
+        if columns is not None and TIME_COLUMN not in columns[:-1]:
+            df = df.drop(columns=TIME_COLUMN)
+    return df
+
+def iter_handoff(directory, name, chunk_rows, since=None, until=None):
+    """按块读取交接文件或分区目录，生成 (分区文件相对路径, DataFrame)，单个文件的分区为 None
+    
+    每块最多 chunk_rows 行，同一分区文件的块连续生成；时间范围的处理与 read_handoff 相同，文件不存在时不生成任何块
+    """
+    root = directory / name
+    if root.is_dir():
+        sources = [(path.relative_to(root).with_suffix('').as_posix(), path, file_format_of(path))
+                   for path in list_partition_files(root, since, until)]
+    else:
+        found = find_handoff(directory, name)
+        sources = [] if found is None else [(None, *found)]
+    
+    for part, path, file_format in sources:
+        for df in iter_file(path, file_format, chunk_rows):
+            if (since is not None or until is not None) and TIME_COLUMN in df.columns:
+                df = filter_time_range(df, since, until)
+            yield part, df
+
+def file_format_of(path):
+    """按扩展名判断交接文件格式"""
+    for file_format, suffix in HANDOFF_FORMATS.items():
+        if path.suffix == suffix:
+            return file_format
+    return None
+
+def parse_time_bound(text, now=None):
+    """解析 --since/--until：'30m'、'24h'、'7d' 表示距现在的时长，其余按 ISO 格式（如 2024-10-10、
+    2024-10-10T13:00）；返回标准化时间字符串，格式不正确时抛出 ValueError"""
+    if text is None:
+        return None
+    text = text.strip()
+    units = {'m': 'minutes', 'h': 'hours', 'd': 'days'}
+    if text[-1:] in units and text[:-1].isdigit():
+        now = now or datetime.now()
+        return standard_format(now - timedelta(**{units[text[-1]]: int(text[:-1])}))
+    return standard_format(datetime.fromisoformat(text))
+
+def filter_time_range(df, since=None, until=None, column=TIME_COLUMN):
+    """保留 column 在 [since, until] 内的行，无法解析时间的行被过滤"""
+    import pandas as pd
+    
+    times = pd.to_datetime(df[column], format=STANDARD_TIME_FORMAT, errors='coerce')
+    mask = times.notna()
+    if since is not None:
+        mask &= times >= pd.Timestamp(since)
+    if until is not None:
+        mask &= times <= pd.Timestamp(until)
+    return df[mask]
+
+def partition_dir(timestamp):
+    """按标准化时间返回分区相对目录，时间为空时返回未知分区"""
+    if not timestamp:
+        return UNKNOWN_PARTITION
+    return f"date={timestamp[:10]}/hour={timestamp[11:13]}"
+
+def load_partition_stats(partition_path):
+    stats_file = partition_path / PARTITION_STATS_FILE
+    if not stats_file.exists():
+        return {'rows': 0, 'min_timestamp': None, 'max_timestamp': None, 'parts': {}}
+    with open(stats_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def update_partition_stats(partition_path, part_name, rows, min_timestamp, max_timestamp):
+    """记录分区文件的行数和时间范围，并重新汇总分区统计"""
+    stats = load_partition_stats(partition_path)
+    stats['parts'][part_name] = {'rows': rows, 'min_timestamp': min_timestamp, 'max_timestamp': max_timestamp}
+    parts = stats['parts'].values()
+    stats['rows'] = sum(part['rows'] for part in parts)
+    stats['min_timestamp'] = min((part['min_timestamp'] for part in parts if part['min_timestamp']), default=None)
+    stats['max_timestamp'] = max((part['max_timestamp'] for part in parts if part['max_timestamp']), default=None)
+    with open(partition_path / PARTITION_STATS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(stats, f, indent=2, ensure_ascii=False)
+
+def overlaps(stats, since, until):
+    """统计的时间范围是否与 [since, until] 重叠"""
+    if stats['min_timestamp'] is None:
+        return False
+    return not (since is not None and stats['max_timestamp'] < since
+                or until is not None and stats['min_timestamp'] > until)
+
+def list_partition_files(root, since=None, until=None):
+    """按时间顺序返回与 [since, until] 重叠的分区文件
+    
+    先按目录名（日期、小时）排除分区，只读取边界附近分区的统计文件，再按各文件的时间范围筛选；
+    指定时间范围时跳过未知分区
+    """
+    filtering = since is not None or until is not None
+    files = []
+    for date_dir in sorted(root.glob('date=*')):
+        date = date_dir.name[len('date='):]
+        if date_dir.name == UNKNOWN_PARTITION:
+            hour_dirs = [] if filtering else [date_dir]
+        elif since is not None and date < since[:10] or until is not None and date > until[:10]:
+            continue
+        else:
+            hour_dirs = sorted(date_dir.glob('hour=*'))
+        
+        for hour_dir in hour_dirs:
+            if hour_dir is not date_dir:
+                hour = hour_dir.name[len('hour='):]
+                if (since is not None and f"{date} {hour}:59:59" < since
+                        or until is not None and f"{date} {hour}:00:00" > until):
+                    continue
+            
+            stats = load_partition_stats(hour_dir)
+            for part_name, part in sorted(stats['parts'].items()):
+                if (not filtering or overlaps(part, since, until)) and (hour_dir / part_name).exists():
+                    files.append(hour_dir / part_name)
+    return files
+
+def write_partitions(df, directory, name, file_format, column_types, part_column, time_column=TIME_COLUMN):
+    """按 part_column（分区文件的相对路径，不含扩展名）将 DataFrame 写回对应的分区文件，并更新分区统计"""
+    import pandas as pd
+    
+    for part, group in df.groupby(part_column, sort=True):
+        path = partition_file(directory, name, part, file_format)
+        group = group.drop(columns=part_column)
+        write_frame(group, path, file_format, column_types)
+        times = pd.Series(dtype=object)
+        if time_column in group.columns:
+            times = pd.to_datetime(group[time_column], format=STANDARD_TIME_FORMAT, errors='coerce').dropna()
+        update_partition_stats(path.parent, path.name, len(group),
+                               standard_format(times.min()) if len(times) else None,
+                               standard_format(times.max()) if len(times) else None)
+    remove_handoff(directory, name)
+
+def partition_file(directory, name, part, file_format):
+    """分区文件路径：创建分区目录，并删除同一分区文件的其他格式旧文件"""
+    path = directory / name / f"{part}{HANDOFF_FORMATS[file_format]}"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for other in HANDOFF_FORMATS.values():
+        stale = path.with_suffix(other)
+        if stale != path and stale.exists():
+            stale.unlink()
+    return path
+
+class FrameWriter:
+    """按块追加写入 DataFrame 到单个交接文件，内存占用与总行数无关
+    
+    各块的列按第一块对齐；列式文件的列类型按 column_types 固定（与 HandoffWriter 一样，字典编码列和未列出的列
+    按字符串保存）。同时记录行数和 time_column 的最早/最晚时间，用于分区统计
+    """
+    
+    def __init__(self, path, file_format, column_types, time_column=TIME_COLUMN):
+        self.path = path
+        self.file_format = file_format
+        self.column_types = column_types
+        self.time_column = time_column
+        self.columns = None
+        self.rows = 0
+        self.min_time = None
+        self.max_time = None
+        self._sink = None
+        self._writer = None
+    
+    def open(self, columns):
+        self.columns = list(columns)
+        if self.file_format == 'csv':
+            self._sink = open(self.path, 'w', encoding='utf-8', newline='')
+            return
+        
+        import_pyarrow()
+        self.types = [self.column_types.get(name, 'string') for name in self.columns]
+        self.schema = pa.schema([
+            pa.field(str(name), pa.string() if type_name == 'category' else arrow_type(type_name))
+            for name, type_name in zip(self.columns, self.types)
+        ])
+        if self.file_format == 'feather':
+            self._sink = pa.OSFile(str(self.path), 'wb')
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+        else:
+            self._writer = pq.ParquetWriter(str(self.path), self.schema)
+    
+    def write(self, df):
+        """追加一块数据（第一块即使为空也会写入表头）"""
+        import pandas as pd
+        
+        if self.columns is None:
+            self.open(df.columns)
+        df = df.reindex(columns=self.columns)
+        
+        if self.time_column in df.columns and len(df):
+            times = pd.to_datetime(df[self.time_column], format=STANDARD_TIME_FORMAT, errors='coerce').dropna()
+            if len(times):
+                self.min_time = min(times.min(), self.min_time) if self.min_time is not None else times.min()
+                self.max_time = max(times.max(), self.max_time) if self.max_time is not None else times.max()
+        
+        if self.file_format == 'csv':
+            # 固定时间格式：各块单独决定格式时，整块时间都是零点的块只会写出日期
+            df.to_csv(self._sink, header=self._sink.tell() == 0, index=False,
+                      date_format=STANDARD_TIME_FORMAT)
+        elif len(df):
+            arrays = [self.column_to_arrow(df[field.name], field.type, type_name)
+                      for field, type_name in zip(self.schema, self.types)]
+            self._writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+        self.rows += len(df)
+    
+    @staticmethod
+    def column_to_arrow(column, arrow_field_type, type_name):
+        """按固定的列类型转换一列，无法整列转换时逐个值转换（无法转换的为空值）
+        
+        由多个 RecordBatch 拼成的块中，pyarrow 支持的字符串列转换后是 ChunkedArray，合并为一个数组再写入
+        """
+        import pandas as pd
+        
+        try:
+            array = pa.array(column, from_pandas=True)
+            if isinstance(array, pa.ChunkedArray):
+                array = array.combine_chunks()
+            return array.cast(arrow_field_type)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+            return pa.array([None if pd.isna(value) else to_arrow_value(value, type_name)
+                             for value in column.astype(object)], type=arrow_field_type)
+    
+    def time_range(self):
+        """已写入记录的最早/最晚标准化时间，没有时间时为 None"""
+        if self.min_time is None:
+            return None, None
+        return standard_format(self.min_time), standard_format(self.max_time)
+    
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+
+class FrameHandoffWriter:
+    """按块写入交接文件 name：part 为空时写入单个文件，否则写入对应的分区文件并更新分区统计
+    
+    同一分区文件的块需连续写入；关闭时与 write_handoff / write_partitions 一样删除其他格式的旧文件
+    """
+    
+    def __init__(self, directory, name, file_format, column_types):
+        self.directory = directory
+        self.name = name
+        self.file_format = file_format
+        self.column_types = column_types
+        self.writer = None
+        self.part = None
+        self.files = 0
+        self.partitioned = False
+        self.rows = 0
+    
+    def write(self, df, part=None):
+        if self.writer is None or part != self.part:
+            if part is not None and not len(df):
+                return  # 与 write_partitions 一样，没有记录的分区不写文件
+            self.finish()
+            if part is None:
+                path = handoff_path(self.directory, self.name, self.file_format)
+            else:
+                path = partition_file(self.directory, self.name, part, self.file_format)
+                self.partitioned = True
+            self.writer = FrameWriter(path, self.file_format, self.column_types)
+            self.part = part
+            self.files += 1
+        self.writer.write(df)
+        self.rows += len(df)
+    
+    def finish(self):
+        """关闭当前文件，分区文件记录行数和时间范围"""
+        if self.writer is None:
+            return
+        self.writer.close()
+        if self.part is not None:
+            path = self.writer.path
+            update_partition_stats(path.parent, path.name, self.writer.rows, *self.writer.time_range())
+        self.writer = None
+    
+    def close(self):
+        self.finish()
+        if not self.files:
+            return
+        if self.partitioned:
+            remove_handoff(self.directory, self.name)
+        else:
+            remove_handoff(self.directory, self.name, keep=self.file_format)
+            remove_partitions(self.directory, self.name)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, *exc_info):
+        # 处理中途失败时只关闭当前文件，保留其他格式的旧文件
+        if exc_type is None:
+            self.close()
+        else:
+            self.finish()
+
+def remove_partitions(directory, name):
+    """删除分区目录"""
+    root = directory / name
+    if root.is_dir():
+        shutil.rmtree(root)
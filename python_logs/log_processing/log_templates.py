@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+日志模板挖掘
+未知格式的日志行按 Drain 算法聚类为模板：按词数和开头若干个词组成固定深度的解析树，叶节点中
+与模板相同的词所占比例达到阈值的行归入同一类，不同的位置变为通配符 <*>。
+每行只保存模板编号和通配符位置的参数，模板文本只保存一份，可以无损还原原始行
+"""
+
+import re
+import json
+from operator import eq
+from pathlib import Path
+
+from log_records import compact_column
+
+# 模板文件（与 parsed_logs 保存在同一目录）
+TEMPLATE_FILE = 'log_templates.json'
+WILDCARD = '<*>'
+# 解析树深度（含按词数分组的一层和叶节点），即按开头 depth - 2 个词分组
+DEFAULT_DEPTH = 4
+# 归入已有模板所需的相同词比例
+DEFAULT_SIMILARITY = 0.4
+# 每个内部节点的子节点数上限，超出后的词归入通配符节点
+DEFAULT_MAX_CHILDREN = 100
+# 开头若干个词到叶节点的缓存条数上限（同一前缀的路由结果不会改变）
+ROUTE_CACHE_SIZE = 100000
+
+# 含数字的词（编号、时间、地址等）在解析树中归入通配符节点
+has_digit = re.compile(r'\d').search
+
+class LogCluster:
+    """一类日志行：tokens 中通配符位置为 None，path 为所在叶节点的路径"""
+    
+    __slots__ = ('tokens', 'template_id', 'path', 'constants', 'wildcards')
+    
+    def __init__(self, tokens, path, template_id=None):
+        self.tokens = tokens
+        self.path = path
+        # 当前模板的编号；模板泛化后需要分配新编号（旧编号仍对应旧模板，已保存的记录可以还原）
+        self.template_id = template_id
+        self.update_positions()
+    
+    def update_positions(self):
+        """记录常量个数和通配符位置，编码时不必逐词判断"""
+        self.wildcards = [position for position, token in enumerate(self.tokens) if token is None]
+        self.constants = len(self.tokens) - len(self.wildcards)
+
+class TemplateMiner:
+    """Drain 风格的流式模板挖掘
+    
+    分两遍使用：add() 逐行聚类，finalize() 为新增或泛化的模板分配编号，encode() 将每行编码为
+    (模板编号, 参数)。编码时选择常量全部匹配的最具体的模板，结果只与最终模板有关，
+    相同的行总是得到相同的编码
+    """
+    
+    def __init__(self, depth=DEFAULT_DEPTH, similarity=DEFAULT_SIMILARITY, max_children=DEFAULT_MAX_CHILDREN):
+        self.depth = max(3, depth)
+        self.similarity = similarity
+        self.max_children = max_children
+        # {词数: {词: ... {词: [簇编号]}}}
+        self.root = {}
+        self.clusters = []
+        # {模板编号: {'cluster': 簇编号, 'tokens': 模板, 'count': 行数}}
+        self.templates = {}
+        self.route_cache = {}
+    
+    def route(self, tokens, create):
+        """返回 (叶节点, 路径)，叶节点为簇编号列表；create 为 False 且不存在时叶节点为 None"""
+        cache_key = (len(tokens), *tokens[:self.depth - 2])
+        cached = self.route_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        leaf, path = self.find_leaf(tokens, create)
+        if leaf is not None:
+            if len(self.route_cache) >= ROUTE_CACHE_SIZE:
+                self.route_cache.clear()
+            self.route_cache[cache_key] = (leaf, path)
+        return leaf, path
+    
+    def find_leaf(self, tokens, create):
+        """按词数和开头的词逐层查找叶节点，create 为 True 时创建不存在的节点"""
+        path = [len(tokens)]
+        node = self.root.get(len(tokens))
+        if node is None:
+            if not create:
+                return None, path
+            node = self.root[len(tokens)] = {}
+        
+        prefix = tokens[:self.depth - 2]
+        for level, token in enumerate(prefix):
+            key = WILDCARD if has_digit(token) else token
+            if key not in node:
+                if WILDCARD in node and (not create or len(node) >= self.max_children):
+                    key = WILDCARD
+                elif not create:
+                    return None, path
+                elif len(node) >= self.max_children - 1:
+                    key = WILDCARD
+            path.append(key)
+            child = node.get(key)
+            if child is None:
+                child = node[key] = [] if level == len(prefix) - 1 else {}
+            node = child
+        return node, path
+    
+    def add(self, line):
+        """第一遍：将一行归入已有的类或新建一类"""
+        tokens = line.split(' ')
+        leaf, path = self.route(tokens, create=True)
+        
+        best = None
+        best_same = -1
+        for index in leaf:
+            same = sum(map(eq, self.clusters[index].tokens, tokens))
+            if same > best_same:
+                best, best_same = index, same
+        
+        if best is None or best_same < self.similarity * len(tokens):
+            leaf.append(len(self.clusters))
+            self.clusters.append(LogCluster(tokens, path))
+            return
+        
+        cluster = self.clusters[best]
+        if best_same < len(tokens):
+            merged = [expected if expected == token else None for expected, token in zip(cluster.tokens, tokens)]
+            if merged != cluster.tokens:
+                cluster.tokens = merged
+                cluster.template_id = None
+                cluster.update_positions()
+    
+    def finalize(self):
+        """为新增或泛化的类分配模板编号"""
+        for index, cluster in enumerate(self.clusters):
+            if cluster.template_id is None:
+                cluster.template_id = len(self.templates)
+                self.templates[cluster.template_id] = {'cluster': index, 'tokens': cluster.tokens, 'count': 0}
+    
+    def encode(self, line):
+        """第二遍：返回 (模板编号, 参数)，参数为通配符位置的词以空格拼接；没有匹配的模板时返回 None"""
+        tokens = line.split(' ')
+        leaf, _ = self.route(tokens, create=False)
+        if leaf is None:
+            return None
+        
+        best = None
+        for index in leaf:
+            cluster = self.clusters[index]
+            # 通配符（None）与任何词都不相等，相等的词数等于常量个数即常量全部匹配
+            if best is not None and cluster.constants <= best.constants:
+                continue
+            if sum(map(eq, cluster.tokens, tokens)) == cluster.constants:
+                best = cluster
+        if best is None:
+            return None
+        
+        self.templates[best.template_id]['count'] += 1
+        return best.template_id, ' '.join([tokens[position] for position in best.wildcards])
+    
+    def add_batch(self, batch):
+        """第一遍：按顺序聚类 RecordBatch 中未知格式行的原文"""
+        raw_lines = batch.columns.get('raw_line')
+        if raw_lines is not None:
+            for line in raw_lines:
+                if line is not None:
+                    self.add(line)
+    
+    def encode_batch(self, batch):
+        """将 RecordBatch 的 raw_line 列替换为 template_id 和 params 列"""
+        raw_lines = batch.columns.get('raw_line')
+        if raw_lines is None:
+            return batch
+        
+        template_ids = []
+        params = []
+        for line in raw_lines:
+            if line is None:
+                template_ids.append(None)
+                params.append(None)
+                continue
+            encoded = self.encode(line)
+            if encoded is None:
+                # 第一遍没有见过的行（正常不会出现）：新建模板后再编码
+                self.add(line)
+                self.finalize()
+                encoded = self.encode(line)
+            template_ids.append(encoded[0])
+            params.append(encoded[1])
+        
+        columns = {}
+        for name, column in batch.columns.items():
+            if name == 'raw_line':
+                columns['template_id'] = compact_column('template_id', template_ids)
+                columns['params'] = compact_column('params', params)
+            else:
+                columns[name] = column
+        batch.columns = columns
+        return batch
+    
+    @staticmethod
+    def encoded_fieldnames(fieldnames):
+        """编码后的列名：raw_line 替换为 template_id 和 params"""
+        columns = []
+        for name in fieldnames:
+            columns.extend(['template_id', 'params'] if name == 'raw_line' else [name])
+        return columns
+    
+    def template_text(self, template_id):
+        return ' '.join(WILDCARD if token is None else token for token in self.templates[template_id]['tokens'])
+    
+    def decode(self, template_id, params):
+        """还原原始行"""
+        tokens = self.templates[template_id]['tokens']
+        values = iter(params.split(' ') if None in tokens else ())
+        return ' '.join(next(values) if token is None else token for token in tokens)
+    
+    def decode_series(self, template_ids, params):
+        """按模板分组向量化还原原始行（pandas Series），template_id 为空的行为缺失值"""
+        import pandas as pd  # 只有日志处理阶段需要
+        
+        decoded = pd.Series(pd.NA, index=template_ids.index, dtype='string')
+        params = params.astype('string').fillna('')
+        for template_id, rows in template_ids.groupby(template_ids).indices.items():
+            tokens = self.templates[int(template_id)]['tokens']
+            wildcards = tokens.count(None)
+            if not wildcards:
+                decoded.iloc[rows] = ' '.join(tokens)
+                continue
+            
+            # 参数不含空格，按空格依次对应各通配符，用一次正则替换填回模板
+            pattern = '^' + ' '.join(['([^ ]*)'] * wildcards) + '$'
+            groups = iter(range(1, wildcards + 1))
+            replacement = ' '.join(f'\\{next(groups)}' if token is None else token.replace('\\', '\\\\')
+                                   for token in tokens)
+            decoded.iloc[rows] = params.iloc[rows].str.replace(pattern, replacement, regex=True)
+        return decoded
+    
+    def result(self, top_n=10):
+        """模板统计：各类的行数（类的各版本模板合计），按行数降序"""
+        cluster_counts = {}
+        for template in self.templates.values():
+            cluster = template['cluster']
+            cluster_counts[cluster] = cluster_counts.get(cluster, 0) + template['count']
+        ranked = sorted(cluster_counts.items(), key=lambda item: (-item[1], item[0]))
+        return {
+            'total_templates': len(ranked),
+            'top_templates': [
+                {'template_id': self.clusters[cluster].template_id,
+                 'template': self.template_text(self.clusters[cluster].template_id),
+                 'count': count}
+                for cluster, count in ranked[:top_n]
+            ]
+        }
+    
+    def save(self, path):
+        data = {
+            'config': {'depth': self.depth, 'similarity': self.similarity, 'max_children': self.max_children},
+            'clusters': [{'template_id': cluster.template_id, 'path': cluster.path} for cluster in self.clusters],
+            'templates': [
+                {'template_id': template_id, 'cluster': template['cluster'],
+                 'template': self.template_text(template_id), 'tokens': template['tokens'], 'count': template['count']}
+                for template_id, template in self.templates.items()
+            ]
+        }
+        temp_path = Path(path).with_name(Path(path).name + '.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        temp_path.replace(path)
+    
+    @classmethod
+    def load(cls, path):
+        """读取已保存的模板，增量分析时继续在已有模板上聚类"""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        
+        miner = cls(**data['config'])
+        for template in data['templates']:
+            miner.templates[template['template_id']] = {
+                'cluster': template['cluster'], 'tokens': template['tokens'], 'count': template['count']}
+        for index, cluster in enumerate(data['clusters']):
+            path = cluster['path']
+            tokens = miner.templates[cluster['template_id']]['tokens']
+            miner.clusters.append(LogCluster(tokens, path, cluster['template_id']))
+            
+            # 按保存的路径放回解析树
+            node = miner.root.setdefault(path[0], {})
+            for level, key in enumerate(path[1:], 2):
+                node = node.setdefault(key, [] if level == len(path) else {})
+            node.append(index)
+        return miner
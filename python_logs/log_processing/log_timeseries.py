@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+按分钟的时间序列异常检测
+按分钟统计记录数、错误率和各 IP 的请求数，每个序列用 EWMA 维护均值和方差基线（每个键 O(1) 状态），
+新的一分钟相对基线的 z-score 超过阈值时报告异常。状态保存在 JSON 文件中，下一批数据或跟踪模式的新记录
+直接在其上更新，不需要重新计算历史：
+  - 没有记录的分钟按 0 条计入记录数和各 IP 的基线（闭式衰减，与间隔长短无关）
+  - 新出现的 IP 以全部 IP 的每分钟请求数基线为初始值
+  - 最新的一分钟可能还没有结束，先保留在状态中，出现更晚的分钟时再计入基线，
+    因此分多批处理与一次处理的结果相同；早于已计入基线的分钟的记录视为迟到数据，不再计入
+"""
+
+import os
+import json
+import math
+import logging
+from pathlib import Path
+
+import numpy as np
+
+# 平滑系数：基线约等于最近 1/alpha 分钟的加权平均
+DEFAULT_ALPHA = 0.05
+DEFAULT_Z_THRESHOLD = 4.0
+# 序列累计的分钟数少于此值时只更新基线，不报告异常
+DEFAULT_WARMUP_MINUTES = 30
+# 一分钟内带状态码的记录少于此数时不判断错误率
+MIN_ERROR_RATE_REQUESTS = 20
+# 一分钟内请求数少于此数的 IP 不报告
+DEFAULT_IP_MIN_REQUESTS = 60
+# 保存的 IP 基线数上限，超过时保留基线均值最大的
+DEFAULT_MAX_IPS = 100000
+# 基线均值衰减到此值以下（长时间没有请求）的 IP 不再保存
+IP_PRUNE_MEAN = 0.01
+TIMESERIES_STATE_FILE = 'timeseries_state.json'
+TIMESERIES_TYPES = ('request_rate_spike', 'error_rate_spike', 'ip_rate_spike')
+TIME_COLUMN = 'normalized_timestamp'
+
+def ewma_update(mean, var, count, x, alpha):
+    """加入一个观测值后的 EWMA 均值、方差和观测数（第一个观测值直接作为均值），标量和数组均可"""
+    diff = x - mean
+    increment = alpha * diff
+    new_mean = np.where(count > 0, mean + increment, x)
+    new_var = np.where(count > 0, (1 - alpha) * (var + diff * increment), 0.0)
+    return new_mean, new_var, count + 1
+
+def decay_zeros(mean, var, gap, alpha):
+    """连续 gap 个 0 观测值后的 EWMA 均值和方差（闭式，等价于逐个加入）"""
+    keep = (1 - alpha) ** gap
+    return mean * keep, keep * (var + mean * mean * (1 - keep))
+
+def minute_of(timestamp):
+    """datetime / 时间戳所在的分钟编号（不含时区的时间按原样换算）"""
+    return int(np.datetime64(timestamp, 'm').astype(np.int64))
+
+def minute_label(minute):
+    return str(np.datetime64(int(minute), 'm')).replace('T', ' ')
+
+class MinuteCounts:
+    """按分钟的计数：各分钟的记录数、带状态码的记录数和错误数，以及各分钟各 IP 的请求数，可按块合并"""
+    
+    # 未合并的部分达到此数时合并一次
+    COMPACT_PARTS = 8
+    
+    def __init__(self):
+        self.parts = []
+    
+    @classmethod
+    def from_frame(cls, df, time_column=TIME_COLUMN):
+        """统计 DataFrame 中各分钟的记录，时间无法解析的记录不计入"""
+        import pandas as pd  # 只有日志处理阶段需要
+        
+        counts = cls()
+        if time_column not in df.columns:
+            return counts
+        times = pd.to_datetime(df[time_column], errors='coerce')
+        valid = times.notna().to_numpy()
+        minutes = times[valid].to_numpy().astype('datetime64[m]').astype(np.int64)
+        
+        columns = {'records': np.ones(len(minutes), dtype=np.int64)}
+        if 'status' in df.columns:
+            status = df['status'][valid]
+            columns['observed'] = status.notna().to_numpy(dtype=np.int64)
+            columns['errors'] = status.astype(str).str.startswith(('4', '5')).to_numpy(dtype=np.int64)
+        totals = pd.DataFrame(columns, index=minutes).groupby(level=0).sum()
+        
+        ip_counts = pd.Series(dtype=np.int64)
+        if 'ip' in df.columns:
+            ip_counts = pd.DataFrame({'minute': minutes, 'ip': df['ip'][valid].to_numpy()}).value_counts()
+        counts.parts.append((totals, ip_counts))
+        return counts
+    
+    def merge(self, other):
+        self.parts.extend(other.parts)
+        if len(self.parts) >= self.COMPACT_PARTS:
+            self.compact()
+        return self
+    
+    def compact(self):
+        """合并为一个部分，返回 (各分钟计数, 各分钟各 IP 请求数)，均按分钟排序"""
+        import pandas as pd
+        
+        if not self.parts:
+            return pd.DataFrame(columns=['records']), pd.Series(dtype=np.int64)
+        if len(self.parts) > 1 or not self.parts[0][0].index.is_monotonic_increasing:
+            totals = pd.concat([part[0] for part in self.parts]).fillna(0).astype(np.int64)
+            totals = totals.groupby(level=0).sum()
+            ip_counts = [part[1] for part in self.parts if len(part[1])]
+            ip_counts = (pd.concat(ip_counts).groupby(level=[0, 1]).sum() if ip_counts
+                         else pd.Series(dtype=np.int64))
+            self.parts = [(totals, ip_counts)]
+        return self.parts[0]
+
+class TimeSeriesDetector:
+    """按分钟的 EWMA/z-score 异常检测：记录数、错误率和各 IP 请求数，状态可保存并在下次运行继续更新"""
+    
+    def __init__(self, path=None, alpha=DEFAULT_ALPHA, threshold=DEFAULT_Z_THRESHOLD, warmup=DEFAULT_WARMUP_MINUTES,
+                 ip_min_requests=DEFAULT_IP_MIN_REQUESTS, max_ips=DEFAULT_MAX_IPS):
+        self.path = Path(path) if path is not None else None
+        self.logger = logging.getLogger(__name__)
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.ip_min_requests = ip_min_requests
+        self.max_ips = max_ips
+        
+        # 各序列的 [均值, 方差, 分钟数]；ip_population 为全部 IP 的每分钟请求数
+        self.series = {'requests': [0.0, 0.0, 0], 'error_rate': [0.0, 0.0, 0], 'ip_population': [0.0, 0.0, 0]}
+        # 已计入基线的最后一分钟
+        self.last_minute = None
+        # 还没有计入基线的最新一分钟
+        self.pending = None
+        self.ips = []
+        self.ip_lookup = {}
+        self.ip_mean = np.zeros(0)
+        self.ip_var = np.zeros(0)
+        self.ip_count = np.zeros(0, dtype=np.int64)
+        self.ip_last = np.zeros(0, dtype=np.int64)
+        self.load()
+    
+    def load(self):
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            series = {name: [float(values[0]), float(values[1]), int(values[2])]
+                      for name, values in state['series'].items()}
+            ips = state['ips']
+        except Exception as e:
+            self.logger.error(f"加载时间序列基线失败 {self.path}: {e}，将重新建立")
+            return
+        
+        self.series.update(series)
+        self.last_minute = state.get('last_minute')
+        self.ips = list(ips)
+        self.ip_lookup = {ip: index for index, ip in enumerate(self.ips)}
+        values = np.array(list(ips.values()), dtype=float).reshape(-1, 4)
+        self.ip_mean, self.ip_var = values[:, 0].copy(), values[:, 1].copy()
+        self.ip_count, self.ip_last = values[:, 2].astype(np.int64), values[:, 3].astype(np.int64)
+        
+        pending = state.get('pending')
+        if pending:
+            self.pending = dict(pending, ip_index=self.ip_indices(list(pending['ips'])),
+                                ip_counts=np.array(list(pending['ips'].values()), dtype=np.int64))
+            del self.pending['ips']
+    
+    def ip_indices(self, ips):
+        """各 IP 的基线下标，新的 IP 分配下标（观测数为 0，第一次计入时以全部 IP 的基线为初始值）"""
+        indices = np.empty(len(ips), dtype=np.int64)
+        start = len(self.ips)
+        for position, ip in enumerate(ips):
+            index = self.ip_lookup.get(ip)
+            if index is None:
+                index = self.ip_lookup[ip] = len(self.ips)
+                self.ips.append(ip)
+            indices[position] = index
+        added = len(self.ips) - start
+        if added:
+            self.ip_mean = np.append(self.ip_mean, np.zeros(added))
+            self.ip_var = np.append(self.ip_var, np.zeros(added))
+            self.ip_count = np.append(self.ip_count, np.zeros(added, dtype=np.int64))
+            self.ip_last = np.append(self.ip_last, np.zeros(added, dtype=np.int64))
+        return indices
+    
+    def update(self, counts):
+        """按时间顺序计入一批按分钟的计数（MinuteCounts），返回已结束的分钟中检测到的异常"""
+        totals, ip_counts = counts.compact()
+        if not len(totals):
+            return []
+        
+        # 各分钟的 IP 请求数：IP 只换算一次下标，再按分钟切分
+        ip_minutes = np.zeros(0, dtype=np.int64)
+        ip_index = ip_counts_array = np.zeros(0, dtype=np.int64)
+        if len(ip_counts):
+            ip_counts = ip_counts.sort_index()  # IP 的顺序也固定，分块与整体处理的浮点结果相同
+            ip_minutes = ip_counts.index.get_level_values(0).to_numpy(dtype=np.int64)
+            levels = ip_counts.index.levels[1]
+            ip_index = self.ip_indices(list(levels))[ip_counts.index.codes[1]]
+            ip_counts_array = ip_counts.to_numpy(dtype=np.int64)
+        
+        anomalies = []
+        late = 0
+        columns = {column: totals[column].to_numpy(dtype=np.int64) if column in totals.columns
+                   else np.zeros(len(totals), dtype=np.int64) for column in ['records', 'observed', 'errors']}
+        bounds = np.searchsorted(ip_minutes, totals.index.to_numpy(dtype=np.int64))
+        bounds = np.append(bounds, len(ip_minutes))
+        for position, minute in enumerate(totals.index.to_numpy(dtype=np.int64)):
+            minute = int(minute)
+            rows = slice(bounds[position], bounds[position + 1])
+            found, dropped = self.push({'minute': minute, 'records': int(columns['records'][position]),
+                                        'observed': int(columns['observed'][position]),
+                                        'errors': int(columns['errors'][position]),
+                                        'ip_index': ip_index[rows], 'ip_counts': ip_counts_array[rows]})
+            anomalies += found
+            late += dropped
+        
+        if late:
+            self.logger.warning(f"{late} 条记录早于已计入基线的时间 {minute_label(self.last_minute)}，不计入时间序列基线")
+        return anomalies
+    
+    def add(self, minute, records, observed, errors, ip_counts):
+        """计入一段时间内同一分钟的计数（跟踪模式按到达时间统计），ip_counts 为 {IP: 请求数}，返回已结束的分钟中检测到的异常"""
+        anomalies, late = self.push({'minute': minute, 'records': records, 'observed': observed, 'errors': errors,
+                                     'ip_index': self.ip_indices(list(ip_counts)),
+                                     'ip_counts': np.array(list(ip_counts.values()), dtype=np.int64)})
+        if late:
+            self.logger.warning(f"{late} 条记录早于已计入基线的时间 {minute_label(self.last_minute)}，不计入时间序列基线")
+        return anomalies
+    
+    def push(self, entry):
+        """计入一分钟的计数，返回 (已结束的分钟中检测到的异常, 迟到而不计入的记录数)"""
+        minute = entry['minute']
+        if self.last_minute is not None and minute <= self.last_minute:
+            return [], entry['records']
+        if self.pending is None or self.pending['minute'] < minute:
+            anomalies = self.observe(**self.pending) if self.pending is not None else []
+            self.pending = entry
+            return anomalies, 0
+        if self.pending['minute'] == minute:
+            self.pending = self.merge_entries(self.pending, entry)
+            return [], 0
+        # 早于未结束的分钟（上次运行保留的分钟晚于本批数据的开头）：这一分钟已经结束，直接计入
+        return self.observe(**entry), 0
+    
+    def advance(self, minute):
+        """时间已到 minute：早于它的未结束分钟计入基线（跟踪模式没有新记录时调用），返回检测到的异常"""
+        if self.pending is not None and self.pending['minute'] < minute:
+            pending, self.pending = self.pending, None
+            return self.observe(**pending)
+        return []
+    
+    @staticmethod
+    def merge_entries(first, second):
+        """合并同一分钟的两部分计数"""
+        ip_index = np.concatenate([first['ip_index'], second['ip_index']])
+        ip_counts = np.concatenate([first['ip_counts'], second['ip_counts']])
+        unique, inverse = np.unique(ip_index, return_inverse=True)
+        return {'minute': first['minute'], 'records': first['records'] + second['records'],
+                'observed': first['observed'] + second['observed'], 'errors': first['errors'] + second['errors'],
+                'ip_index': unique, 'ip_counts': np.bincount(inverse, weights=ip_counts).astype(np.int64)}
+    
+    def score(self, x, mean, var, count, floor):
+        """相对基线的 z-score 和计入基线的值，标准差不小于 floor（计数按泊松分布、比例按二项分布的下限）
+        
+        超过阈值的值截断到阈值处再计入基线，避免一次突增抬高基线而漏掉持续几分钟的异常；基线未就绪时 z-score 为 None
+        """
+        if count < self.warmup:
+            return None, x
+        std = max(math.sqrt(var), floor, 1e-9)
+        return (x - mean) / std, min(x, mean + self.threshold * std)
+    
+    def series_state(self, mean, var, count, x):
+        mean, var, count = ewma_update(mean, var, count, x, self.alpha)
+        return [float(mean), float(var), int(count)]
+    
+    def observe(self, minute, records, observed, errors, ip_index, ip_counts):
+        """一分钟结束：先与基线比较，再计入基线"""
+        anomalies = []
+        label = minute_label(minute)
+        
+        # 记录数：上一分钟之后没有记录的分钟按 0 计入
+        mean, var, count = self.series['requests']
+        if self.last_minute is not None and count and minute - self.last_minute > 1:
+            gap = minute - self.last_minute - 1
+            mean, var = decay_zeros(mean, var, gap, self.alpha)
+            count += gap
+        z, value = self.score(records, mean, var, count, math.sqrt(max(mean, 1)))
+        if z is not None and z >= self.threshold:
+            anomalies.append({
+                'type': 'request_rate_spike',
+                'minute': label,
+                'value': records,
+                'baseline': round(float(mean), 2),
+                'zscore': round(float(z), 2),
+                'threshold': self.threshold,
+                'description': f'{label} 每分钟记录数突增: {records}（基线 {mean:.1f}，z={z:.1f}）'
+            })
+        self.series['requests'] = self.series_state(mean, var, count, value)
+        
+        # 错误率：只按带状态码的记录计算，没有这类记录的分钟不计入
+        if observed:
+            rate = value = errors / observed * 100
+            mean, var, count = self.series['error_rate']
+            if observed >= MIN_ERROR_RATE_REQUESTS:
+                # 二项分布的标准差再加上一次错误的比例：请求较少时正态近似低估尾部，一两个错误就会超过阈值
+                p = min(max(mean / 100, 1 / observed), 1 - 1 / observed)
+                z, value = self.score(rate, mean, var, count, 100 * (math.sqrt(p * (1 - p) / observed) + 1 / observed))
+                if z is not None and z >= self.threshold:
+                    anomalies.append({
+                        'type': 'error_rate_spike',
+                        'minute': label,
+                        'value': round(rate, 2),
+                        'baseline': round(float(mean), 2),
+                        'zscore': round(float(z), 2),
+                        'threshold': self.threshold,
+                        'description': f'{label} 错误率突增: {rate:.2f}%（基线 {mean:.2f}%，z={z:.1f}）'
+                    })
+            self.series['error_rate'] = self.series_state(mean, var, count, value)
+        
+        if len(ip_index):
+            anomalies += self.observe_ips(minute, label, ip_index, ip_counts.astype(float))
+        self.last_minute = minute
+        return anomalies
+    
+    def observe_ips(self, minute, label, index, x):
+        """各 IP 的请求数与自身基线比较（标准差不小于全部 IP 的离散程度），截断后计入各自和全部 IP 的基线"""
+        population_mean, population_var, population_count = self.series['ip_population']
+        new = index[self.ip_count[index] == 0]
+        self.ip_mean[new] = population_mean
+        self.ip_var[new] = population_var
+        self.ip_count[new] = population_count
+        self.ip_last[new] = minute - 1
+        
+        gap = minute - self.ip_last[index] - 1
+        mean, var = decay_zeros(self.ip_mean[index], self.ip_var[index], gap, self.alpha)
+        count = self.ip_count[index] + gap
+        std = np.maximum(np.maximum(np.sqrt(var), np.sqrt(np.maximum(mean, 1))), math.sqrt(population_var))
+        z = (x - mean) / std
+        warm = count >= self.warmup
+        
+        anomalies = []
+        for position in np.flatnonzero(warm & (z >= self.threshold) & (x >= self.ip_min_requests)):
+            ip = self.ips[index[position]]
+            value, baseline, score = int(x[position]), float(mean[position]), float(z[position])
+            anomalies.append({
+                'type': 'ip_rate_spike',
+                'minute': label,
+                'ip': ip,
+                'value': value,
+                'baseline': round(baseline, 2),
+                'zscore': round(score, 2),
+                'threshold': self.threshold,
+                'description': f'{label} IP {ip} 每分钟请求数突增: {value}（基线 {baseline:.1f}，z={score:.1f}）'
+            })
+        
+        x = np.where(warm, np.minimum(x, mean + self.threshold * std), x)
+        self.ip_mean[index], self.ip_var[index], self.ip_count[index] = ewma_update(mean, var, count, x, self.alpha)
+        self.ip_last[index] = minute
+        
+        # 全部 IP 的基线：本分钟各 IP 请求数的均值计入均值，各 IP 之间的方差计入方差
+        batch_mean, batch_var = float(x.mean()), float(x.var())
+        if population_count:
+            diff = batch_mean - population_mean
+            population_mean += self.alpha * diff
+            population_var = (1 - self.alpha) * (population_var + self.alpha * diff * diff) + self.alpha * batch_var
+        else:
+            population_mean, population_var = batch_mean, batch_var
+        self.series['ip_population'] = [population_mean, population_var, population_count + 1]
+        return anomalies
+    
+    def prune(self):
+        """丢弃长时间没有请求的 IP 基线，超过上限时保留基线均值最大的（未结束分钟中出现的 IP 始终保留）"""
+        if not self.ips or self.last_minute is None:
+            return
+        idle = np.maximum(self.last_minute - self.ip_last, 0)
+        decayed = self.ip_mean * (1 - self.alpha) ** idle
+        keep = (decayed >= IP_PRUNE_MEAN) & (self.ip_count > 0)
+        if keep.sum() > self.max_ips:
+            keep[np.argsort(-np.where(keep, decayed, -1), kind='stable')[self.max_ips:]] = False
+        if self.pending is not None:
+            keep[self.pending['ip_index']] = True
+        if keep.all():
+            return
+        
+        remap = np.cumsum(keep) - 1
+        self.ips = [ip for ip, kept in zip(self.ips, keep) if kept]
+        self.ip_lookup = {ip: index for index, ip in enumerate(self.ips)}
+        self.ip_mean, self.ip_var = self.ip_mean[keep], self.ip_var[keep]
+        self.ip_count, self.ip_last = self.ip_count[keep], self.ip_last[keep]
+        if self.pending is not None:
+            self.pending['ip_index'] = remap[self.pending['ip_index']]
+    
+    def state(self):
+        pending = None
+        if self.pending is not None:
+            pending = {key: value for key, value in self.pending.items() if key not in ('ip_index', 'ip_counts')}
+            pending['ips'] = {self.ips[index]: int(count)
+                              for index, count in zip(self.pending['ip_index'], self.pending['ip_counts'])}
+        return {
+            'last_minute': self.last_minute,
+            'series': self.series,
+            'ips': {ip: [float(self.ip_mean[index]), float(self.ip_var[index]), int(self.ip_count[index]),
+                         int(self.ip_last[index])] for index, ip in enumerate(self.ips)},
+            'pending': pending,
+        }
+    
+    def save(self):
+        """保存基线状态（先写临时文件再替换，避免中断时损坏）"""
+        self.prune()
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state(), f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+安全事件扫描器
+一次扫描找出日志内容命中的全部安全规则：纯文本规则在 ASCII 行上直接做小写子串查找，
+正则规则（以及非 ASCII 行）先用合并成的一个正则预筛，只有命中的行才逐条确认具体规则。
+ColumnScanner 对 pandas 的整列做同样的事：合并正则扫描一次整列，只在命中的行上逐条确认
+"""
+
+import re
+import heapq
+import hashlib
+
+# 出现这些字符的规则按正则处理
+REGEX_METACHARACTERS = set('.^$*+?{}[]\\|()')
+
+def is_literal_pattern(pattern):
+    """规则是否为不含正则元字符的 ASCII 纯文本"""
+    return pattern.isascii() and not REGEX_METACHARACTERS.intersection(pattern)
+
+class SecurityScanner:
+    def __init__(self, patterns):
+        """预编译安全规则，匹配语义与 re.search(pattern, content, re.IGNORECASE) 相同"""
+        self.patterns = list(patterns)
+        self.compiled = {pattern: re.compile(pattern, re.IGNORECASE) for pattern in self.patterns}
+        
+        # ASCII 文本上 IGNORECASE 的纯文本匹配等价于小写后的子串查找
+        self.literals = [(pattern, pattern.lower()) for pattern in self.patterns if is_literal_pattern(pattern)]
+        self.regex_patterns = [pattern for pattern in self.patterns if not is_literal_pattern(pattern)]
+        self.combined_regex = self.combine(self.regex_patterns)
+        # 非 ASCII 文本所有规则都走正则
+        self.combined_all = self.combine(self.patterns)
+    
+    @staticmethod
+    def combine(patterns):
+        """把多条规则合并为一个正则；没有规则或含分组引用等无法合并的规则时返回 None"""
+        if not patterns:
+            return None
+        try:
+            return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns), re.IGNORECASE)
+        except re.error:
+            return None
+    
+    def search(self, patterns, combined, content):
+        """先用合并正则预筛，命中后再逐条确认"""
+        start = 0
+        if combined is not None:
+            match = combined.search(content)
+            if match is None:
+                return []
+            # 其他规则的匹配位置不会早于合并正则找到的最左位置
+            start = match.start()
+        
+        return [pattern for pattern in patterns if self.compiled[pattern].search(content, start)]
+    
+    def scan(self, content):
+        """返回 content 命中的规则列表（按规则顺序）"""
+        if not content.isascii():
+            return self.search(self.patterns, self.combined_all, content)
+        
+        lowered = content.lower()
+        hits = [pattern for pattern, needle in self.literals if needle in lowered]
+        if self.regex_patterns:
+            hits += self.search(self.regex_patterns, self.combined_regex, content)
+            if len(hits) > 1 and self.literals:
+                hits = [pattern for pattern in self.patterns if pattern in hits]
+        return hits
+
+class ColumnScanner:
+    """整列扫描：全部规则合并为一个正则扫描一次整列，只对命中的行逐条确认具体规则
+    
+    匹配语义与逐条 Series.str.contains(pattern, case=False, regex=True) 相同，空值不命中
+    """
+    
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        # 合并失败（如含分组引用）时每条规则各扫描一次整列
+        self.combined = None
+        if SecurityScanner.combine(self.patterns) is not None:
+            self.combined = '|'.join(f'(?:{pattern})' for pattern in self.patterns)
+    
+    @staticmethod
+    def contains(values, pattern):
+        return values.str.contains(pattern, case=False, na=False, regex=True).to_numpy(dtype=bool)
+    
+    def match_any(self, values):
+        """每行是否命中任一规则（布尔数组）"""
+        import numpy as np  # 只有日志处理阶段需要
+        
+        if self.combined is not None:
+            return self.contains(values, self.combined)
+        matched = np.zeros(len(values), dtype=bool)
+        for pattern in self.patterns:
+            matched |= self.contains(values, pattern)
+        return matched
+    
+    def count(self, values):
+        """返回 {规则: 命中的行数}（按规则顺序），只在命中任一规则的行上逐条确认"""
+        if self.combined is None:
+            return {pattern: int(self.contains(values, pattern).sum()) for pattern in self.patterns}
+        hits = values[self.match_any(values)]
+        return {pattern: int(self.contains(hits, pattern).sum()) if len(hits) else 0 for pattern in self.patterns}
+
+def event_priority(file_name, line_number, event_type, content):
+    """事件的抽样优先级：由事件内容决定的 64 位哈希，与处理顺序和分片方式无关"""
+    key = f"{file_name}\0{line_number}\0{event_type}\0{content}".encode('utf-8', 'replace')
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'big')
+
+class EventReservoir:
+    """固定大小的事件蓄水池：保留优先级最小的 size 条，可按任意顺序合并且结果确定"""
+    
+    def __init__(self, size):
+        self.size = size
+        # 大顶堆（优先级取负），堆顶是当前保留事件中优先级最大的一条
+        self.heap = []
+    
+    def add(self, file_name, line_number, event_type, content):
+        priority = event_priority(file_name, line_number, event_type, content)
+        self.push((-priority, str(file_name), line_number, event_type, content))
+    
+    def push(self, entry):
+        if len(self.heap) < self.size:
+            heapq.heappush(self.heap, entry)
+        elif self.heap and entry > self.heap[0]:
+            heapq.heapreplace(self.heap, entry)
+    
+    def merge(self, other):
+        for entry in other.heap:
+            self.push(entry)
+    
+    def events(self, pattern_order=None):
+        """按文件名、行号和规则顺序返回抽样事件"""
+        order = {pattern: index for index, pattern in enumerate(pattern_order or [])}
+        entries = sorted(self.heap, key=lambda entry: (entry[1], entry[2], order.get(entry[3], len(order)), entry[3]))
+        return [{'type': event_type, 'content': content, 'file': file_name, 'line': line_number}
+                for _, file_name, line_number, event_type, content in entries]
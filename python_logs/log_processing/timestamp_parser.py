@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+时间戳解析器
+日志分析和日志处理共用：按时间戳的形状（数字替换为 0）记住匹配的格式，都不匹配的形状不再逐个尝试，
+按原始字符串缓存解析结果（LRU）；访问日志的 %d/%b/%Y:%H:%M:%S、syslog 的 %b %d %H:%M:%S、
+ISO 8601 的 %Y-%m-%dT%H:%M:%S 和 %Y-%m-%d %H:%M:%S 使用手写解析，不调用 strptime。
+与日志处理的整列解析一致，含空白的格式按整个字符串解析，其余格式只解析第一个空白之前的部分
+"""
+
+from datetime import datetime
+from functools import lru_cache
+
+# 访问日志时间格式，如 10/Oct/2024:13:55:36
+ACCESS_TIME_FORMAT = '%d/%b/%Y:%H:%M:%S'
+# syslog 时间格式（没有年份，与 strptime 一样按 1900 年），如 Oct 10 13:55:36
+SYSLOG_TIME_FORMAT = '%b %d %H:%M:%S'
+# ISO 8601 时间格式（JSON 日志常用），如 2024-10-10T13:55:36.123+08:00
+ISO_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+# 标准化后的时间格式
+STANDARD_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+# 日志处理（及分区）使用的常见时间格式
+TIMESTAMP_FORMATS = [
+    '%d/%b/%Y:%H:%M:%S',
+    '%Y-%m-%d %H:%M:%S',
+    SYSLOG_TIME_FORMAT,
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M:%S.%f'
+]
+# 每个解析器缓存的不同时间戳字符串数量：日志大致按时间顺序，重复的时间戳集中出现，小缓存即可命中；
+# 逐条解析已有手写快速路径，缓存过大时每个不重复的时间戳都常驻内存（65536 条约 18 MB）
+DEFAULT_CACHE_SIZE = 4096
+# 每个解析器记住的不同形状数量，超过后新的形状每次都逐个尝试
+SHAPE_CACHE_SIZE = 1024
+# 同一形状连续几次都不匹配任何格式后不再尝试（日期越界等也会失败，只失败一次不能说明形状不对）
+SHAPE_FAILURES = 3
+DIGIT_SHAPE = str.maketrans('123456789', '000000000')
+
+MONTH_NUMBERS = {name: number for number, name in enumerate(
+    ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], 1)}
+
+def parse_access_time(text):
+    """手写解析标准写法的 %d/%b/%Y:%H:%M:%S，非标准写法返回 None 交给 strptime
+    
+    日期时间越界时与 strptime 一样抛出 ValueError。
+    """
+    if (len(text) != 20 or text[2] != '/' or text[6] != '/' or text[11] != ':'
+            or text[14] != ':' or text[17] != ':'):
+        return None
+    
+    month = MONTH_NUMBERS.get(text[3:6])
+    digits = text[:2] + text[7:11] + text[12:14] + text[15:17] + text[18:]
+    if month is None or not (digits.isascii() and digits.isdigit()):
+        return None
+    
+    return datetime(int(text[7:11]), month, int(text[:2]), int(text[12:14]), int(text[15:17]), int(text[18:]))
+
+def parse_syslog_time(text):
+    """手写解析标准写法的 %b %d %H:%M:%S（日期不足两位时前面补空格），非标准写法返回 None 交给 strptime"""
+    if len(text) != 15 or text[3] != ' ' or text[6] != ' ' or text[9] != ':' or text[12] != ':':
+        return None
+    
+    month = MONTH_NUMBERS.get(text[:3])
+    day = text[4:6].lstrip()
+    digits = day + text[7:9] + text[10:12] + text[13:]
+    if month is None or not (digits.isascii() and digits.isdigit()):
+        return None
+    
+    return datetime(1900, month, int(day), int(text[7:9]), int(text[10:12]), int(text[13:]))
+
+def parse_iso_time(text):
+    """手写解析 %Y-%m-%dT%H:%M:%S，忽略其后的小数秒和时区（与其他格式一样按日志中的时间统计）
+    
+    不符合时返回 None 交给 strptime，日期时间越界时抛出 ValueError。
+    """
+    if (len(text) < 19 or text[4] != '-' or text[7] != '-' or text[10] != 'T'
+            or text[13] != ':' or text[16] != ':' or (len(text) > 19 and text[19] not in '.,Z+-')):
+        return None
+    
+    digits = text[:4] + text[5:7] + text[8:10] + text[11:13] + text[14:16] + text[17:19]
+    if not (digits.isascii() and digits.isdigit()):
+        return None
+    
+    return datetime.fromisoformat(text[:19])
+
+def parse_standard_time(text):
+    """手写解析标准写法的 %Y-%m-%d %H:%M:%S（应用日志），非标准写法返回 None 交给 strptime
+    
+    格式已检查，按 ISO 8601 解析（C 实现）；日期时间越界时抛出 ValueError。
+    """
+    if (len(text) != 19 or text[4] != '-' or text[7] != '-' or text[10] != ' '
+            or text[13] != ':' or text[16] != ':'):
+        return None
+    
+    digits = text[:4] + text[5:7] + text[8:10] + text[11:13] + text[14:16] + text[17:19]
+    if not (digits.isascii() and digits.isdigit()):
+        return None
+    
+    return datetime.fromisoformat(text)
+
+def strptime_parser(fmt):
+    """返回按 fmt 解析的函数，失败时抛出 ValueError
+    
+    手写解析不符合时，只有分隔符与格式相同的非标准写法（如单数字日期）才交给 strptime，其余直接视为不匹配
+    """
+    if fmt == ACCESS_TIME_FORMAT:
+        def parse(text):
+            dt = parse_access_time(text)
+            if dt is not None:
+                return dt
+            if text.count('/') != 2 or text.count(':') != 3:
+                raise ValueError(f"不是访问日志时间: {text!r}")
+            return datetime.strptime(text, fmt)
+        return parse
+    if fmt == ISO_TIME_FORMAT:
+        def parse(text):
+            dt = parse_iso_time(text)
+            if dt is not None:
+                return dt
+            if 'T' not in text or text.count('-') < 2:
+                raise ValueError(f"不是 ISO 8601 时间: {text!r}")
+            return datetime.strptime(text, fmt)
+        return parse
+    if fmt == SYSLOG_TIME_FORMAT:
+        def parse(text):
+            dt = parse_syslog_time(text)
+            if dt is not None:
+                return dt
+            if text.count(':') != 2 or text[:1].isdigit():
+                raise ValueError(f"不是 syslog 时间: {text!r}")
+            return datetime.strptime(text, fmt)
+        return parse
+    if fmt == STANDARD_TIME_FORMAT:
+        def parse(text):
+            dt = parse_standard_time(text)
+            if dt is not None:
+                return dt
+            if text.count('-') != 2 or text.count(':') != 2:
+                raise ValueError(f"不是标准时间: {text!r}")
+            return datetime.strptime(text, fmt)
+        return parse
+    
+    def parse(text):
+        return datetime.strptime(text, fmt)
+    return parse
+
+def hour_and_day(dt):
+    """按小时和日期统计时使用的键（%Y 只解析 4 位年份，isoformat 与 strftime('%Y-%m-%d') 相同且更快）"""
+    return dt.hour, dt.date().isoformat()
+
+def standard_format(dt):
+    """标准化后的时间字符串"""
+    return dt.strftime(STANDARD_TIME_FORMAT)
+
+class TimestampParser:
+    def __init__(self, formats, convert=None, cache_size=DEFAULT_CACHE_SIZE):
+        """formats 为候选格式（应互斥），convert 对解析出的 datetime 做转换后再缓存"""
+        self.formats = list(formats)
+        self.convert = convert
+        self.cache_size = cache_size
+        self.setup()
+    
+    def setup(self):
+        """创建各格式的解析函数和 LRU 缓存"""
+        self.parsers = [strptime_parser(fmt) for fmt in self.formats]
+        self.whole = [any(char.isspace() for char in fmt) for fmt in self.formats]
+        # 形状 -> 匹配的格式下标，都不匹配时为负的失败次数
+        self.shapes = {}
+        self.parse = lru_cache(maxsize=self.cache_size)(self.parse_uncached)
+    
+    def __getstate__(self):
+        """缓存和解析函数不可序列化，传给其他进程时重新创建"""
+        return {'formats': self.formats, 'convert': self.convert, 'cache_size': self.cache_size}
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.setup()
+    
+    def parse_uncached(self, text):
+        """同一形状只用记住的格式解析，新的形状逐个尝试；都不匹配时返回 None"""
+        text = text.strip()
+        if not text or not self.parsers:
+            return None
+        
+        shape = text.translate(DIGIT_SHAPE)
+        known = self.shapes.get(shape)
+        if known is not None and known <= -SHAPE_FAILURES:
+            return None
+        matched = known is not None and known >= 0
+        head = text.split(None, 1)[0]
+        for index in ([known] if matched else range(len(self.parsers))):
+            try:
+                dt = self.parsers[index](text if self.whole[index] else head)
+            except ValueError:
+                continue
+            self.remember(shape, index)
+            return self.convert(dt) if self.convert is not None else dt
+        if not matched:
+            self.remember(shape, (known or 0) - 1)
+        return None
+    
+    def remember(self, shape, value):
+        if shape in self.shapes or len(self.shapes) < SHAPE_CACHE_SIZE:
+            self.shapes[shape] = value
+    
+    def cache_info(self):
+        return self.parse.cache_info()
+    
+    def cache_clear(self):
+        self.parse.cache_clear()
@@ -0,0 +1,159 @@
+# 日志分析内存基准
+# 生成访问日志和应用日志，在独立子进程中测量峰值内存（RSS）：
+#   dicts    - 全部解析记录保存为字典列表（流式分析之前的做法）
+#   batch    - 全部解析记录按 SPOOL_BATCH_SIZE 条一批转换为按列、字典编码的 RecordBatch
+#   analyzer - LogAnalyzer.run_analysis() 完整流程（流式统计 + 分批落盘）
+#   approx   - 同上，使用近似统计（精确统计的内存主要是各文件去重 IP/URL 计数）
+#   budget   - 同 analyzer，设置解析记录缓冲区的内存预算（--memory-budget），长行（--padding）时差别明显
+#   jsonl    - 对单个 JSON Lines 文件执行完整流程（JSON 解码 + 字段映射），默认 1000 万行
+# 同时报告每条记录占用的内存和吞吐量（行/秒、MB/秒）
+
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import resource
+import tempfile
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'log_processing'))
+
+from log_analyzer import SPOOL_BATCH_SIZE, LogAnalyzer
+from log_json import HAS_ORJSON
+from log_records import RecordBatch
+
+MODES = ['dicts', 'batch', 'analyzer', 'approx', 'budget']
+# 只在 JSON Lines 文件上运行的模式
+JSONL_MODE = 'jsonl'
+METHODS = ['GET', 'GET', 'GET', 'POST', 'PUT', 'DELETE']
+STATUSES = ['200', '200', '200', '301', '304', '404', '500']
+LEVELS = ['INFO', 'INFO', 'WARNING', 'ERROR', 'DEBUG']
+
+def generate_logs(log_dir, lines, files, rng, padding=0):
+    """生成访问日志和应用日志（约 4:1），IP 和 URL 取值个数有限，接近真实分布；padding 为应用日志附加的字节数"""
+    per_file = lines // files
+    for index in range(files):
+        with open(log_dir / f'app{index}.log', 'w', encoding='utf-8') as f:
+            for line_num in range(per_file):
+                second = line_num % 86400
+                timestamp = f"{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}"
+                if line_num % 5:
+                    ip = f"10.{rng.randint(0, 3)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+                    url = f"/api/v1/item/{rng.randint(1, 2000)}?page={rng.randint(1, 5)}"
+                    f.write(f'{ip} - - [10/Oct/2024:{timestamp} +0800] "{rng.choice(METHODS)} {url} HTTP/1.1" '
+                            f'{rng.choice(STATUSES)} {rng.randint(100, 50000)}\n')
+                else:
+                    f.write(f"2024-10-10 {timestamp} [{rng.choice(LEVELS)}] request {line_num} handled "
+                            f"by worker {rng.randint(1, 32)}{' ' + 'x' * padding if padding else ''}\n")
+    return per_file * files
+
+def generate_jsonl(path, lines, rng):
+    """生成 JSON Lines 日志：访问事件和应用事件（约 4:1）两种字段结构，时间为 ISO 8601"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for line_num in range(lines):
+            second = line_num % 86400
+            timestamp = f"2024-10-10T{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}.{line_num % 1000:03d}Z"
+            if line_num % 5:
+                ip = f"10.{rng.randint(0, 3)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+                f.write(f'{{"@timestamp":"{timestamp}","client_ip":"{ip}","method":"{rng.choice(METHODS)}",'
+                        f'"path":"/api/v1/item/{rng.randint(1, 2000)}","status":{rng.choice(STATUSES)},'
+                        f'"bytes":{rng.randint(100, 50000)},"duration_ms":{rng.randint(1, 900)}}}\n')
+            else:
+                f.write(f'{{"@timestamp":"{timestamp}","level":"{rng.choice(LEVELS)}","logger":"worker",'
+                        f'"message":"request {line_num} handled by worker {rng.randint(1, 32)}"}}\n')
+    return lines
+
+def peak_rss():
+    """当前进程的峰值内存（MB）"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_mode(mode, log_dir, output_dir, memory_budget):
+    """在子进程中执行一种模式，输出 JSON 结果"""
+    logging.disable(logging.CRITICAL)
+    approximate = {'distinct_error': 0.01, 'top_error': 0.001} if mode == 'approx' else None
+    budget = int(memory_budget * 1024 * 1024) if mode == 'budget' else None
+    analyzer = LogAnalyzer(log_dir, output_dir, approximate=approximate, memory_budget=budget)
+    baseline = peak_rss()
+    start = time.perf_counter()
+    
+    if mode in ('analyzer', 'approx', 'budget', JSONL_MODE):
+        count = analyzer.run_analysis()['summary']['total_log_entries']
+    else:
+        records = []
+        batches = []
+        for log_file in sorted(Path(log_dir).glob('*.log')):
+            for record in analyzer.iter_log_file(log_file):
+                records.append(record)
+                if mode == 'batch' and len(records) >= SPOOL_BATCH_SIZE:
+                    batches.append(RecordBatch(records))
+                    records = []
+        if mode == 'batch':
+            batches.append(RecordBatch(records))
+            records = []
+        count = len(records) + sum(len(batch) for batch in batches)
+    
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'mode': mode, 'records': count, 'seconds': elapsed,
+                      'baseline_mb': baseline, 'peak_mb': peak_rss()}))
+
+def measure(mode, log_dir, output_dir, memory_budget):
+    result = subprocess.run([sys.executable, __file__, '--mode', mode, '--log-dir', str(log_dir),
+                             '--output-dir', str(output_dir), '--memory-budget', str(memory_budget)],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description='日志分析内存基准')
+    parser.add_argument('--lines', type=int, default=1000000, help='生成的日志总行数')
+    parser.add_argument('--files', type=int, default=4, help='日志文件数')
+    parser.add_argument('--padding', type=int, default=0, help='应用日志每行附加的字节数（模拟长行）')
+    parser.add_argument('--memory-budget', type=float, default=16, help='budget 模式的内存预算（MB）')
+    parser.add_argument('--jsonl-lines', type=int, default=10000000, help='JSON Lines 吞吐量测试的行数（0 跳过）')
+    parser.add_argument('--mode', choices=MODES + [JSONL_MODE], help=argparse.SUPPRESS)
+    parser.add_argument('--log-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--output-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.mode:
+        run_mode(args.mode, args.log_dir, args.output_dir, args.memory_budget)
+        return
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_dir = Path(tmp_dir) / 'logs'
+        log_dir.mkdir()
+        lines = generate_logs(log_dir, args.lines, args.files, random.Random(42), args.padding)
+        size = sum(path.stat().st_size for path in log_dir.iterdir()) / 1024 / 1024
+        
+        print("📊 日志分析内存基准")
+        print(f"📝 日志行数: {lines}, 文件大小: {size:.1f} MB")
+        print("=" * 70)
+        results = {mode: measure(mode, log_dir, Path(tmp_dir) / mode, args.memory_budget) for mode in MODES}
+        for mode, result in results.items():
+            per_record = (result['peak_mb'] - result['baseline_mb']) * 1024 * 1024 / max(1, result['records'])
+            print(f"{mode:>8}: 峰值内存 {result['peak_mb']:7.1f} MB (导入后 {result['baseline_mb']:.1f} MB), "
+                  f"每条记录 {per_record:6.0f} 字节, {result['records'] / result['seconds']:,.0f} 行/秒")
+        print("=" * 70)
+        
+        dicts = results['dicts']['peak_mb'] - results['dicts']['baseline_mb']
+        for mode in MODES[1:]:
+            growth = results[mode]['peak_mb'] - results[mode]['baseline_mb']
+            print(f"{mode} 相对字典列表: 峰值内存缩减 {results['dicts']['peak_mb'] / results[mode]['peak_mb']:.1f}x, "
+                  f"内存增长缩减 {dicts / max(growth, 1):.1f}x")
+        
+        if args.jsonl_lines > 0:
+            jsonl_dir = Path(tmp_dir) / 'jsonl'
+            jsonl_dir.mkdir()
+            jsonl_lines = generate_jsonl(jsonl_dir / 'service.jsonl', args.jsonl_lines, random.Random(42))
+            jsonl_size = (jsonl_dir / 'service.jsonl').stat().st_size / 1024 / 1024
+            result = measure(JSONL_MODE, jsonl_dir, Path(tmp_dir) / JSONL_MODE, args.memory_budget)
+            print("=" * 70)
+            print(f"📝 JSON Lines 行数: {jsonl_lines}, 文件大小: {jsonl_size:.1f} MB, "
+                  f"JSON 解码: {'orjson' if HAS_ORJSON else 'json'}")
+            print(f"{JSONL_MODE:>8}: 峰值内存 {result['peak_mb']:7.1f} MB, {result['records'] / result['seconds']:,.0f} 行/秒, "
+                  f"{jsonl_size / result['seconds']:.1f} MB/秒")
+
+if __name__ == '__main__':
+    main()
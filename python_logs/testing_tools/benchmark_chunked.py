@@ -0,0 +1,181 @@
+# 日志处理分块模式基准
+# 生成不同行数的 parsed_logs，分别整体处理和分块处理（各在独立子进程中运行），
+# 对比耗时和峰值内存（分块模式的峰值内存应与行数基本无关），并校验 anomalies.json、processing_stats.json 和处理结果一致；
+# 另外用由多个 RecordBatch 组成的 feather 输入、与批次边界不对齐的块大小校验 feather/parquet 输出
+
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import resource
+import tempfile
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'log_processing'))
+
+from log_storage import HANDOFF_FORMATS, HAS_PYARROW, PARSED_LOG_COLUMNS, read_handoff, write_handoff
+
+METHODS = np.array(['GET', 'GET', 'GET', 'POST', 'PUT', 'DELETE'], dtype=object)
+STATUSES = np.array([200, 200, 200, 200, 200, 301, 304, 404, 500, 503])
+PAGES = np.array(['/', '/index.html', '/api/v1/users', '/api/v1/orders', '/static/app.js', '/search',
+                  '/download/../../etc/passwd', '/search?q=<script>alert(1)</script>'], dtype=object)
+AGENTS = np.array(['Mozilla/5.0', 'curl/8.0', 'Googlebot/2.1', 'python-requests/2.31'], dtype=object)
+
+def make_parsed_logs(rows, seed=42, unfiltered=False):
+    """生成解析结果：约 10% 为没有状态码的 syslog 行，约 2% 为重复行，少数 IP 请求次数很多
+    
+    unfiltered 时没有重复行和爬虫请求，清洗不丢弃任何行，未经转换的列保持读取时的分块原样写出
+    """
+    rng = np.random.default_rng(seed)
+    index = np.arange(rows)
+    duplicates = rng.random(rows) < (0 if unfiltered else 0.02)
+    index[duplicates] = rng.choice(index, duplicates.sum())
+    
+    hot = rng.random(rows) < 0.05
+    ip_numbers = np.where(hot, rng.integers(0, 4, rows), rng.integers(0, 1 << 16, rows))
+    ips = pd.Series(ip_numbers).map(lambda n: f'10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}')
+    seconds = 1728518400 + index * 86400 * 7 // max(rows, 1)
+    times = pd.Series(pd.to_datetime(seconds, unit='s')).dt.strftime('%d/%b/%Y:%H:%M:%S +0800')
+    urls = pd.Series(PAGES[index % len(PAGES)]) + '?id=' + pd.Series(index % 5000).astype(str)
+    status = pd.Series(STATUSES[index % len(STATUSES)], dtype='Int64')
+    size = pd.Series(index * 7919 % 50000, dtype='Int64')
+    methods = pd.Series(METHODS[index % len(METHODS)])
+    agents = AGENTS[AGENTS != 'Googlebot/2.1'] if unfiltered else AGENTS
+    messages = pd.Series(agents[index % len(agents)])
+    raw_lines = (ips + ' - - [' + times + '] "' + methods + ' ' + urls + ' HTTP/1.1" ' + status.astype(str) + ' '
+                 + size.astype(str) + ' "' + messages + '"')
+    
+    syslog = rng.random(rows) < 0.1
+    status[syslog] = pd.NA
+    size[syslog] = pd.NA
+    return pd.DataFrame({
+        'ip': ips, 'timestamp': times, 'method': methods, 'url': urls, 'protocol': 'HTTP/1.1',
+        'status': status, 'size': size, 'message': messages,
+        'line_number': np.arange(rows) + 1, 'file_name': 'access.log', 'format': 'apache_access',
+        'raw_line': raw_lines,
+    })
+
+def peak_memory_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_mode(input_dir, output_dir, chunk_rows, handoff_format):
+    """在子进程中执行一次处理，输出 JSON 结果"""
+    from log_processor import LogProcessor
+    
+    logging.disable(logging.CRITICAL)
+    config = {'handoff_format': handoff_format}
+    if chunk_rows:
+        config['chunk_rows'] = chunk_rows
+    start = time.perf_counter()
+    LogProcessor(input_dir, output_dir, config).run_processing()
+    print(json.dumps({'seconds': time.perf_counter() - start, 'peak_mb': peak_memory_mb()}))
+
+def run_child(*args):
+    """在子进程中执行一个步骤，返回其输出的 JSON
+    
+    Linux 上子进程继承父进程的峰值内存（ru_maxrss 在 fork/exec 后保留），生成数据和比较结果也放在子进程中，
+    父进程始终不加载数据
+    """
+    result = subprocess.run([sys.executable, __file__, *map(str, args)], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def load_results(output_dir):
+    with open(output_dir / 'anomalies.json', 'r', encoding='utf-8') as f:
+        anomalies = json.load(f)
+    with open(output_dir / 'processing_stats.json', 'r', encoding='utf-8') as f:
+        stats = json.load(f)
+    stats.pop('processing_timestamp')
+    return anomalies, stats, read_handoff(output_dir, 'processed_logs')
+
+def same_results(whole_dir, chunked_dir):
+    """异常、统计完全相同；处理结果逐行相同（整体处理时有空值的整数列为浮点数，不比较类型）"""
+    whole, chunked = load_results(whole_dir), load_results(chunked_dir)
+    same = whole[:2] == chunked[:2]
+    try:
+        pd.testing.assert_frame_equal(whole[2], chunked[2], check_dtype=False)
+    except AssertionError:
+        same = False
+    print(json.dumps({'same': same}))
+
+def main():
+    parser = argparse.ArgumentParser(description='日志处理分块模式基准')
+    parser.add_argument('--rows', type=int, nargs='+', default=[250000, 500000, 1000000], help='各次测试的行数')
+    parser.add_argument('--chunk-rows', type=int, default=100000, help='分块模式每块的行数')
+    parser.add_argument('--input-format', choices=list(HANDOFF_FORMATS), default='csv', help='parsed_logs 的格式')
+    parser.add_argument('--format', choices=list(HANDOFF_FORMATS), default='csv', help='processed_logs 的格式')
+    parser.add_argument('--batch-rows', type=int, default=10000,
+                        help='多批次 feather 输入校验中每个 RecordBatch 的行数（块大小取其 0.7 倍，与批次边界不对齐）')
+    parser.add_argument('--generate', nargs=2, help=argparse.SUPPRESS)
+    parser.add_argument('--record-batches', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--run', nargs=2, help=argparse.SUPPRESS)
+    parser.add_argument('--compare', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.generate:
+        rows, input_dir = args.generate
+        df = make_parsed_logs(int(rows), unfiltered=bool(args.record_batches))
+        path = write_handoff(df, Path(input_dir), 'parsed_logs', args.input_format, PARSED_LOG_COLUMNS)
+        if args.record_batches:
+            # 按固定行数重写为多个 RecordBatch，分块读取时一块由多个批次的切片拼成
+            from pyarrow import feather
+            
+            feather.write_feather(feather.read_table(path), path, compression='uncompressed',
+                                  chunksize=args.record_batches)
+        print(json.dumps({'rows': int(rows)}))
+        return
+    if args.run:
+        run_mode(*args.run, args.chunk_rows, args.format)
+        return
+    if args.compare:
+        same_results(*map(Path, args.compare))
+        return
+    
+    print("📊 日志处理分块模式基准")
+    print(f"📝 每块 {args.chunk_rows} 行, 输入 {args.input_format}, 输出 {args.format}")
+    print("=" * 78)
+    print(f"{'行数':>10}{'整体s':>10}{'整体MB':>10}{'分块s':>10}{'分块MB':>10}{'结果':>8}")
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for rows in args.rows:
+            input_dir = Path(tmp_dir) / 'input'
+            input_dir.mkdir(exist_ok=True)
+            run_child('--generate', rows, input_dir, '--input-format', args.input_format)
+            
+            whole_dir, chunked_dir = Path(tmp_dir) / 'whole', Path(tmp_dir) / 'chunked'
+            whole = run_child('--run', input_dir, whole_dir, '--chunk-rows', 0, '--format', args.format)
+            chunked = run_child('--run', input_dir, chunked_dir, '--chunk-rows', args.chunk_rows, '--format', args.format)
+            same = run_child('--compare', whole_dir, chunked_dir)['same']
+            failed = failed or not same
+            print(f"{rows:>10}{whole['seconds']:>10.2f}{whole['peak_mb']:>10.0f}"
+                  f"{chunked['seconds']:>10.2f}{chunked['peak_mb']:>10.0f}{'✅' if same else '❌':>8}")
+            shutil.rmtree(whole_dir)
+            shutil.rmtree(chunked_dir)
+        
+        if HAS_PYARROW:
+            input_dir = Path(tmp_dir) / 'batches'
+            input_dir.mkdir()
+            rows, chunk_rows = args.batch_rows * 5, args.batch_rows * 7 // 10
+            run_child('--generate', rows, input_dir, '--input-format', 'feather', '--record-batches', args.batch_rows)
+            for output_format in ['feather', 'parquet']:
+                whole_dir, chunked_dir = Path(tmp_dir) / f'whole_{output_format}', Path(tmp_dir) / f'chunked_{output_format}'
+                run_child('--run', input_dir, whole_dir, '--chunk-rows', 0, '--format', output_format)
+                run_child('--run', input_dir, chunked_dir, '--chunk-rows', chunk_rows, '--format', output_format)
+                same = run_child('--compare', whole_dir, chunked_dir)['same']
+                failed = failed or not same
+                print(f"多批次 feather 输入（每批 {args.batch_rows} 行, 每块 {chunk_rows} 行）-> {output_format}: "
+                      f"{'✅' if same else '❌'}")
+    print("=" * 78)
+    
+    if failed:
+        print("❌ 分块处理结果与整体处理不一致")
+        sys.exit(1)
+    print("✅ 分块处理的异常、统计和处理结果与整体处理一致")
+
+if __name__ == '__main__':
+    main()
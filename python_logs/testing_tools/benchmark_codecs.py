@@ -0,0 +1,86 @@
+# 压缩日志读取基准
+# 生成访问日志，按各压缩格式（gzip、bz2、xz，安装 zstandard 时包括 zstd）压缩后对比：
+#   - 纯解压耗时（只读取不解析）
+#   - 解析耗时：在读取线程中解压（旧做法） vs 后台线程解压、与解析并行
+# 并与未压缩文件的解析耗时对比，校验各方式解析出的记录数一致
+
+import sys
+import time
+import random
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'log_processing'))
+
+from log_analyzer import LogAnalyzer
+from log_codecs import CODECS, compress_file, open_binary, open_text
+
+METHODS = ['GET', 'GET', 'GET', 'POST', 'PUT', 'DELETE']
+STATUSES = ['200', '200', '200', '301', '404', '500']
+
+def generate_logs(path, lines, rng):
+    with open(path, 'w', encoding='utf-8') as f:
+        for line_num in range(lines):
+            second = line_num % 86400
+            ip = f"10.{rng.randint(0, 3)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+            f.write(f'{ip} - - [10/Oct/2024:{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d} +0800] '
+                    f'"{rng.choice(METHODS)} /api/v1/item/{rng.randint(1, 2000)} HTTP/1.1" '
+                    f'{rng.choice(STATUSES)} {rng.randint(100, 50000)}\n')
+
+def measure(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def read_all(path):
+    """只解压不解析"""
+    with open_binary(path, prefetch=False) as f:
+        while f.read(1024 * 1024):
+            pass
+
+def parse_all(analyzer, path, prefetch):
+    """按分析器的方式逐行解析，返回记录数"""
+    with open_text(path, prefetch) as f:
+        return sum(1 for _ in analyzer.parse_lines(f, 'apache_access', path.name))
+
+def main():
+    parser = argparse.ArgumentParser(description='压缩日志读取基准')
+    parser.add_argument('--lines', type=int, default=1000000, help='生成的日志行数')
+    args = parser.parse_args()
+    
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_file = Path(tmp_dir) / 'access.log'
+        generate_logs(log_file, args.lines, random.Random(42))
+        size = log_file.stat().st_size / 1024 / 1024
+        analyzer = LogAnalyzer(tmp_dir, Path(tmp_dir) / 'output')
+        
+        plain_count, plain_time = measure(lambda: parse_all(analyzer, log_file, False))
+        print("📊 压缩日志读取基准")
+        print(f"📝 日志行数: {args.lines}, 文件大小: {size:.1f} MB, 未压缩解析: {plain_time:.2f}s "
+              f"({args.lines / plain_time:,.0f} 行/秒)")
+        print("=" * 78)
+        print(f"{'格式':<6}{'压缩后MB':>10}{'纯解压s':>10}{'同线程解析s':>14}{'后台解压解析s':>16}{'加速':>8}{'行/秒':>12}")
+        
+        failed = False
+        for name in CODECS:
+            compressed = compress_file(log_file, name)
+            _, inflate_time = measure(lambda: read_all(compressed))
+            inline_count, inline_time = measure(lambda: parse_all(analyzer, compressed, False))
+            prefetch_count, prefetch_time = measure(lambda: parse_all(analyzer, compressed, True))
+            failed = failed or not (plain_count == inline_count == prefetch_count)
+            print(f"{name:<6}{compressed.stat().st_size / 1024 / 1024:>10.1f}{inflate_time:>10.2f}"
+                  f"{inline_time:>14.2f}{prefetch_time:>16.2f}{inline_time / prefetch_time:>7.2f}x"
+                  f"{args.lines / prefetch_time:>12,.0f}")
+            compressed.unlink()
+        print("=" * 78)
+    
+    if failed:
+        print("❌ 解析出的记录数不一致")
+        sys.exit(1)
+    print("✅ 各格式、各方式解析出的记录数一致")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+# 日志去重基准
+# 对比旧实现（逐行 MD5 十六进制字符串 + drop_duplicates）与按列计算的 64 位内容哈希，
+# 并测量跨运行去重索引（exact 排序数组 / bloom 布隆过滤器）的查找、更新耗时、索引大小和实际误判率：
+# 第一次运行处理一批记录并写入索引，第二次运行的记录一半与第一次重叠
+
+import sys
+import time
+import logging
+import argparse
+import hashlib
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'log_processing'))
+
+from log_dedup import DEDUP_INDEX_FILES, DEDUP_MODES, drop_duplicates, open_dedup_index
+
+METHODS = np.array(['GET', 'GET', 'GET', 'POST', 'PUT', 'DELETE'], dtype=object)
+STATUSES = np.array([200, 200, 200, 301, 404, 500])
+
+def make_records(start, rows, duplicate_ratio, seed):
+    """第 start 到 start + rows 条访问日志记录，按比例混入本批次内的重复记录"""
+    rng = np.random.default_rng(seed)
+    index = np.arange(start, start + rows)
+    duplicates = rng.random(rows) < duplicate_ratio
+    index[duplicates] = rng.choice(index, duplicates.sum())
+    second = index % 86400
+    raw_lines = pd.Series([f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255} - - [10/Oct/2024:{s // 3600:02d}:'
+                           f'{s // 60 % 60:02d}:{s % 60:02d} +0800] "GET /api/item/{i % 5000} HTTP/1.1" 200 {i % 9000}'
+                           for i, s in zip(index, second)], dtype='string')
+    return pd.DataFrame({
+        'line_number': np.arange(rows) + 1,
+        'file_name': 'access.log',
+        'format': 'apache_access',
+        'raw_line': raw_lines,
+        'ip': raw_lines.str.split(' ', n=1).str[0],
+        'method': METHODS[index % len(METHODS)],
+        'url': pd.Series(index % 5000).map(lambda item: f'/api/item/{item}'),
+        'status': STATUSES[index % len(STATUSES)],
+        'size': (index % 9000).astype(str),
+    })
+
+def legacy_dedup(df):
+    """旧实现：逐行计算 raw_line 的 MD5"""
+    df = df.copy()
+    df['content_hash'] = df['raw_line'].apply(lambda x: hashlib.md5(str(x).encode()).hexdigest())
+    return df.drop_duplicates(subset=['content_hash']).drop(columns=['content_hash'])
+
+def measure(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='日志去重基准')
+    parser.add_argument('--rows', type=int, default=1000000, help='每次运行的记录数')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.05, help='批次内重复记录的比例')
+    parser.add_argument('--error-rate', type=float, default=0.001, help='bloom 模式的误判率')
+    args = parser.parse_args()
+    
+    logging.disable(logging.CRITICAL)
+    first = make_records(0, args.rows, args.duplicate_ratio, seed=1)
+    # 第二次运行：前一半与第一次重叠
+    second = make_records(args.rows // 2, args.rows, args.duplicate_ratio, seed=2)
+    
+    legacy, legacy_time = measure(legacy_dedup, first)
+    (deduped, _, _), hash_time = measure(drop_duplicates, first)
+    print("📊 日志去重基准")
+    print(f"📝 每次运行 {args.rows} 条记录, 批次内重复 {args.duplicate_ratio:.0%}, 第二次运行与第一次重叠 50%")
+    print("=" * 78)
+    print(f"批次内去重: 旧实现（MD5 apply）{legacy_time:.2f}s, 64 位内容哈希 {hash_time:.2f}s, "
+          f"加速比 {legacy_time / hash_time:.1f}x")
+    failed = len(legacy) != len(deduped) or not legacy.index.equals(deduped.index)
+    print(f"   保留记录: 旧实现 {len(legacy)}, 内容哈希 {len(deduped)} {'❌' if failed else '✅'}")
+    
+    # 第二次运行中真正新的记录：与第一次运行的记录原文都不同
+    new_lines = ~second['raw_line'].isin(set(first['raw_line']))
+    expected = second[new_lines].drop_duplicates(subset=['raw_line'])
+    print(f"{'模式':<8}{'索引MB':>10}{'查找+更新s':>12}{'第二次保留':>12}{'应保留':>10}{'误判率':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode in DEDUP_MODES:
+            path = Path(tmp_dir) / DEDUP_INDEX_FILES[mode]
+            index = open_dedup_index(path, mode, capacity=2 * args.rows, error_rate=args.error_rate)
+            _, hashes, _ = drop_duplicates(first, index)
+            index.add(hashes)
+            index.save()
+            
+            index = open_dedup_index(path, mode, capacity=2 * args.rows, error_rate=args.error_rate)
+            start = time.perf_counter()
+            kept, hashes, _ = drop_duplicates(second, index)
+            index.add(hashes)
+            elapsed = time.perf_counter() - start
+            
+            # 误判：真正新的记录被当作重复丢弃；重复的记录不能被保留
+            missed = len(expected) - len(kept.index.intersection(expected.index))
+            wrong = len(kept.index.difference(expected.index))
+            failed = failed or wrong > 0 or (mode == 'exact' and missed > 0)
+            print(f"{mode:<8}{index.memory_bytes() / 1024 / 1024:>10.1f}{elapsed:>12.2f}{len(kept):>12}"
+                  f"{len(expected):>10}{missed / len(expected):>10.4%}")
+    print("=" * 78)
+    
+    if failed:
+        print("❌ 去重结果不正确")
+        sys.exit(1)
+    print("✅ 去重结果正确（exact 无误判，bloom 误判率见上表）")
+
+if __name__ == '__main__':
+    main()
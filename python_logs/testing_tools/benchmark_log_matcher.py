@@ -0,0 +1,110 @@
+# 日志格式匹配微基准测试
+# 对比旧实现（每行 re.match 原始正则字符串）、预编译多格式匹配器 LogMatcher
+# 以及访问日志分词快速路径（fast_path=True）的吞吐量
+
+import re
+import sys
+import time
+import random
+import tempfile
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'log_processing'))
+
+from log_analyzer import LogAnalyzer
+from log_matcher import LogMatcher
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+def make_line(format_name, rng):
+    """生成一行指定格式的示例日志"""
+    ip = f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+    if format_name == 'apache_access':
+        return (f'{ip} - frank [{rng.randint(1, 28):02d}/{rng.choice(MONTHS)}/2024:{rng.randint(0, 23):02d}:'
+                f'{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d} +0800] "GET /page/{rng.randint(1, 500)}?id={rng.randint(1, 99)} '
+                f'HTTP/1.1" {rng.choice([200, 200, 304, 404, 500])} {rng.choice(["-", rng.randint(100, 50000)])}')
+    if format_name == 'nginx_access':
+        return (f'{ip} - - [{rng.randint(1, 28):02d}/{rng.choice(MONTHS)}/2024:{rng.randint(0, 23):02d}:'
+                f'{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d} +0000] "POST /api/v1/items/{rng.randint(1, 999)} '
+                f'HTTP/2.0" {rng.choice([200, 201, 400, 502])} {rng.randint(100, 50000)}')
+    if format_name == 'syslog':
+        return (f'{rng.choice(MONTHS)} {rng.randint(1, 28):2d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:'
+                f'{rng.randint(0, 59):02d} web01 sshd[{rng.randint(100, 9999)}]: Failed password for invalid user from {ip}')
+    return (f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:'
+            f'{rng.randint(0, 59):02d} [{rng.choice(["INFO", "WARNING", "ERROR"])}] request {rng.randint(1, 10 ** 6)} handled')
+
+def legacy_parse(log_patterns, lines):
+    """旧实现：逐个格式尝试检测，然后每行用原始正则字符串匹配"""
+    sample_lines = lines[:10]
+    pattern = None
+    for _, candidate in log_patterns.items():
+        matches = sum(1 for line in sample_lines if re.match(candidate, line))
+        if matches >= len(sample_lines) * 0.7:
+            pattern = candidate
+            break
+    
+    parsed = 0
+    if pattern:
+        for line in lines:
+            match = re.match(pattern, line.strip())
+            if match:
+                match.groupdict()
+                parsed += 1
+    return parsed
+
+def matcher_parse(matcher, lines):
+    """新实现：预编译匹配器检测主要格式，每行优先按主要格式匹配"""
+    hint = matcher.detect(lines[:10])
+    hint = hint if hint in matcher.formats else None
+    parsed = 0
+    for line in lines:
+        line_format, _ = matcher.parse(line.strip(), hint)
+        if line_format:
+            parsed += 1
+    return parsed
+
+def measure(func, *args, repeat=3):
+    """多次运行取最快的一次"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def main():
+    parser = argparse.ArgumentParser(description='日志格式匹配微基准测试')
+    parser.add_argument('--lines', type=int, default=200000, help='每种格式的行数')
+    args = parser.parse_args()
+    
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_patterns = LogAnalyzer(tmp_dir, tmp_dir).log_patterns
+    matcher = LogMatcher(log_patterns)
+    fast_matcher = LogMatcher(log_patterns, fast_path=True)
+    
+    samples = {name: [make_line(name, rng) for _ in range(args.lines)] for name in
+               ['apache_access', 'nginx_access', 'syslog', 'application']}
+    # 混合文件：80% 访问日志，其余为应用日志和系统日志
+    samples['mixed'] = [make_line(rng.choices(['nginx_access', 'application', 'syslog'], [8, 1, 1])[0], rng)
+                        for _ in range(args.lines)]
+    
+    print("📊 日志格式匹配基准 (行/秒)")
+    print("=" * 92)
+    print(f"{'样本':<16}{'旧实现':>14}{'匹配器':>14}{'快速路径':>14}{'加速比':>10}{'快速路径比':>10}{'匹配行数':>18}")
+    for name, lines in samples.items():
+        legacy_count, legacy_time = measure(legacy_parse, log_patterns, lines)
+        matcher_count, matcher_time = measure(matcher_parse, matcher, lines)
+        fast_count, fast_time = measure(matcher_parse, fast_matcher, lines)
+        counts = f"{legacy_count}" if legacy_count == matcher_count == fast_count else \
+            f"{legacy_count}/{matcher_count}/{fast_count}"
+        print(f"{name:<16}{len(lines) / legacy_time:>14,.0f}{len(lines) / matcher_time:>14,.0f}"
+              f"{len(lines) / fast_time:>14,.0f}{legacy_time / matcher_time:>9.2f}x"
+              f"{matcher_time / fast_time:>9.2f}x{counts:>18}")
+    print("=" * 92)
+
+if __name__ == '__main__':
+    main()
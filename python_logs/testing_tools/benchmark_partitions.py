@@ -0,0 +1,90 @@
+# 分区存储基准测试
+# 生成不同保留天数的处理结果，分别保存为单个文件和按日期/小时分区的目录，
+# 对比读取最近 24 小时数据的耗时：单个文件需要读取全部历史再过滤，分区目录只打开重叠的分区
+
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'log_processing'))
+
+from log_storage import PART_COLUMN, PROCESSED_LOG_COLUMNS, partition_dir, read_handoff, write_handoff, write_partitions
+from timestamp_parser import standard_format
+
+# 与 log_reporter.REPORT_COLUMNS 相同（报告模块依赖 matplotlib，这里不直接导入）
+REPORT_COLUMNS = ['status_category', 'hour', 'ip', 'date', 'size_category']
+CATEGORIES = ['success', 'success', 'success', 'redirect', 'client_error', 'server_error']
+
+def make_history(days, rows_per_hour, end, rng):
+    """生成 days 天的处理结果，每小时 rows_per_hour 条"""
+    rows = []
+    start = end - timedelta(days=days)
+    for hour in range(days * 24):
+        hour_start = start + timedelta(hours=hour)
+        for _ in range(rows_per_hour):
+            timestamp = standard_format(hour_start + timedelta(seconds=rng.randrange(3600)))
+            rows.append({
+                'ip': f"10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+                'normalized_timestamp': timestamp,
+                'hour': int(timestamp[11:13]),
+                'date': timestamp[:10],
+                'status_category': rng.choice(CATEGORIES),
+                'size_category': rng.choice(['small', 'medium']),
+            })
+    df = pd.DataFrame(rows)
+    # 与日志分析一致：每个分区一个文件
+    df[PART_COLUMN] = [f"{partition_dir(timestamp)}/part-0" for timestamp in df['normalized_timestamp']]
+    return df
+
+def measure(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='分区存储基准测试')
+    parser.add_argument('--days', type=int, nargs='+', default=[7, 30, 90], help='保留的历史天数')
+    parser.add_argument('--rows-per-hour', type=int, default=500, help='每小时的记录数')
+    parser.add_argument('--format', choices=['csv', 'feather', 'parquet'], default='csv', help='交接文件格式')
+    args = parser.parse_args()
+    
+    end = datetime(2024, 10, 31)
+    since = standard_format(end - timedelta(hours=24))
+    
+    print("📊 分区存储基准：读取最近 24 小时 (秒)")
+    print("=" * 70)
+    failed = False
+    for days in args.days:
+        df = make_history(days, args.rows_per_hour, end, random.Random(42))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            flat_dir = Path(tmp_dir) / 'flat'
+            partitioned_dir = Path(tmp_dir) / 'partitioned'
+            flat_dir.mkdir()
+            partitioned_dir.mkdir()
+            write_handoff(df.drop(columns=PART_COLUMN), flat_dir, 'processed_logs', args.format, PROCESSED_LOG_COLUMNS)
+            write_partitions(df, partitioned_dir, 'processed_logs', args.format, PROCESSED_LOG_COLUMNS, PART_COLUMN)
+            
+            flat, flat_time = measure(lambda: read_handoff(flat_dir, 'processed_logs', columns=REPORT_COLUMNS,
+                                                           since=since))
+            partitioned, partitioned_time = measure(lambda: read_handoff(
+                partitioned_dir, 'processed_logs', columns=REPORT_COLUMNS, since=since))
+        
+        same = len(flat) == len(partitioned) and sorted(flat['ip']) == sorted(partitioned['ip'])
+        failed = failed or not same
+        print(f"{days:>3} 天 ({len(df):,} 条): 单个文件 {flat_time:.3f}, 分区目录 {partitioned_time:.3f}, "
+              f"最近 24 小时 {len(partitioned):,} 条 {'✅' if same else '❌'}")
+    print("=" * 70)
+    
+    if failed:
+        print("❌ 分区读取结果与单个文件不一致")
+        sys.exit(1)
+    print("✅ 分区读取结果与单个文件一致")
+
+if __name__ == '__main__':
+    main()
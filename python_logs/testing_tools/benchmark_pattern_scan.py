@@ -0,0 +1,95 @@
+# 日志处理规则扫描基准
+# 对比旧实现（噪音过滤每条规则扫描一次并重新过滤整表；可疑模式按列、按规则逐个 str.contains）
+# 与 ColumnScanner 的单次扫描（全部规则合并为一个正则扫描一次整列，只在命中的行上确认具体规则），
+# 并校验过滤结果和各列各规则的命中次数一致
+
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'log_processing'))
+
+from log_processor import NOISE_PATTERNS, SUSPICIOUS_PATTERNS, LogProcessor
+
+AGENTS = np.array(['Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36', 'curl/8.0',
+                   'python-requests/2.31', 'Mozilla/5.0 (Macintosh; Intel Mac OS X 14_0) Safari/605.1.15'], dtype=object)
+BOTS = np.array(['Googlebot/2.1 (+http://www.google.com/bot.html)', 'Mozilla/5.0 (compatible; bingbot/2.0)',
+                 'Scrapy/2.11 (+https://scrapy.org) scraper', 'Baiduspider/2.0', 'AhrefsCrawler/1.0'], dtype=object)
+PAGES = np.array(['/', '/index.html', '/api/v1/users', '/api/v1/orders', '/static/app.js', '/search'], dtype=object)
+ATTACKS = np.array(['/download?file=../../etc/passwd', '/search?q=<script>alert(1)</script>',
+                    "/item?id=1 UNION ALL SELECT password FROM users", '/run?cmd=eval(atob(x))'], dtype=object)
+
+def make_frame(rows, bot_ratio, attack_ratio, seed=42):
+    """生成 message、url、raw_line 三列：按比例混入爬虫 User-Agent 和攻击请求"""
+    rng = np.random.default_rng(seed)
+    messages = rng.choice(AGENTS, rows)
+    bots = rng.random(rows) < bot_ratio
+    messages[bots] = rng.choice(BOTS, bots.sum())
+    urls = rng.choice(PAGES, rows)
+    attacks = rng.random(rows) < attack_ratio
+    urls[attacks] = rng.choice(ATTACKS, attacks.sum())
+    urls = pd.Series(urls, dtype='str') + '&id=' + pd.Series(rng.integers(0, 100000, rows)).astype('str')
+    messages = pd.Series(messages, dtype='str')
+    raw_lines = '10.0.0.1 - - [10/Oct/2024:13:55:36 +0800] "GET ' + urls + ' HTTP/1.1" 200 512 "' + messages + '"'
+    return pd.DataFrame({'message': messages, 'url': urls, 'raw_line': raw_lines})
+
+def legacy_filter_noise(df):
+    """旧实现：每条规则扫描一次，每次都重新过滤整表"""
+    for pattern in NOISE_PATTERNS:
+        df = df[~df['message'].str.contains(pattern, case=False, na=False)]
+    return df
+
+def legacy_pattern_counts(df):
+    """旧实现：每列每条规则各扫描一次整列"""
+    counts = {}
+    for col in ['message', 'url', 'raw_line']:
+        for pattern in SUSPICIOUS_PATTERNS:
+            counts[(col, pattern)] = len(df[df[col].str.contains(pattern, case=False, na=False, regex=True)])
+    return counts
+
+def measure(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='日志处理规则扫描基准')
+    parser.add_argument('--rows', type=int, default=5000000, help='数据行数')
+    parser.add_argument('--bot-ratio', type=float, default=0.2, help='爬虫请求的比例')
+    parser.add_argument('--attack-ratio', type=float, default=0.005, help='攻击请求的比例')
+    args = parser.parse_args()
+    
+    logging.disable(logging.CRITICAL)
+    df = make_frame(args.rows, args.bot_ratio, args.attack_ratio)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        processor = LogProcessor(tmp_dir, tmp_dir)
+        expected_kept, legacy_filter_time = measure(legacy_filter_noise, df)
+        kept, filter_time = measure(processor.filter_noise, df)
+        expected_counts, legacy_count_time = measure(legacy_pattern_counts, df)
+        counts, count_time = measure(lambda: processor.count_anomalies(df)['pattern_counts'])
+    
+    print("📊 日志处理规则扫描基准")
+    print(f"📝 数据行数: {args.rows}, 爬虫请求 {args.bot_ratio:.1%}, 攻击请求 {args.attack_ratio:.1%}")
+    print("=" * 70)
+    print(f"噪音过滤（{len(NOISE_PATTERNS)} 条规则）: 旧实现 {legacy_filter_time:.2f}s, 单次扫描 {filter_time:.2f}s, "
+          f"加速比 {legacy_filter_time / filter_time:.1f}x")
+    print(f"可疑模式（3 列 x {len(SUSPICIOUS_PATTERNS)} 条规则）: 旧实现 {legacy_count_time:.2f}s, "
+          f"单次扫描 {count_time:.2f}s, 加速比 {legacy_count_time / count_time:.1f}x")
+    print(f"合计: {args.rows / (legacy_filter_time + legacy_count_time):,.0f} 行/秒 -> "
+          f"{args.rows / (filter_time + count_time):,.0f} 行/秒")
+    print("=" * 70)
+    
+    failed = not kept.index.equals(expected_kept.index) or counts != expected_counts
+    if failed:
+        print("❌ 过滤结果或命中次数不一致")
+        sys.exit(1)
+    print(f"✅ 过滤结果一致（保留 {len(kept)} 行），各列各规则的命中次数一致")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# 安全事件扫描基准测试
+# 对比旧实现（每条日志逐个 re.search 全部规则）与单次扫描的 SecurityScanner，
+# 同时校验两者按规则统计的命中次数完全一致
+
+import re
+import sys
+import time
+import random
+import tempfile
+import argparse
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'log_processing'))
+
+from log_analyzer import LogAnalyzer
+from security_scanner import SecurityScanner
+
+PHRASES = ['Failed login for root', 'AUTHENTICATION FAILED', 'Invalid User admin', 'brute force detected',
+           'possible SQL Injection', 'XSS attack blocked', 'unauthorized access to /admin', 'İnvalid user é',
+           'id=1 UNION  Select password']
+
+def make_content(rng, hit_rate):
+    """生成一条日志内容，按 hit_rate 混入安全事件关键字"""
+    content = (f'{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)} - - '
+               f'[10/Oct/2024:13:55:{rng.randint(10, 59)} +0800] "GET /page/{rng.randint(1, 500)} HTTP/1.1" 200 {rng.randint(100, 9999)}')
+    if rng.random() < hit_rate:
+        content += ' ' + ' / '.join(rng.sample(PHRASES, rng.randint(1, 2)))
+    return content
+
+def legacy_scan(patterns, contents):
+    """旧实现：每条日志对每个规则调用一次 re.search"""
+    counts = Counter()
+    for content in contents:
+        for pattern in patterns:
+            if re.search(pattern, content, re.IGNORECASE):
+                counts[pattern] += 1
+    return counts
+
+def scanner_scan(scanner, contents):
+    """新实现：每条日志一次扫描得到全部命中的规则"""
+    counts = Counter()
+    for content in contents:
+        for pattern in scanner.scan(content):
+            counts[pattern] += 1
+    return counts
+
+def measure(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='安全事件扫描基准测试')
+    parser.add_argument('--lines', type=int, default=200000, help='日志条数')
+    parser.add_argument('--hit-rate', type=float, default=0.01, help='包含安全关键字的日志比例')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        patterns = LogAnalyzer(tmp_dir, tmp_dir).security_patterns
+    
+    rng = random.Random(42)
+    contents = [make_content(rng, args.hit_rate) for _ in range(args.lines)]
+    # 自定义正则规则走合并正则预筛路径
+    regex_patterns = patterns + [r'union\s+select']
+    
+    print("📊 安全事件扫描基准 (行/秒)")
+    print("=" * 70)
+    failed = False
+    for name, rules in [('纯文本规则', patterns), ('含正则规则', regex_patterns)]:
+        expected, legacy_time = measure(legacy_scan, rules, contents)
+        actual, scanner_time = measure(scanner_scan, SecurityScanner(rules), contents)
+        same = expected == actual
+        failed = failed or not same
+        print(f"{name}: 旧实现 {len(contents) / legacy_time:,.0f}, 扫描器 {len(contents) / scanner_time:,.0f}, "
+              f"加速比 {legacy_time / scanner_time:.2f}x, 命中 {sum(actual.values())} 次 {'✅' if same else '❌'}")
+    print("=" * 70)
+    
+    if failed:
+        print("❌ 命中次数不一致")
+        sys.exit(1)
+    print("✅ 命中次数完全一致")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# 近似统计基准测试
+# 在偏斜分布（少量热门值 + 大量长尾值）的访问记录上对比精确统计与近似模式（HyperLogLog / Space-Saving），
+# 报告去重计数误差、Top 10 命中情况、误差界是否成立、分片合并结果和内存占用
+
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'log_processing'))
+
+from log_analyzer import AccessLogStats
+
+def make_records(count, distinct, rng):
+    """生成访问记录：IP 和 URL 服从近似 Zipf 分布"""
+    weights = [1 / rank for rank in range(1, distinct + 1)]
+    ips = rng.choices(range(distinct), weights, k=count)
+    urls = rng.choices(range(distinct), weights, k=count)
+    return [{'ip': f"10.{ip >> 16 & 255}.{ip >> 8 & 255}.{ip & 255}", 'url': f"/item/{url}",
+             'status': '200', 'method': 'GET'} for ip, url in zip(ips, urls)]
+
+def build_stats(records, approximate, parts=1):
+    """按 parts 个分片分别统计后合并，并测量峰值内存"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    merged = None
+    size = (len(records) + parts - 1) // parts
+    for index in range(parts):
+        stats = AccessLogStats(approximate)
+        for record in records[index * size:(index + 1) * size]:
+            stats.update(record)
+        if merged is None:
+            merged = stats
+        else:
+            merged.merge(stats)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return merged, elapsed, peak
+
+def check_bounds(exact, stats, field, name):
+    """估计次数只能高估，且高估量不超过报告的误差"""
+    counts = exact.aggregators[field].counts
+    errors = stats.result()['estimated_error'][f'{name}_max_overcount']
+    violations = 0
+    for value, estimate in stats.result()[name].items():
+        if not (estimate - errors[value] <= counts[value] <= estimate):
+            violations += 1
+    return violations
+
+def main():
+    parser = argparse.ArgumentParser(description='近似统计基准测试')
+    parser.add_argument('--records', type=int, default=300000, help='访问记录数')
+    parser.add_argument('--distinct', type=int, default=200000, help='IP/URL 取值个数')
+    parser.add_argument('--distinct-error', type=float, default=0.01, help='去重计数目标相对误差')
+    parser.add_argument('--top-error', type=float, default=0.001, help='Top N 高估量占总数的比例')
+    parser.add_argument('--parts', type=int, default=4, help='分片合并测试的分片数')
+    args = parser.parse_args()
+    
+    records = make_records(args.records, args.distinct, random.Random(42))
+    approximate = {'distinct_error': args.distinct_error, 'top_error': args.top_error}
+    
+    exact, exact_time, exact_memory = build_stats(records, None)
+    expected = exact.result()
+    
+    print("📊 近似统计基准")
+    print(f"📝 记录数: {args.records}, 实际去重IP数: {expected['unique_ips']}")
+    print("=" * 70)
+    print(f"精确统计: {exact_time:.2f} 秒, 峰值内存 {exact_memory / 1024 / 1024:.1f} MB")
+    
+    failed = False
+    for parts in sorted({1, args.parts}):
+        stats, elapsed, memory = build_stats(records, approximate, parts)
+        result = stats.result()
+        distinct_error = abs(result['unique_ips'] - expected['unique_ips']) / expected['unique_ips']
+        top_ips_hits = len(set(result['top_ips']) & set(expected['top_ips']))
+        top_urls_hits = len(set(result['top_urls']) & set(expected['top_urls']))
+        violations = check_bounds(exact, stats, 'ips', 'top_ips') + check_bounds(exact, stats, 'urls', 'top_urls')
+        failed = failed or violations > 0
+        
+        print(f"近似统计 ({parts} 个分片合并): {elapsed:.2f} 秒, 峰值内存 {memory / 1024 / 1024:.1f} MB")
+        print(f"   去重IP数: {result['unique_ips']} (误差 {distinct_error:.2%}, "
+              f"标准误差 {result['estimated_error']['unique_ips_relative_error']:.2%})")
+        print(f"   Top 10 IP 命中: {top_ips_hits}/10, Top 10 URL 命中: {top_urls_hits}/10, "
+              f"误差界不成立: {violations} {'✅' if not violations else '❌'}")
+    print("=" * 70)
+    
+    if failed:
+        print("❌ 估计值超出报告的误差界")
+        sys.exit(1)
+    print("✅ 所有估计值都在报告的误差界内")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+# 日志分析吞吐量基准套件
+# 用 log_generator 生成确定的合成日志（apache/nginx/syslog/应用日志），每个阶段在独立子进程中运行，
+# 报告行/秒、MB/秒和峰值内存（RSS）：
+#   parse_log_file           - 逐文件解析为记录列表
+#   run_analysis             - 完整分析流程（流式统计 + 解析结果落盘）
+#   analyze_access_logs      - 访问日志统计（输入为预先解析的记录，不计解析耗时）
+#   analyze_application_logs - 应用日志统计
+#   analyze_security_events  - 安全事件检测（全部记录）
+#   generate_time_analysis   - 时间分布统计（全部记录）
+# 结果保存为 JSON，--compare 与之前保存的结果逐阶段对比吞吐量，超过阈值的下降视为回归
+
+import sys
+import json
+import time
+import logging
+import platform
+import argparse
+import resource
+import tempfile
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'log_processing'))
+
+from log_analyzer import LogAnalyzer
+from log_generator import FORMATS, MANIFEST_FILE, generate_dataset
+
+# 阶段名 -> 输入记录的格式（None 为全部文件）
+STAGES = {
+    'parse_log_file': None,
+    'run_analysis': None,
+    'analyze_access_logs': ['apache_access', 'nginx_access'],
+    'analyze_application_logs': ['application'],
+    'analyze_security_events': None,
+    'generate_time_analysis': None,
+}
+
+def peak_rss():
+    """当前进程的峰值内存（MB）"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_stage(stage, log_dir, output_dir, workers):
+    """在子进程中执行一个阶段，输出 JSON 结果"""
+    logging.disable(logging.CRITICAL)
+    with open(Path(log_dir) / MANIFEST_FILE, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    formats = STAGES[stage]
+    files = [Path(log_dir) / name for name, info in sorted(manifest['files'].items())
+             if formats is None or info['format'] in formats]
+    size = sum(manifest['files'][path.name]['bytes'] for path in files)
+    analyzer = LogAnalyzer(log_dir, output_dir, workers=workers)
+    
+    if stage == 'parse_log_file':
+        baseline = peak_rss()
+        start = time.perf_counter()
+        records = sum(len(analyzer.parse_log_file(path)) for path in files)
+    elif stage == 'run_analysis':
+        baseline = peak_rss()
+        start = time.perf_counter()
+        records = analyzer.run_analysis()['summary']['total_log_entries']
+    else:
+        # 统计方法的输入为解析好的记录，解析不计入耗时；峰值内存包含记录本身
+        logs = [record for path in files for record in analyzer.iter_log_file(path)]
+        records = len(logs)
+        method = getattr(analyzer, stage)
+        baseline = peak_rss()
+        start = time.perf_counter()
+        method(logs)
+    
+    seconds = time.perf_counter() - start
+    print(json.dumps({'records': records, 'bytes': size, 'seconds': seconds,
+                      'baseline_rss_mb': baseline, 'peak_rss_mb': peak_rss()}))
+
+def measure(stage, log_dir, output_dir, workers, repeat):
+    """多次运行一个阶段，取耗时最短的一次"""
+    best = None
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, __file__, '--stage', stage, '--log-dir', str(log_dir),
+                                 '--output-dir', str(output_dir), '--workers', str(workers)],
+                                capture_output=True, text=True, check=True)
+        run = json.loads(result.stdout.strip().splitlines()[-1])
+        if best is None or run['seconds'] < best['seconds']:
+            best = run
+    best['lines_per_sec'] = best['records'] / best['seconds']
+    best['mb_per_sec'] = best['bytes'] / 1024 / 1024 / best['seconds']
+    return best
+
+def git_revision():
+    """当前代码版本（不在 git 仓库中时返回 None）"""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).resolve().parent,
+                                capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_file, threshold):
+    """与之前的结果对比吞吐量，返回是否有超过阈值（百分比）的下降"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"📈 对比 {baseline_file}（版本 {baseline['meta'].get('revision')}，{baseline['meta']['timestamp']}）")
+    if baseline['dataset'] != results['dataset']:
+        print(f"⚠️ 数据集不同（之前 {baseline['dataset']}），吞吐量只能粗略对比")
+    print(f"{'阶段':<26}{'之前 行/秒':>14}{'现在 行/秒':>14}{'变化':>10}{'峰值内存变化':>14}")
+    
+    regressed = False
+    for stage, result in results['stages'].items():
+        previous = baseline['stages'].get(stage)
+        if previous is None:
+            print(f"{stage:<26}{'-':>14}{result['lines_per_sec']:>14,.0f}")
+            continue
+        change = (result['lines_per_sec'] / previous['lines_per_sec'] - 1) * 100
+        memory = result['peak_rss_mb'] - previous['peak_rss_mb']
+        mark = '❌' if change < -threshold else '  '
+        regressed = regressed or change < -threshold
+        print(f"{stage:<26}{previous['lines_per_sec']:>14,.0f}{result['lines_per_sec']:>14,.0f}"
+              f"{change:>+9.1f}%{memory:>+12.1f}MB {mark}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description='日志分析吞吐量基准套件')
+    parser.add_argument('--lines', type=int, default=200000, help='每种格式生成的日志行数')
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=FORMATS, help='生成的日志格式')
+    parser.add_argument('--attack-ratio', type=float, default=0.01, help='混入安全事件的行比例')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES), help='运行的阶段')
+    parser.add_argument('--workers', type=int, default=1, help='run_analysis 的进程数')
+    parser.add_argument('--repeat', type=int, default=1, help='每个阶段运行次数（取最快的一次）')
+    parser.add_argument('--output', default='benchmark_results.json', help='结果 JSON 文件')
+    parser.add_argument('--compare', help='对比的历史结果 JSON 文件')
+    parser.add_argument('--threshold', type=float, default=10.0, help='吞吐量下降超过此百分比视为回归')
+    parser.add_argument('--stage', choices=list(STAGES), help=argparse.SUPPRESS)
+    parser.add_argument('--log-dir', help=argparse.SUPPRESS)
+    parser.add_argument('--output-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.stage:
+        run_stage(args.stage, args.log_dir, args.output_dir, args.workers)
+        return
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_dir = Path(tmp_dir) / 'logs'
+        manifest = generate_dataset(log_dir, args.formats, args.lines, attack_ratio=args.attack_ratio, seed=args.seed)
+        print("📊 日志分析吞吐量基准套件")
+        print(f"📝 {len(manifest['files'])} 个文件, {manifest['total_lines']} 行, "
+              f"{manifest['total_bytes'] / 1024 / 1024:.1f} MB, 种子 {args.seed}")
+        print("=" * 78)
+        print(f"{'阶段':<26}{'记录数':>10}{'耗时s':>9}{'行/秒':>12}{'MB/秒':>9}{'峰值内存MB':>12}")
+        
+        stages = {}
+        for stage in args.stages:
+            result = stages[stage] = measure(stage, log_dir, Path(tmp_dir) / stage, args.workers, args.repeat)
+            print(f"{stage:<26}{result['records']:>10}{result['seconds']:>9.2f}{result['lines_per_sec']:>12,.0f}"
+                  f"{result['mb_per_sec']:>9.1f}{result['peak_rss_mb']:>12.1f}")
+        print("=" * 78)
+    
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'workers': args.workers,
+            'repeat': args.repeat,
+        },
+        'dataset': {key: manifest[key] for key in ('seed', 'attack_ratio', 'total_lines', 'total_bytes')},
+        'stages': stages,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"💾 结果已保存: {args.output}")
+    
+    if args.compare and compare(results, args.compare, args.threshold):
+        print(f"❌ 吞吐量下降超过 {args.threshold}%")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+# 时间戳解析基准测试
+# 对比旧实现（逐个格式调用 strptime）与共用的 TimestampParser，
+# 覆盖日志分析的按小时/日期统计和日志处理的时间戳标准化（逐条解析 vs 整列向量化解析），并校验结果一致；
+# --mix 选择以访问日志、syslog 或应用日志时间为主的输入（访问日志的快速路径不适用时的开销）
+
+import sys
+import time
+import random
+import tempfile
+import argparse
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'log_processing'))
+
+import pandas as pd
+
+from log_analyzer import TimeDistribution
+from log_processor import LogProcessor, TIMESTAMP_FORMATS
+from timestamp_parser import STANDARD_TIME_FORMAT, TimestampParser, standard_format
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+# 非标准写法和无效值，验证回退路径与 strptime 一致
+ODD_TIMESTAMPS = ['1/Oct/2024:13:55:36 +0800', '10/oct/2024:13:55:36', '31/Feb/2024:00:00:00', '10/Oct/2024:24:00:00',
+                  '10/Oct/2024:13:55:60', '10/Oct/2024:1:5:6', '１0/Oct/2024:13:55:36', '2024-10-10T13:55:36',
+                  '2024-10-10 13:55:36', 'Oct 10 13:55:36', 'Oct 1 13:55:36', 'oct 10 13:55:36', 'Feb 29 00:00:00',
+                  'Oct 10 13:55:60', '2024-1-5 13:55:36', '2024-10-10 24:00:00', '2024-10-10 13:55:36 extra', '-', '']
+
+# 各输入中主要格式的时间戳写法，每秒重复 repeat 次
+MIXES = {
+    'access': (lambda dt: f"{dt.day:02d}/{MONTHS[dt.month - 1]}/{dt.year}:{dt:%H:%M:%S} +0800", 50),
+    'syslog': (lambda dt: f"{MONTHS[dt.month - 1]} {dt.day:2d} {dt:%H:%M:%S}", 5),
+    'application': (lambda dt: dt.strftime('%Y-%m-%d %H:%M:%S'), 1),
+}
+
+def make_timestamps(lines, rng, mix='access'):
+    """生成时间戳：90% 为 mix 对应的格式，混入少量 ISO 8601 时间和异常值"""
+    fmt, repeat = MIXES[mix]
+    timestamps = []
+    base = datetime(2024, 10, 10, 13, 0, 0).timestamp()
+    for index in range(lines):
+        dt = datetime.fromtimestamp(base + index // repeat)
+        roll = rng.random()
+        if roll < 0.9:
+            timestamps.append(fmt(dt))
+        elif roll < 0.98:
+            timestamps.append(dt.strftime('%Y-%m-%dT%H:%M:%S'))
+        else:
+            timestamps.append(rng.choice(ODD_TIMESTAMPS))
+    return timestamps
+
+def strptime_any(timestamp_str, formats):
+    """逐个格式调用 strptime，含空白的格式按整个字符串，其余格式按第一个空白之前的部分"""
+    text = timestamp_str.strip()
+    for fmt in formats:
+        try:
+            return datetime.strptime(text if any(char.isspace() for char in fmt) else text.split()[0], fmt)
+        except ValueError:
+            continue
+    return None
+
+def legacy_time_analysis(timestamps):
+    """旧实现：日志分析的按小时/日期统计"""
+    hourly = defaultdict(int)
+    daily = defaultdict(int)
+    for timestamp_str in timestamps:
+        if not timestamp_str or not timestamp_str.strip():
+            continue
+        dt = strptime_any(timestamp_str, TimeDistribution.TIME_FORMATS)
+        if dt is not None:
+            hourly[dt.hour] += 1
+            daily[dt.strftime('%Y-%m-%d')] += 1
+    return dict(hourly), dict(daily)
+
+def parser_time_analysis(timestamps):
+    """新实现：TimeDistribution"""
+    distribution = TimeDistribution()
+    for timestamp_str in timestamps:
+        distribution.update({'timestamp': timestamp_str})
+    return dict(distribution.hourly), dict(distribution.daily)
+
+def legacy_normalize(timestamps):
+    """旧实现：日志处理的时间戳标准化"""
+    results = []
+    for timestamp_str in timestamps:
+        dt = strptime_any(str(timestamp_str), TIMESTAMP_FORMATS)
+        results.append(dt.strftime(STANDARD_TIME_FORMAT) if dt is not None else timestamp_str)
+    return results
+
+def parser_normalize(timestamps):
+    """逐条解析：TimestampParser，无法解析时保留原文"""
+    parser = TimestampParser(TIMESTAMP_FORMATS, convert=standard_format)
+    results = []
+    for timestamp_str in timestamps:
+        normalized = parser.parse(timestamp_str)
+        results.append(normalized if normalized is not None else timestamp_str)
+    return results
+
+def vectorized_normalize(processor, timestamps):
+    """整列解析：LogProcessor.normalize_timestamps，返回 datetime64 列"""
+    return processor.normalize_timestamps(pd.Series(timestamps))
+
+def compare_normalized(timestamps, expected, normalized):
+    """整列解析的结果（无法解析的为 NaT）与旧实现（无法解析时保留原文）是否一致"""
+    actual = [original if pd.isna(dt) else dt.strftime(STANDARD_TIME_FORMAT)
+              for original, dt in zip(timestamps, normalized)]
+    return actual == expected
+
+def measure(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='时间戳解析基准测试')
+    parser.add_argument('--lines', type=int, default=200000, help='时间戳数量')
+    parser.add_argument('--mix', choices=sorted(MIXES), nargs='+', default=sorted(MIXES), help='主要的时间戳格式')
+    args = parser.parse_args()
+    
+    failed = False
+    for mix in args.mix:
+        failed = run_mix(args.lines, mix) or failed
+    
+    if failed:
+        print("❌ 解析结果不一致")
+        sys.exit(1)
+    print("✅ 解析结果完全一致")
+
+def run_mix(lines, mix):
+    """返回是否有不一致的结果"""
+    timestamps = make_timestamps(lines, random.Random(42), mix)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        processor = LogProcessor(tmp_dir, tmp_dir)
+        # 空字符串没有第一个空白之前的部分，各实现都跳过空值
+        non_empty = [timestamp_str for timestamp_str in timestamps if timestamp_str]
+        
+        print(f"📊 时间戳解析基准 (条/秒), 输入以 {mix} 时间为主")
+        print("=" * 70)
+        (expected, legacy_time), (actual, parser_time) = (measure(legacy_time_analysis, timestamps),
+                                                          measure(parser_time_analysis, timestamps))
+        failed = expected != actual or not expected[0]
+        print(f"按小时/日期统计: 旧实现 {lines / legacy_time:,.0f}, 解析器 {lines / parser_time:,.0f}, "
+              f"加速比 {legacy_time / parser_time:.1f}x, {sum(actual[0].values())} 条计入统计 "
+              f"{'✅' if not failed else '❌'}")
+        
+        expected, legacy_time = measure(legacy_normalize, non_empty)
+        parsed, parser_time = measure(parser_normalize, non_empty)
+        normalized, vector_time = measure(vectorized_normalize, processor, non_empty)
+        same = compare_normalized(non_empty, expected, normalized) and parsed == expected
+        failed = failed or not same
+        print(f"时间戳标准化: 旧实现 {len(non_empty) / legacy_time:,.0f}, 逐条解析 {len(non_empty) / parser_time:,.0f}, "
+              f"整列解析 {len(non_empty) / vector_time:,.0f}, 加速比 {legacy_time / vector_time:.1f}x "
+              f"{'✅' if same else '❌'}")
+        print("=" * 70)
+    return failed
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# 日志处理数据转换基准
+# 对比旧实现（三次 to_datetime、逐行 apply 分类和拆分 URL）与 LogProcessor.transform_data 的按列实现，
+# 校验派生字段（小时、星期、日期、状态码/大小分类、URL 路径、是否带查询参数）逐行一致
+
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'log_processing'))
+
+from log_processor import LogProcessor
+
+STATUSES = np.array(['200', '200', '200', '301', '304', '404', '500', '503', None], dtype=object)
+SIZES = np.array(['-', '512', '4096', '65536', '2097152', '20971520', None], dtype=object)
+PAGES = np.array(['/', '/index.html', '/api/v1/users', '/api/v1/orders', '/static/app.js', '/search', None], dtype=object)
+DERIVED_COLUMNS = ['hour', 'day_of_week', 'date', 'status_category', 'url_path', 'has_query', 'size_category']
+
+def make_frame(rows, seed=42):
+    """生成访问日志解析结果：URL 带随机查询参数，约 1% 的时间戳无法解析"""
+    rng = np.random.default_rng(seed)
+    urls = pd.Series(rng.choice(PAGES, rows), dtype=object)
+    query = rng.random(rows) < 0.5
+    urls[query] = urls[query] + '?id=' + pd.Series(rng.integers(0, 5000, rows)).astype(str)[query]
+    sizes = rng.choice(SIZES, rows)
+    exact = rng.random(rows) < 0.3
+    sizes[exact] = rng.integers(0, 50000, exact.sum()).astype(str)
+    times = pd.Series(pd.to_datetime(1728518400 + np.sort(rng.integers(0, 86400 * 7, rows)), unit='s'))
+    times[rng.random(rows) < 0.01] = pd.NaT
+    return pd.DataFrame({'status': rng.choice(STATUSES, rows), 'size': sizes, 'url': urls,
+                         'normalized_timestamp': times})
+
+def legacy_status(status):
+    try:
+        code = int(status)
+        if 200 <= code < 300:
+            return 'success'
+        elif 300 <= code < 400:
+            return 'redirect'
+        elif 400 <= code < 500:
+            return 'client_error'
+        elif 500 <= code < 600:
+            return 'server_error'
+        else:
+            return 'unknown'
+    except:
+        return 'unknown'
+
+def legacy_size(size):
+    if pd.isna(size):
+        return 'unknown'
+    
+    try:
+        size_bytes = float(size)
+        if size_bytes < 1024:
+            return 'small'
+        elif size_bytes < 1024 * 1024:
+            return 'medium'
+        elif size_bytes < 10 * 1024 * 1024:
+            return 'large'
+        else:
+            return 'very_large'
+    except:
+        return 'unknown'
+
+def legacy_transform(df):
+    """旧实现：LogProcessor.transform_data 改为按列计算之前的写法"""
+    df['hour'] = pd.to_datetime(df['normalized_timestamp']).dt.hour
+    df['day_of_week'] = pd.to_datetime(df['normalized_timestamp']).dt.dayofweek
+    df['date'] = pd.to_datetime(df['normalized_timestamp']).dt.date
+    df['status_category'] = df['status'].astype(str).apply(legacy_status)
+    df['url_path'] = df['url'].apply(lambda x: str(x).split('?')[0] if pd.notna(x) else x)
+    df['has_query'] = df['url'].apply(lambda x: '?' in str(x) if pd.notna(x) else False)
+    df['size_category'] = pd.to_numeric(df['size'], errors='coerce').apply(legacy_size)
+    return df
+
+def same_values(expected, actual):
+    """逐行比较，两边都为空值视为相同"""
+    expected = expected.astype(object)
+    actual = actual.astype(object)
+    return bool(((expected == actual) | (expected.isna() & actual.isna())).all())
+
+def measure(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='日志处理数据转换基准')
+    parser.add_argument('--rows', type=int, default=1000000, help='数据行数')
+    args = parser.parse_args()
+    
+    logging.disable(logging.CRITICAL)
+    df = make_frame(args.rows)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        processor = LogProcessor(tmp_dir, tmp_dir)
+        expected, legacy_time = measure(legacy_transform, df.copy())
+        actual, vector_time = measure(processor.transform_data, df.copy())
+    
+    print("📊 日志处理数据转换基准")
+    print(f"📝 数据行数: {args.rows}")
+    print("=" * 70)
+    print(f"旧实现（逐行 apply）: {legacy_time:.2f}s ({args.rows / legacy_time:,.0f} 行/秒)")
+    print(f"按列实现:             {vector_time:.2f}s ({args.rows / vector_time:,.0f} 行/秒), "
+          f"加速比 {legacy_time / vector_time:.1f}x")
+    print(f"内存: 旧实现 {expected[DERIVED_COLUMNS].memory_usage(deep=True).sum() / 1024 / 1024:.1f} MB, "
+          f"按列实现 {actual[DERIVED_COLUMNS].memory_usage(deep=True).sum() / 1024 / 1024:.1f} MB（派生字段）")
+    print("=" * 70)
+    
+    failed = [column for column in DERIVED_COLUMNS if not same_values(expected[column], actual[column])]
+    if failed:
+        print(f"❌ 派生字段不一致: {', '.join(failed)}")
+        sys.exit(1)
+    print("✅ 派生字段逐行一致")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+# 合成日志生成器
+# 按固定随机种子生成 apache/nginx 访问日志、syslog 和应用日志，相同参数每次生成的内容完全相同：
+#   - 每个文件的行数或大小可配置
+#   - 按比例混入安全事件：syslog 和应用日志的 message 中加入关键字（计入安全事件），
+#     访问日志没有 message 字段，混入可疑 URL（不计入安全事件）
+# 同时写出 manifest.json，记录各文件的行数、字节数和应检测到的安全事件数，供基准和校验使用
+
+import json
+import random
+import argparse
+from pathlib import Path
+
+FORMATS = ['apache_access', 'nginx_access', 'syslog', 'application']
+FILE_NAMES = {
+    'apache_access': 'apache_access.log',
+    'nginx_access': 'nginx_access.log',
+    'syslog': 'syslog.log',
+    'application': 'application.log',
+}
+MANIFEST_FILE = 'manifest.json'
+
+METHODS = ['GET', 'GET', 'GET', 'GET', 'POST', 'POST', 'PUT', 'DELETE']
+STATUSES = ['200', '200', '200', '200', '200', '301', '304', '400', '403', '404', '500', '502']
+PAGES = ['/', '/index.html', '/api/v1/users', '/api/v1/orders', '/api/v1/items', '/static/app.js',
+         '/static/style.css', '/login', '/search', '/health']
+HOSTS = ['web01', 'web02', 'db01', 'cache01']
+PROCESSES = ['sshd[2231]', 'kernel', 'systemd[1]', 'cron[884]', 'nginx[1201]']
+SYSLOG_MESSAGES = ['Accepted publickey for deploy from {ip} port {port} ssh2',
+                   'session opened for user deploy by (uid=0)',
+                   'Started Daily apt download activities.',
+                   'eth0: link up, 1000 Mbps, full duplex',
+                   '(root) CMD (run-parts /etc/cron.hourly)']
+LEVELS = ['INFO', 'INFO', 'INFO', 'INFO', 'DEBUG', 'WARNING', 'ERROR']
+APP_MESSAGES = ['request {req} handled in {ms}ms',
+                'cache hit ratio {pct}% for shard {shard}',
+                'user {user} updated profile',
+                'order {req} created by {user}',
+                'connection pool size {shard} active {ms}']
+AGENTS = ['Mozilla/5.0 (X11; Linux x86_64)', 'curl/8.4.0', 'python-requests/2.31.0']
+USERS = ['alice', 'bob', 'carol', 'dave', 'erin']
+# 与 LogAnalyzer.security_patterns 对应的关键字，每条只命中一个规则
+ATTACK_MESSAGES = ['failed login for admin from {ip}',
+                   'authentication failed for user {user}',
+                   'invalid user oracle from {ip}',
+                   'possible brute force from {ip}',
+                   'blocked sql injection in parameter id',
+                   'blocked xss attack in comment form',
+                   'unauthorized access to /admin from {ip}']
+ATTACK_URLS = ["/search?q=1'%20OR%20'1'='1", '/../../etc/passwd', '/admin/config.php',
+               '/comment?text=<script>alert(1)</script>', '/wp-login.php']
+
+class LogGenerator:
+    """按格式生成日志行，同一种子和参数生成的内容相同"""
+    
+    def __init__(self, seed=42, attack_ratio=0.01, ip_count=5000, url_count=2000):
+        self.seed = seed
+        self.attack_ratio = attack_ratio
+        self.ip_count = ip_count
+        self.url_count = url_count
+    
+    def rng_for(self, format_name):
+        """每种格式使用独立的随机序列，生成顺序和选择的格式不影响各文件内容"""
+        return random.Random(f'{self.seed}:{format_name}')
+    
+    def ip(self, rng):
+        index = rng.randrange(self.ip_count)
+        return f'10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255 or 1}'
+    
+    def url(self, rng):
+        return f'{rng.choice(PAGES)}?id={rng.randrange(self.url_count)}'
+    
+    def access_line(self, rng, index, attack, nginx):
+        second = index % 86400
+        timestamp = f'{10 + index // 86400 % 20:02d}/Oct/2024:{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d} +0800'
+        url = rng.choice(ATTACK_URLS) if attack else self.url(rng)
+        status = '403' if attack else rng.choice(STATUSES)
+        user = '-' if nginx or rng.random() < 0.9 else rng.choice(USERS)
+        line = (f'{self.ip(rng)} - {user} [{timestamp}] "{rng.choice(METHODS)} {url} HTTP/1.1" '
+                f'{status} {rng.randint(100, 60000)}')
+        # nginx 默认的 combined 格式在末尾带 referer 和 user agent
+        return line + f' "-" "{rng.choice(AGENTS)}"' if nginx else line
+    
+    def syslog_line(self, rng, index, attack):
+        second = index % 86400
+        template = rng.choice(ATTACK_MESSAGES if attack else SYSLOG_MESSAGES)
+        message = template.format(ip=self.ip(rng), port=rng.randint(1024, 65535), user=rng.choice(USERS))
+        return (f'Oct {10 + index // 86400 % 20:2d} {second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d} '
+                f'{rng.choice(HOSTS)} {rng.choice(PROCESSES)}: {message}')
+    
+    def application_line(self, rng, index, attack):
+        second = index % 86400
+        level = 'WARNING' if attack else rng.choice(LEVELS)
+        template = rng.choice(ATTACK_MESSAGES if attack else APP_MESSAGES)
+        message = template.format(ip=self.ip(rng), user=rng.choice(USERS), req=rng.randrange(10 ** 6),
+                                  ms=rng.randint(1, 2000), pct=rng.randint(0, 100), shard=rng.randint(0, 31))
+        return (f'2024-10-{10 + index // 86400 % 20:02d} {second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d} '
+                f'[{level}] {message}')
+    
+    def lines(self, format_name):
+        """无限生成某种格式的 (日志行, 是否为安全事件)"""
+        rng = self.rng_for(format_name)
+        index = 0
+        while True:
+            attack = rng.random() < self.attack_ratio
+            if format_name in ('apache_access', 'nginx_access'):
+                line = self.access_line(rng, index, attack, format_name == 'nginx_access')
+            elif format_name == 'syslog':
+                line = self.syslog_line(rng, index, attack)
+            else:
+                line = self.application_line(rng, index, attack)
+            yield line, attack
+            index += 1
+    
+    def write_file(self, path, format_name, lines=None, size_bytes=None):
+        """写入一个日志文件，达到行数或字节数（先到者）为止，返回文件信息"""
+        count = 0
+        written = 0
+        attacks = 0
+        with open(path, 'w', encoding='utf-8', newline='\n') as f:
+            for line, attack in self.lines(format_name):
+                if (lines is not None and count >= lines) or (size_bytes is not None and written >= size_bytes):
+                    break
+                f.write(line + '\n')
+                count += 1
+                written += len(line) + 1
+                attacks += attack
+        # 访问日志的安全事件只是可疑 URL，分析器不会计入
+        counted = attacks if format_name in ('syslog', 'application') else 0
+        return {'format': format_name, 'lines': count, 'bytes': written, 'attacks': attacks,
+                'expected_security_events': counted}
+
+def generate_dataset(output_dir, formats=FORMATS, lines=None, size_mb=None, attack_ratio=0.01, seed=42):
+    """在 output_dir 中按格式各生成一个文件，写出并返回清单"""
+    if lines is None and size_mb is None:
+        lines = 100000
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    generator = LogGenerator(seed=seed, attack_ratio=attack_ratio)
+    size_bytes = int(size_mb * 1024 * 1024) if size_mb is not None else None
+    files = {FILE_NAMES[name]: generator.write_file(output_dir / FILE_NAMES[name], name, lines, size_bytes)
+             for name in formats}
+    manifest = {
+        'seed': seed,
+        'attack_ratio': attack_ratio,
+        'files': files,
+        'total_lines': sum(info['lines'] for info in files.values()),
+        'total_bytes': sum(info['bytes'] for info in files.values()),
+        'expected_security_events': sum(info['expected_security_events'] for info in files.values()),
+    }
+    # 清单文件名不含 log，分析器不会当作日志读取
+    with open(output_dir / MANIFEST_FILE, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description='合成日志生成器')
+    parser.add_argument('--output', required=True, help='输出目录')
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=FORMATS, help='生成的日志格式')
+    parser.add_argument('--lines', type=int, help='每个文件的行数')
+    parser.add_argument('--size-mb', type=float, help='每个文件的大小（MB），与 --lines 同时指定时先到者为准')
+    parser.add_argument('--attack-ratio', type=float, default=0.01, help='混入安全事件的行比例')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    args = parser.parse_args()
+    
+    manifest = generate_dataset(args.output, args.formats, args.lines, args.size_mb, args.attack_ratio, args.seed)
+    for name, info in manifest['files'].items():
+        print(f"📝 {name}: {info['lines']} 行, {info['bytes'] / 1024 / 1024:.1f} MB, 安全事件 {info['attacks']}")
+    print(f"✅ 共 {manifest['total_lines']} 行, {manifest['total_bytes'] / 1024 / 1024:.1f} MB → {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# 访问日志快速路径差分测试
+# 在大量随机生成及变异的访问日志上，对比分词快速路径与原正则 groupdict() 的输出
+
+import re
+import sys
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'log_processing'))
+
+from log_matcher import DEFAULT_LOG_PATTERNS, FAST_PARSERS, LogMatcher
+
+METHODS = ['GET', 'POST', 'PUT', 'DELETE', 'HEAD', '-']
+PROTOCOLS = ['HTTP/1.0', 'HTTP/1.1', 'HTTP/2.0', 'HTTP/1.1"x', '-']
+NOISE = [' ', '  ', '\t', '"', '[', ']', '-', ' ', '　', 'é', '\x1c', '?a=1&b=[2]', '"" ', '] "']
+
+def random_access_line(rng):
+    """生成一行访问日志，覆盖 common/combined 格式和各种边界值"""
+    ip = rng.choice([f"{rng.randint(1, 255)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}",
+                     '::1', 'example.com', '2001:db8::1'])
+    ident = rng.choice(['-', '-', 'ident'])
+    user = rng.choice(['-', 'frank', 'a[b', 'user"x'])
+    timestamp = rng.choice(['10/Oct/2024:13:55:36 -0700', '01/Jan/2024:00:00:00 +0000', 'x', '[10/Oct/2024]'])
+    method = rng.choice(METHODS)
+    url = rng.choice(['/', '/index.html', '/a?b=c&d=e', '/search?q="x"', '/p]a', '*'])
+    protocol = rng.choice(PROTOCOLS)
+    status = rng.choice(['200', '304', '404', '500', '2x0', '０'])
+    size = rng.choice(['-', '0', '1234', '12ab', 'abc', ''])
+    tail = rng.choice(['', ' "-" "Mozilla/5.0 (X11; Linux x86_64)"', ' "http://ref/" "curl/8.0"', ' extra', '\tx'])
+    return f'{ip} {ident} {user} [{timestamp}] "{method} {url} {protocol}" {status} {size}{tail}'
+
+def mutate(line, rng):
+    """随机插入、删除或替换字符，制造不规整的行"""
+    chars = list(line)
+    for _ in range(rng.randint(1, 3)):
+        position = rng.randrange(len(chars) + 1)
+        action = rng.random()
+        if action < 0.4:
+            chars.insert(position, rng.choice(NOISE))
+        elif action < 0.7 and chars:
+            del chars[min(position, len(chars) - 1)]
+        elif chars:
+            chars[min(position, len(chars) - 1)] = rng.choice(NOISE)
+    return ''.join(chars)
+
+def test_access_fast_path(lines=200000, seed=2024):
+    """快速路径的输出必须与正则 groupdict() 完全一致"""
+    rng = random.Random(seed)
+    compiled = {name: re.compile(DEFAULT_LOG_PATTERNS[name]) for name in FAST_PARSERS}
+    regex_matcher = LogMatcher(DEFAULT_LOG_PATTERNS)
+    fast_matcher = LogMatcher(DEFAULT_LOG_PATTERNS, fast_path=True)
+    
+    print("🧪 访问日志快速路径差分测试")
+    print(f"📝 样本行数: {lines}, 随机种子: {seed}")
+    print("=" * 60)
+    
+    mismatches = []
+    fast_hits = {name: 0 for name in FAST_PARSERS}
+    regex_matches = {name: 0 for name in FAST_PARSERS}
+    for index in range(lines):
+        line = random_access_line(rng)
+        if rng.random() < 0.3:
+            line = mutate(line, rng)
+        line = line.strip()
+        
+        for name, fast_parser in FAST_PARSERS.items():
+            match = compiled[name].match(line)
+            expected = match.groupdict() if match else None
+            fields = fast_parser(line)
+            if expected is not None:
+                regex_matches[name] += 1
+            if fields is not None:
+                fast_hits[name] += 1
+                if fields != expected:
+                    mismatches.append((name, line, expected, fields))
+        
+        # 整体解析结果（含回退和格式分派）也必须一致
+        if regex_matcher.parse(line) != fast_matcher.parse(line):
+            mismatches.append(('matcher', line, regex_matcher.parse(line), fast_matcher.parse(line)))
+    
+    for name in FAST_PARSERS:
+        print(f"{name}: 正则匹配 {regex_matches[name]} 行, 快速路径命中 {fast_hits[name]} 行")
+    
+    for name, line, expected, actual in mismatches[:10]:
+        print(f"❌ {name}: {line!r}\n   正则: {expected}\n   快速: {actual}")
+    
+    print("=" * 60)
+    print("✅ 输出完全一致" if not mismatches else f"❌ 发现 {len(mismatches)} 处不一致")
+    assert not mismatches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='访问日志快速路径差分测试')
+    parser.add_argument('--lines', type=int, default=200000, help='测试行数')
+    parser.add_argument('--seed', type=int, default=2024, help='随机种子')
+    args = parser.parse_args()
+    test_access_fast_path(args.lines, args.seed)
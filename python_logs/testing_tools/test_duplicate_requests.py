@@ -0,0 +1,96 @@
+# 重复请求去重测试
+# 没有原文（raw_line）的结构化记录：同一秒内同一 IP 的相同请求是不同的请求，清洗后必须全部保留；
+# 同一行被重复读取（文件名、行号也相同）的记录才丢弃。检查整体处理、分块处理和跨运行去重：
+#   - 1500 次相同请求全部保留，检测到 unusual_traffic 和 high_error_rate
+#   - 分块处理（相同请求跨越多个块）与整体处理的结果相同
+#   - 启用跨运行去重索引时，再次处理同一份数据全部丢弃
+
+import sys
+import json
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'log_processing'))
+
+from log_processor import LogProcessor
+from log_storage import PARSED_LOG_COLUMNS, write_handoff
+
+def make_parsed_logs(repeats, others):
+    """repeats 次 IP 6.6.6.6 在同一秒内的相同请求（状态码 500），加上 others 条不同 IP 的正常请求；
+    没有 raw_line 列，再追加前 10 行的重复读取（文件名、行号相同）
+    """
+    rows = repeats + others
+    df = pd.DataFrame({
+        'ip': ['6.6.6.6'] * repeats + [f'10.0.0.{i}' for i in range(others)],
+        'timestamp': '10/Oct/2024:13:55:36 +0800',
+        'method': 'GET',
+        'url': '/api/login',
+        'protocol': 'HTTP/1.1',
+        'status': [500] * repeats + [200] * others,
+        'size': 512,
+        'message': 'Mozilla/5.0',
+        'line_number': np.arange(rows) + 1,
+        'file_name': 'access.log',
+        'format': 'apache_access',
+    })
+    return pd.concat([df, df.head(10)], ignore_index=True)
+
+def run(input_dir, output_dir, **config):
+    result = LogProcessor(input_dir, output_dir, config).run_processing()
+    with open(Path(output_dir) / 'processing_stats.json', 'r', encoding='utf-8') as f:
+        stats = json.load(f)
+    return {anomaly['type'] for anomaly in result['anomalies']}, stats['total_records']
+
+def main():
+    parser = argparse.ArgumentParser(description='重复请求去重测试')
+    parser.add_argument('--repeats', type=int, default=1500, help='同一秒内相同请求的次数')
+    parser.add_argument('--others', type=int, default=20, help='其他请求的条数')
+    parser.add_argument('--chunk-rows', type=int, default=400, help='分块处理每块的行数')
+    args = parser.parse_args()
+    
+    logging.disable(logging.CRITICAL)
+    df = make_parsed_logs(args.repeats, args.others)
+    expected_rows = args.repeats + args.others
+    expected_types = {'unusual_traffic', 'high_error_rate'}
+    
+    print("📊 重复请求去重测试")
+    print(f"📝 {args.repeats} 次同一秒内的相同请求 + {args.others} 条其他请求 + 10 行重复读取")
+    print("=" * 78)
+    
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp = Path(tmp_dir)
+        input_dir = tmp / 'input'
+        input_dir.mkdir()
+        write_handoff(df, input_dir, 'parsed_logs', 'csv', PARSED_LOG_COLUMNS)
+        
+        results = {
+            '整体处理': run(input_dir, tmp / 'whole'),
+            '分块处理': run(input_dir, tmp / 'chunked', chunk_rows=args.chunk_rows),
+        }
+        index = str(tmp / 'dedup_index.npy')
+        results['跨运行去重（第一次）'] = run(input_dir, tmp / 'run1', dedup_index=index)
+        second_run = run(input_dir, tmp / 'run2', dedup_index=index, chunk_rows=args.chunk_rows)
+    
+    for name, (types, rows) in results.items():
+        ok = rows == expected_rows and expected_types <= types
+        failed = failed or not ok
+        print(f"{name:<12} 保留 {rows} 条（应为 {expected_rows}）, 异常: {', '.join(sorted(types)) or '无'} "
+              f"{'✅' if ok else '❌'}")
+    ok = second_run[1] == 0
+    failed = failed or not ok
+    print(f"{'跨运行去重（第二次）':<12} 保留 {second_run[1]} 条（应为 0） {'✅' if ok else '❌'}")
+    print("=" * 78)
+    
+    if failed:
+        print("❌ 相同的请求被当作重复记录丢弃，或重复读取的行没有丢弃")
+        sys.exit(1)
+    print("✅ 相同的请求全部保留，重复读取的行和以前运行处理过的记录被丢弃")
+
+if __name__ == '__main__':
+    main()
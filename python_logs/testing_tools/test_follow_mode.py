@@ -0,0 +1,132 @@
+# 跟踪模式测试
+# 在后台线程中运行 LogAnalyzer.follow()，模拟应用持续写入日志：
+#   - 启动前已有的内容不会被读取
+#   - 安全事件从写入到检测的延迟
+#   - 按改名轮转（app.log → app.log.1 → app.log.1.gz，新建 app.log）和原地截断（copytruncate）
+#   - 写到一半的行不会被拆开，每行恰好统计一次
+#   - 空闲时的 CPU 占用
+
+import sys
+import gzip
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'log_processing'))
+
+from log_analyzer import LogAnalyzer
+
+def access_line(index):
+    return f'10.0.0.{index % 250 + 1} - - [10/Oct/2024:13:55:36 +0800] "GET /api/item/{index} HTTP/1.1" 200 {index}\n'
+
+def attack_line(index):
+    """应用日志格式的安全事件（访问日志只检查 message/raw_line，没有可扫描的内容）"""
+    return f"2024-10-10 13:55:36 [WARNING] failed login for admin from 10.0.1.{index % 250 + 1} attempt {index}\n"
+
+def write(path, text, mode='a'):
+    with open(path, mode, encoding='utf-8') as f:
+        f.write(text)
+
+def main():
+    parser = argparse.ArgumentParser(description='跟踪模式测试')
+    parser.add_argument('--lines', type=int, default=2000, help='每个阶段写入的行数')
+    parser.add_argument('--events', type=int, default=20, help='测量延迟的安全事件数')
+    parser.add_argument('--poll-interval', type=float, default=0.25, help='跟踪模式的轮询间隔（秒）')
+    parser.add_argument('--idle-seconds', type=float, default=3.0, help='测量空闲 CPU 占用的时长（秒）')
+    args = parser.parse_args()
+    
+    logging.disable(logging.CRITICAL)
+    failed = False
+    
+    def check(name, ok, detail=''):
+        nonlocal failed
+        failed = failed or not ok
+        print(f"{'✅' if ok else '❌'} {name} {detail}")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_dir = Path(tmp_dir) / 'logs'
+        log_dir.mkdir()
+        app_log = log_dir / 'app.log'
+        other_log = log_dir / 'other.log'
+        # 启动前已有的内容
+        write(app_log, ''.join(access_line(i) for i in range(1000)))
+        write(other_log, ''.join(access_line(i) for i in range(500)))
+        
+        detected = {}
+        
+        def on_event(event):
+            # 按行末的序号识别事件（应用日志的 content 为解析出的 message）
+            detected[event['content'].rsplit(' ', 1)[-1]] = time.perf_counter()
+        
+        analyzer = LogAnalyzer(log_dir, Path(tmp_dir) / 'output')
+        stop_event = threading.Event()
+        result = {}
+        thread = threading.Thread(target=lambda: result.update(analyzer.follow(
+            poll_interval=args.poll_interval, window=3600, stop_event=stop_event, on_event=on_event)))
+        thread.start()
+        time.sleep(1)
+        written = 0
+        
+        # 1. 安全事件延迟
+        latencies = []
+        for index in range(args.events):
+            start = time.perf_counter()
+            write(app_log, attack_line(index))
+            written += 1
+            while str(index) not in detected and time.perf_counter() - start < 5:
+                time.sleep(0.001)
+            latencies.append(detected.get(str(index), float('inf')) - start)
+        latencies.sort()
+        check("安全事件延迟", latencies[-1] < 1,
+              f"中位数 {latencies[len(latencies) // 2] * 1000:.0f} ms, 最大 {latencies[-1] * 1000:.0f} ms")
+        
+        # 2. 持续写入，包括写到一半的行
+        for index in range(args.lines):
+            line = access_line(index)
+            write(app_log, line[:20])
+            write(app_log, line[20:])
+            written += 1
+        
+        # 3. 改名轮转：旧文件在改名后仍有写入，随后被压缩删除
+        app_log.rename(log_dir / 'app.log.1')
+        write(log_dir / 'app.log.1', ''.join(access_line(i) for i in range(10)))
+        written += 10
+        write(app_log, ''.join(access_line(i) for i in range(args.lines)))
+        written += args.lines
+        time.sleep(1)
+        with open(log_dir / 'app.log.1', 'rb') as source, gzip.open(log_dir / 'app.log.1.gz', 'wb') as target:
+            shutil.copyfileobj(source, target)
+        (log_dir / 'app.log.1').unlink()
+        
+        # 4. 原地截断后继续写入
+        write(other_log, ''.join(access_line(i) for i in range(args.lines)))
+        written += args.lines
+        time.sleep(1)
+        write(other_log, '', mode='w')
+        write(other_log, ''.join(access_line(i) for i in range(args.lines // 2)))
+        written += args.lines // 2
+        time.sleep(1.5)
+        
+        # 5. 空闲 CPU 占用（跟踪线程与本线程在同一进程中，本线程休眠）
+        cpu_start = time.process_time()
+        time.sleep(args.idle_seconds)
+        idle_cpu = (time.process_time() - cpu_start) / args.idle_seconds * 100
+        
+        stop_event.set()
+        thread.join()
+    
+    check("每行恰好统计一次", result.get('total_entries') == written,
+          f"写入 {written} 行, 统计 {result.get('total_entries')} 条")
+    check("安全事件", result.get('total_security_events') == args.events,
+          f"检测到 {result.get('total_security_events')} 个, 写入 {args.events} 个")
+    check("空闲 CPU 占用", idle_cpu < 5, f"{idle_cpu:.2f}%")
+    
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+# 时间序列异常检测测试
+# 生成数天的访问日志（每分钟记录数随时段起伏，错误率约 2%），在最后一天注入持续数分钟的 5xx 错误率突增
+# 和单个 IP 的请求突增，检查：
+#   - 注入的每一分钟都被检测到，注入时段之外没有错误率和 IP 突增的误报；全时段的错误率不超过静态阈值
+#   - 按天分批处理（基线状态跨运行保存）、分块处理与一次处理全部数据的异常相同；分块处理的基线状态也完全相同，
+#     按天分批时每次保存都会丢弃长时间没有请求的 IP 基线（这些 IP 再出现时以全部 IP 的基线重新开始），只比较全局序列
+#   - 基线更新的吞吐量和状态文件大小
+
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'log_processing'))
+
+from log_processor import LogProcessor
+from log_storage import PARSED_LOG_COLUMNS, write_handoff
+from log_timeseries import TIMESERIES_STATE_FILE, TIMESERIES_TYPES, MinuteCounts, TimeSeriesDetector
+
+START = 1728518400  # 2024-10-10 00:00
+DAY_MINUTES = 1440
+
+def make_parsed_logs(days, rate, ips, error_minute, burst_minute, spike_minutes, burst_rate, seed=42):
+    """生成解析结果：每分钟记录数为泊松分布（均值按天正弦起伏），错误率约 2%；
+    error_minute 起 spike_minutes 分钟错误率约 40%，burst_minute 起同样分钟数内 IP 6.6.6.6 每分钟 burst_rate 次请求
+    """
+    rng = np.random.default_rng(seed)
+    minutes = np.arange(days * DAY_MINUTES)
+    means = rate * (1 + 0.3 * np.sin(2 * np.pi * minutes / DAY_MINUTES))
+    minute = np.repeat(minutes, rng.poisson(means))
+    rows = len(minute)
+    ip_list = np.array([f'10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}' for n in range(ips)], dtype=object)
+    ip = ip_list[rng.integers(0, ips, rows)]
+    spike = (minute >= error_minute) & (minute < error_minute + spike_minutes)
+    status = np.where(rng.random(rows) < np.where(spike, 0.4, 0.02), 503, 200)
+    
+    burst = np.repeat(np.arange(burst_minute, burst_minute + spike_minutes), burst_rate)
+    minute = np.concatenate([minute, burst])
+    ip = np.concatenate([ip, np.full(len(burst), '6.6.6.6', dtype=object)])
+    status = np.concatenate([status, np.full(len(burst), 200)])
+    seconds = START + minute * 60 + rng.integers(0, 60, len(minute))
+    order = np.argsort(seconds, kind='stable')
+    seconds, ip, status = seconds[order], ip[order], status[order]
+    
+    times = pd.Series(pd.to_datetime(seconds, unit='s')).dt.strftime('%d/%b/%Y:%H:%M:%S +0800')
+    # 每行的 URL 不同，避免同一秒内相同 IP 的请求被当作重复记录丢弃
+    urls = '/index.html?id=' + pd.Series(np.arange(len(ip))).astype(str)
+    raw_lines = (pd.Series(ip) + ' - - [' + times + '] "GET ' + urls + ' HTTP/1.1" ' + pd.Series(status).astype(str)
+                 + ' 512')
+    return pd.DataFrame({
+        'ip': ip, 'timestamp': times, 'method': 'GET', 'url': urls, 'protocol': 'HTTP/1.1',
+        'status': status, 'size': 512, 'message': 'Mozilla/5.0',
+        'line_number': np.arange(len(ip)) + 1, 'file_name': 'access.log', 'format': 'apache_access',
+        'raw_line': raw_lines,
+    }), seconds
+
+def minute_label(minute):
+    return str(np.datetime64(START // 60 + int(minute), 'm')).replace('T', ' ')
+
+def run_processor(input_dirs, output_dir, state_file, chunk_rows=None):
+    """依次处理各输入目录（同一个基线状态文件），返回时间序列异常"""
+    anomalies = []
+    for input_dir in input_dirs:
+        config = {'timeseries_state': str(state_file)}
+        if chunk_rows:
+            config['chunk_rows'] = chunk_rows
+        result = LogProcessor(input_dir, output_dir, config).run_processing()
+        anomalies += [anomaly for anomaly in result['anomalies'] if anomaly['type'] in TIMESERIES_TYPES]
+    return anomalies, json.loads(state_file.read_text(encoding='utf-8'))
+
+def main():
+    parser = argparse.ArgumentParser(description='时间序列异常检测测试')
+    parser.add_argument('--days', type=int, default=3, help='生成的天数')
+    parser.add_argument('--rate', type=float, default=60, help='平均每分钟记录数')
+    parser.add_argument('--ips', type=int, default=2000, help='正常访问的 IP 数')
+    parser.add_argument('--spike-minutes', type=int, default=5, help='注入的突增持续分钟数')
+    parser.add_argument('--burst-rate', type=int, default=200, help='突增 IP 每分钟的请求数')
+    parser.add_argument('--chunk-rows', type=int, default=20000, help='分块处理每块的行数')
+    args = parser.parse_args()
+    
+    logging.disable(logging.CRITICAL)
+    last_day = (args.days - 1) * DAY_MINUTES
+    error_minute, burst_minute = last_day + 9 * 60 + 20, last_day + 17 * 60 + 40
+    df, seconds = make_parsed_logs(args.days, args.rate, args.ips, error_minute, burst_minute,
+                                   args.spike_minutes, args.burst_rate)
+    error_minutes = {minute_label(error_minute + i) for i in range(args.spike_minutes)}
+    burst_minutes = {minute_label(burst_minute + i) for i in range(args.spike_minutes)}
+    
+    print("📊 时间序列异常检测测试")
+    print(f"📝 {args.days} 天, {len(df)} 条记录, 平均每分钟 {args.rate:.0f} 条, 注入 {args.spike_minutes} 分钟的错误率突增"
+          f"（{min(error_minutes)}）和 IP 突增（{min(burst_minutes)}, 每分钟 {args.burst_rate} 次）")
+    print("=" * 78)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp = Path(tmp_dir)
+        whole_dir, day_dirs = tmp / 'all', []
+        whole_dir.mkdir()
+        write_handoff(df, whole_dir, 'parsed_logs', 'csv', PARSED_LOG_COLUMNS)
+        days = (seconds - START) // 86400
+        for day in range(args.days):
+            day_dirs.append(tmp / f'day{day}')
+            day_dirs[-1].mkdir()
+            write_handoff(df[days == day], day_dirs[-1], 'parsed_logs', 'csv', PARSED_LOG_COLUMNS)
+        
+        whole, whole_state = run_processor([whole_dir], tmp / 'out_all', tmp / 'all.json')
+        with open(tmp / 'out_all' / 'anomalies.json', 'r', encoding='utf-8') as f:
+            static_types = {anomaly['type'] for anomaly in json.load(f)} - set(TIMESERIES_TYPES)
+        batched, batched_state = run_processor(day_dirs, tmp / 'out_days', tmp / 'days.json')
+        chunked, chunked_state = run_processor([whole_dir], tmp / 'out_chunked', tmp / 'chunked.json', args.chunk_rows)
+        
+        # 基线更新的吞吐量（不含读取和清洗）
+        frame = pd.DataFrame({'normalized_timestamp': pd.to_datetime(seconds, unit='s'), 'ip': df['ip'],
+                              'status': df['status']})
+        start = time.perf_counter()
+        counts = MinuteCounts.from_frame(frame)
+        count_time = time.perf_counter() - start
+        detector = TimeSeriesDetector(tmp / TIMESERIES_STATE_FILE)
+        start = time.perf_counter()
+        detector.update(counts)
+        update_time = time.perf_counter() - start
+        detector.save()
+        state_size = (tmp / TIMESERIES_STATE_FILE).stat().st_size
+    
+    found = {(anomaly['type'], anomaly['minute']) for anomaly in whole}
+    missed = ([minute for minute in sorted(error_minutes) if ('error_rate_spike', minute) not in found]
+              + [minute for minute in sorted(burst_minutes) if ('ip_rate_spike', minute) not in found])
+    false_alarms = [anomaly['description'] for anomaly in whole
+                    if (anomaly['type'] == 'error_rate_spike' and anomaly['minute'] not in error_minutes)
+                    or (anomaly['type'] == 'ip_rate_spike' and anomaly['minute'] not in burst_minutes)]
+    for anomaly in whole:
+        print(f"  {anomaly['description']}")
+    print("=" * 78)
+    print(f"静态检测: {', '.join(sorted(static_types)) or '无异常'}")
+    print(f"按分钟统计: {len(df) / count_time:,.0f} 行/秒; 基线更新: {counts.compact()[0].shape[0]} 分钟, "
+          f"{update_time:.2f}s ({counts.compact()[0].shape[0] / update_time:,.0f} 分钟/秒)")
+    print(f"基线状态: {len(detector.ips)} 个IP, {state_size / 1024:.0f} KB")
+    
+    failed = False
+    if missed:
+        print(f"❌ 未检测到的注入分钟: {missed}")
+        failed = True
+    if false_alarms:
+        print(f"❌ 注入时段之外的错误率或 IP 突增: {false_alarms}")
+        failed = True
+    if 'high_error_rate' in static_types:
+        print("❌ 全时段错误率超过静态阈值，测试数据不能说明时间序列检测的作用")
+        failed = True
+    if batched != whole or batched_state['series'] != whole_state['series']:
+        print("❌ 按天分批处理的异常或基线状态与一次处理不同")
+        failed = True
+    if chunked != whole or chunked_state != whole_state:
+        print("❌ 分块处理的异常或基线状态与一次处理不同")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("✅ 注入的突增全部检测到且没有误报；分批、分块处理与一次处理的异常相同，分块处理的基线状态相同")
+
+if __name__ == '__main__':
+    main()